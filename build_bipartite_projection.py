@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+import json
+import sys
+
+
+from argparse import ArgumentParser
+from basic_tweet_corpus_stats import expanded_urls_from, lowered_hashtags_from
+from graph_io import write_graph
+from projection_options import add_backbone_arguments, add_projection_arguments
+from sparse_graphs import BipartiteBuilder, backbone as sparse_backbone
+
+
+# Builds a graphml file of the projection of a user x entity (hashtag, URL or
+# retweeted tweet) network onto either the users (linked by the entities they
+# share) or the entities (linked by the users who share them).
+
+
+def retweeted_ids_from(tweet):
+    if 'retweeted_status' in tweet and tweet['retweeted_status']:
+        return [tweet['retweeted_status']['id_str']]
+    return []
+
+
+ENTITY_EXTRACTORS = {
+    'HASHTAG' : lowered_hashtags_from,
+    'URL'     : expanded_urls_from,
+    'RETWEET' : retweeted_ids_from
+}
+
+
+class Options:
+    def __init__(self):
+        self.usage = 'build_bipartite_projection.py -i <tweets.json> -o <outfile.(graphml|npz|parquet)> -e (HASHTAG|URL|RETWEET) [-s (USER|ENTITY) -w <weighting> --min-weight <w> --top-k <k>]'
+        self._init_parser()
+
+    def _init_parser(self):
+
+        self.parser = ArgumentParser(usage=self.usage,conflict_handler='resolve')
+        self.parser.add_argument(
+            '-v', '--verbose',
+            action='store_true',
+            default=False,
+            dest='verbose',
+            help='Turn on verbose logging (default: False)'
+        )
+        self.parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            default=False,
+            dest='dry_run',
+            help='Dry run mode - will not write to outfile (default: False)'
+        )
+        self.parser.add_argument(
+            '-i',
+            dest='in_file',
+            required=True,
+            help='File of tweets to read.'
+        )
+        self.parser.add_argument(
+            '-o',
+            dest='out_file',
+            required=True,
+            help='File to write the projected graph to (.graphml, .npz or .parquet).'
+        )
+        self.parser.add_argument(
+            '-e', '--entity',
+            dest='entity',
+            default='HASHTAG',
+            choices=list(ENTITY_EXTRACTORS.keys()),
+            help='What users are linked to (default: HASHTAG)'
+        )
+        self.parser.add_argument(
+            '-s', '--side',
+            dest='side',
+            default='ENTITY',
+            choices=['USER', 'ENTITY'],
+            help='Which side to project onto (default: ENTITY)'
+        )
+        add_projection_arguments(self.parser)
+        add_backbone_arguments(self.parser)
+
+
+    def parse(self, args=None):
+        return self.parser.parse_args(args)
+
+
+def eprint(*args, **kwargs):
+    """Print to stderr"""
+    print(*args, file=sys.stderr, **kwargs)
+
+
+DEBUG=False
+def log(msg):
+    if DEBUG: eprint(msg)
+
+
+if __name__=='__main__':
+    options = Options()
+    opts = options.parse(sys.argv[1:])
+
+    DEBUG=opts.verbose
+
+    in_file    = opts.in_file
+    out_file   = opts.out_file
+    entity     = opts.entity
+    side       = opts.side
+    weighting  = opts.weighting
+    min_weight = opts.min_weight
+    top_k      = opts.top_k
+    backbone   = opts.backbone
+    backbone_threshold = opts.backbone_threshold
+    dry_run    = opts.dry_run
+
+    log('In JSON:     %s' % in_file)
+    log('Out graph:   %s' % out_file)
+    log('Entity:      %s' % entity)
+    log('Side:        %s' % side)
+    log('Weighting:   %s' % weighting)
+    log('Min weight:  %s' % min_weight)
+    log('Top k:       %s' % top_k)
+    log('Backbone:    %s (%s)' % (backbone, backbone_threshold))
+    log('Dry run:     %s' % dry_run)
+
+    # record which users used which entities, and how often
+    entities_from = ENTITY_EXTRACTORS[entity]
+    users_entities = BipartiteBuilder()  # user x entity uses
+    tweet_count = 0
+    with open(in_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            tweet_count += 1
+            if DEBUG and tweet_count %  100 == 0: eprint('.', end='')
+            if DEBUG and tweet_count % 5000 == 0: eprint(' %10d' % tweet_count)
+
+            tweet = json.loads(line)
+
+            user_id = tweet['user']['id_str']
+            users_entities.row(user_id)
+            for e in entities_from(tweet):
+                users_entities.add(user_id, e)
+
+    log('')
+    log('Tweets: %d' % tweet_count)
+    log('Users: %d' % len(users_entities.row_labels))
+    log('Entities: %d' % len(users_entities.col_labels))
+
+    sg = users_entities.project(
+        'rows' if side == 'USER' else 'cols', weighting, min_weight=min_weight, top_k=top_k
+    )
+    if backbone:
+        n_edges = sg.number_of_edges()
+        sg = sparse_backbone(sg, backbone, backbone_threshold)
+        log('Backbone:    kept %d of %d edges' % (sg.number_of_edges(), n_edges))
+    n_type = 'USER' if side == 'USER' else entity
+
+    if not dry_run:
+        write_graph(sg, out_file, node_attrs=lambda n: { 'label' : n, 'n_type' : n_type })
+
+    print('DONE - %s Projection[nodes=%d,edges=%d]' % (n_type, len(sg), sg.number_of_edges()))
@@ -1,12 +1,15 @@
 #!/usr/bin/env python3
 
 import json
-import networkx as nx
 import sys
 
 
 from argparse import ArgumentParser
 from basic_tweet_corpus_stats import lowered_hashtags_from
+from graph_io import write_graph
+from scipy.sparse.csgraph import connected_components
+from projection_options import add_backbone_arguments, add_projection_arguments
+from sparse_graphs import BipartiteBuilder, CooccurrenceBuilder, backbone as sparse_backbone
 
 
 # Builds a graphml file of a hashtag networks, connected when hashtags are mentioned
@@ -52,7 +55,7 @@ class Options:
             '-o',
             dest='out_file',
             required=True,
-            help='GraphML file to write hashtag graph to.'
+            help='File to write hashtag graph to (.graphml, .npz or .parquet).'
         )
         self.parser.add_argument(
             '--ignore',
@@ -61,32 +64,22 @@ class Options:
             help='Hashtags to ignore (default: filenames)'
         )
         self.parser.add_argument(
-            '--min-weight',
-            dest='min_weight',
-            default=1,
-            type=int,
-            help='Smallest permitted count of co-mentioning authors (default: 1)'
+            '--projection',
+            action='store_true',
+            default=False,
+            dest='projection',
+            help='Link every pair of hashtags a user mentions (the projection of the user x hashtag network, weighted by --weighting and pruned by --top-k), rather than just each user\'s first hashtag to the others, unless --strict; JACCARD, COSINE and NEWMAN weights need a --min-weight below 1 (default: False)'
         )
-
+        add_projection_arguments(
+            self.parser, 1, 'Smallest permitted edge weight, e.g. count of co-mentioning authors'
+        )
+        add_backbone_arguments(self.parser)
 
 
     def parse(self, args=None):
         return self.parser.parse_args(args)
 
 
-def add_nodes(g, *nodes):
-    for n in nodes:
-        if n not in g:
-            g.add_node(n, label=n)
-
-
-def add_weighted_edge(g, u, v, delta=1, weight_property='weight'):
-    if not g.has_edge(u, v):
-        g.add_edge(u, v)
-        g[u][v][weight_property] = 0.0
-    g[u][v][weight_property] += float(delta)
-
-
 def eprint(*args, **kwargs):
     """Print to stderr"""
     print(*args, file=sys.stderr, **kwargs)
@@ -109,17 +102,26 @@ if __name__=='__main__':
     min_weight = opts.min_weight
     dry_run    = opts.dry_run
     strict     = opts.strict
+    projection = opts.projection
+    weighting  = opts.weighting
+    top_k      = opts.top_k
+    backbone   = opts.backbone
+    backbone_threshold = opts.backbone_threshold
 
     log('In JSON:     %s' % in_file)
-    log('Out GraphML: %s' % out_file)
+    log('Out graph:   %s' % out_file)
     log('Ignore:      %s' % ','.join(to_ignore))
-    log('Min weight:  %d' % min_weight)
+    log('Min weight:  %s' % min_weight)
     log('Dry run:     %s' % dry_run)
     log('Strict:      %s' % strict)
+    log('Projection:  %s' % projection)
+    log('Weighting:   %s' % weighting)
+    log('Top k:       %s' % top_k)
+    log('Backbone:    %s (%s)' % (backbone, backbone_threshold))
 
     # record the hashtag uses
-    users_hashtags = {}  # user_id : map(hashtags:counts)
-    cooccurring_hashtags = {}  # (ht1, ht2) : count, ht1 < ht2
+    users_hashtags = BipartiteBuilder()  # user x hashtag uses
+    cooccurring_hashtags = CooccurrenceBuilder()  # tweet x hashtag incidence
     tweet_count = 0
     with open(in_file, 'r', encoding='utf-8') as f:
         for line in f:  # .readlines():
@@ -131,56 +133,32 @@ if __name__=='__main__':
 
             user_id = tweet['user']['id_str']
             hashtags = [ht for ht in lowered_hashtags_from(tweet) if ht not in to_ignore]
-            if user_id not in users_hashtags:
-                users_hashtags[user_id] = dict([(ht, 1) for ht in hashtags])
-            else:
-                for ht in hashtags:
-                    if ht not in users_hashtags[user_id]:
-                        users_hashtags[user_id][ht] = 0
-                    users_hashtags[user_id][ht] += 1
-            if len(hashtags) > 1:
-                hashtags.sort()
-                ht1_idx = 0
-                ht2_idx = 1
-                for ht1_idx in range(0, len(hashtags) - 1):
-                    for ht2_idx in range(ht1_idx + 1, len(hashtags)):
-                        key = (hashtags[ht1_idx], hashtags[ht2_idx])
-                        if key not in cooccurring_hashtags:
-                            cooccurring_hashtags[key] = 0
-                        cooccurring_hashtags[key] += 1
+            users_hashtags.row(user_id)
+            for ht in hashtags:
+                users_hashtags.add(user_id, ht)
+            if strict:
+                cooccurring_hashtags.add_group(hashtags)
 
     log('')
     log('Tweets: %d' % tweet_count)
-    log('Users: %d' % len(users_hashtags))
-
-    # make the graph
-    g = nx.Graph()
-    if not strict:
-        for ht_counts in filter(lambda hts: len(hts) > 1, users_hashtags.values()):
-            hts_to_link = list(ht_counts.keys())
-            ht_1 = hts_to_link[0]
-            for ht_n in hts_to_link[1:]:
-                add_nodes(g, ht_1, ht_n)
-                add_weighted_edge(g, ht_1, ht_n)
+    log('Users: %d' % len(users_hashtags.row_labels))
+
+    # make the graph, stripping light edges from the sparse weights
+    if strict:
+        sg = cooccurring_hashtags.build(min_weight or 1)
+    elif projection:
+        sg = users_hashtags.project('cols', weighting, min_weight=min_weight, top_k=top_k)
     else:
-        for uv in cooccurring_hashtags:
-            add_nodes(g, uv[0], uv[1])
-            add_weighted_edge(g, uv[0], uv[1], delta=cooccurring_hashtags[uv])
-
-    # strip light edges
-    if min_weight > 1:
-        unwanted = [(u, v) for u, v, d in g.edges(data=True) if d['weight'] < min_weight]
-        # for u, v, d in g.edges(data=True):
-        #     if d['weight'] < min_weight:
-        #         unwanted.append( (u, v) )
-        g.remove_edges_from(unwanted)
-        unwanted = list(map(lambda pair: pair[0], filter(lambda pair: pair[1] == 0, g.degree())))
-        g.remove_nodes_from(unwanted)
+        sg = users_hashtags.star(min_weight)
+    if backbone:
+        n_edges = sg.number_of_edges()
+        sg = sparse_backbone(sg, backbone, backbone_threshold)
+        log('Backbone:    kept %d of %d edges' % (sg.number_of_edges(), n_edges))
 
     # write the graph
     if not dry_run:
-        nx.write_graphml(g, out_file)
+        write_graph(sg, out_file, node_attrs=lambda n: { 'label' : n })
 
     print('DONE - Hashtag Graph[nodes=%d,edges=%d,components=%d]' % (
-        len(g), len(g.edges()), nx.number_connected_components(g)
+        len(sg), sg.number_of_edges(), connected_components(sg.matrix, directed=False)[0]
     ))
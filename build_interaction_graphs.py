@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+from argparse import ArgumentParser
+
+
+import gzip
+import json
+import os
+import sys
+
+
+from basic_tweet_corpus_stats import extract_filename
+from interaction_graphs import ENTITY_GRAPH_TYPES, GRAPH_TYPES, InteractionGraphsBuilder, write_graphs
+
+
+# Builds the retweet, reply, quote, mention and retweet+quote graphs of a
+# corpus of tweets (and optionally its user->hashtag and user->URL graphs) in
+# one pass over it, writing each to <out_dir>/<base>-<type>.<format>.
+
+
+class Options:
+    def __init__(self):
+        self.usage = 'build_interaction_graphs.py -i <tweets.json> [-o <out_dir> -b <base_name> -g <RETWEET,REPLY,...> --hashtags --urls -f (graphml|npz|parquet)]'
+        self._init_parser()
+
+    def _init_parser(self):
+
+        self.parser = ArgumentParser(usage=self.usage,conflict_handler='resolve')
+        self.parser.add_argument(
+            '-v', '--verbose',
+            action='store_true',
+            default=False,
+            dest='verbose',
+            help='Turn on verbose logging (default: False)'
+        )
+        self.parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            default=False,
+            dest='dry_run',
+            help='Dry run mode - will not write graph files (default: False)'
+        )
+        self.parser.add_argument(
+            '-i',
+            dest='in_file',
+            default='-',
+            help='File of tweets to read, gzipped if it ends in z (default: stdin)'
+        )
+        self.parser.add_argument(
+            '-o', '--out-dir',
+            dest='out_dir',
+            default='.',
+            help='Directory to write the graphs to (default: .)'
+        )
+        self.parser.add_argument(
+            '-b', '--base-name',
+            dest='base_name',
+            default=None,
+            help='Start of each graph filename (default: the input filename, without extensions)'
+        )
+        self.parser.add_argument(
+            '-g', '--graph-types',
+            dest='g_types',
+            default=','.join(GRAPH_TYPES),
+            help='Comma separated interaction graphs to build (default: %s)' % ','.join(GRAPH_TYPES)
+        )
+        self.parser.add_argument(
+            '--hashtags',
+            action='store_true',
+            default=False,
+            dest='hashtags',
+            help='Also build the graph of users to the hashtags they use (default: False)'
+        )
+        self.parser.add_argument(
+            '--urls',
+            action='store_true',
+            default=False,
+            dest='urls',
+            help='Also build the graph of users to the URLs they post (default: False)'
+        )
+        self.parser.add_argument(
+            '-f', '--format',
+            dest='format',
+            default='graphml',
+            choices=['graphml', 'npz', 'parquet'],
+            help='Format to write the graphs in (default: graphml)'
+        )
+
+
+    def parse(self, args=None):
+        return self.parser.parse_args(args)
+
+
+def stream_tweets(file=None):
+    """Yields the tweets in the given file (gzipped if it ends in z) or stdin."""
+    if file and file != '-':
+        opener = gzip.open if file[-1] in 'Zz' else open
+        with opener(file, 'rt', encoding='utf-8') as f:
+            for l in f:
+                if l.strip(): yield json.loads(l)
+    else:
+        for l in sys.stdin:
+            if l.strip(): yield json.loads(l)
+
+
+def eprint(*args, **kwargs):
+    """Print to stderr"""
+    print(*args, file=sys.stderr, **kwargs)
+
+
+DEBUG=False
+def log(msg):
+    if DEBUG: eprint(msg)
+
+
+if __name__=='__main__':
+    options = Options()
+    opts = options.parse(sys.argv[1:])
+
+    DEBUG=opts.verbose
+
+    in_file = opts.in_file
+    out_dir = opts.out_dir
+    base    = opts.base_name or extract_filename(in_file, 'tweets').split('.')[0]
+    g_types = [g for g in opts.g_types.split(',') if g]
+    if opts.hashtags: g_types.append('HASHTAG')
+    if opts.urls: g_types.append('URL')
+
+    for g_type in g_types:
+        if g_type not in GRAPH_TYPES + ENTITY_GRAPH_TYPES:
+            eprint('Unknown graph type: %s (options: %s)' % (g_type, ','.join(GRAPH_TYPES)))
+            sys.exit(1)
+
+    log('In:          %s' % in_file)
+    log('Out dir:     %s' % out_dir)
+    log('Base name:   %s' % base)
+    log('Graph types: %s' % ','.join(g_types))
+    log('Format:      %s' % opts.format)
+
+    builder = InteractionGraphsBuilder(g_types)
+    for tweet in stream_tweets(in_file):
+        builder.add(tweet)
+        if DEBUG and builder.tweet_count %  1000 == 0: eprint('.', end='', flush=True)
+        if DEBUG and builder.tweet_count % 50000 == 0: eprint(' %10d' % builder.tweet_count)
+    log('')
+    log('Tweets: %d' % builder.tweet_count)
+
+    graphs = builder.build()
+    for g_type in g_types:
+        log('%-8s %d nodes, %d edges' % (g_type, len(graphs[g_type]), graphs[g_type].number_of_edges()))
+
+    if not opts.dry_run:
+        if not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        for g_type, path in write_graphs(graphs, out_dir, base, opts.format).items():
+            log('Wrote %s graph to %s' % (g_type, path))
+
+    print('DONE - %d tweets, %s' % (builder.tweet_count, ', '.join(
+        '%s[nodes=%d,edges=%d]' % (g_type, len(graphs[g_type]), graphs[g_type].number_of_edges())
+        for g_type in g_types
+    )))
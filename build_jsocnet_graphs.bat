@@ -10,8 +10,8 @@ set BAT_DIR=%~dp0
 set FN_BASE=%1
 set OUT_DIR=%2
 
-python %BAT_DIR%\csv_to_weighted_digraph.py --csvfile %FN_BASE%-retweets.csv --header --src-col 1 --tgt-col 2 --kind-col 4 --out-file %OUT_DIR%\%FN_BASE%-retweets.graphml
-python %BAT_DIR%\csv_to_weighted_digraph.py --csvfile %FN_BASE%-mentions.csv --header --src-col 1 --tgt-col 2 --kind-col 4 --out-file %OUT_DIR%\%FN_BASE%-mentions.graphml
-python %BAT_DIR%\csv_to_weighted_digraph.py --csvfile %FN_BASE%-replies.csv  --header --src-col 1 --tgt-col 2 --kind-col 4 --out-file %OUT_DIR%\%FN_BASE%-replies.graphml
-python %BAT_DIR%\csv_to_weighted_digraph.py --csvfile %FN_BASE%-quotes.csv   --header --src-col 1 --tgt-col 2 --kind-col 4 --out-file %OUT_DIR%\%FN_BASE%-quotes.graphml
- 
\ No newline at end of file
+python %BAT_DIR%\csv_to_weighted_digraph.py --header --jobs 4 ^
+  --spec %FN_BASE%-retweets.csv,1,2,4,%OUT_DIR%\%FN_BASE%-retweets.graphml ^
+  --spec %FN_BASE%-mentions.csv,1,2,4,%OUT_DIR%\%FN_BASE%-mentions.graphml ^
+  --spec %FN_BASE%-replies.csv,1,2,4,%OUT_DIR%\%FN_BASE%-replies.graphml ^
+  --spec %FN_BASE%-quotes.csv,1,2,4,%OUT_DIR%\%FN_BASE%-quotes.graphml
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+from argparse import ArgumentParser
+
+
+import gzip
+import json
+import sys
+
+
+from interaction_graphs import ENTITY_GRAPH_TYPES, GRAPH_TYPES
+from temporal_edge_store import TemporalEdgeStore
+
+
+# Reads a corpus of tweets once and saves all its interactions, sorted by
+# time, in a temporal edge store (.npz), from which extract_window_graph.py
+# and compare_centralities_longitudinally_from_tweets.py can build the graph
+# of any window without going back to the tweets.
+
+
+class Options:
+    def __init__(self):
+        self.usage = 'build_temporal_edge_store.py -i <tweets.json> -o <store.npz> [-g <RETWEET,REPLY,...> --hashtags --urls]'
+        self._init_parser()
+
+    def _init_parser(self):
+
+        self.parser = ArgumentParser(usage=self.usage,conflict_handler='resolve')
+        self.parser.add_argument(
+            '-v', '--verbose',
+            action='store_true',
+            default=False,
+            dest='verbose',
+            help='Turn on verbose logging (default: False)'
+        )
+        self.parser.add_argument(
+            '-i',
+            dest='in_file',
+            default='-',
+            help='File of tweets to read, gzipped if it ends in z (default: stdin)'
+        )
+        self.parser.add_argument(
+            '-o',
+            dest='out_file',
+            required=True,
+            help='File to save the store to (.npz)'
+        )
+        self.parser.add_argument(
+            '-g', '--graph-types',
+            dest='g_types',
+            default=','.join(GRAPH_TYPES),
+            help='Comma separated interaction types to store (default: %s)' % ','.join(GRAPH_TYPES)
+        )
+        self.parser.add_argument(
+            '--hashtags',
+            action='store_true',
+            default=False,
+            dest='hashtags',
+            help='Also store the uses of hashtags (default: False)'
+        )
+        self.parser.add_argument(
+            '--urls',
+            action='store_true',
+            default=False,
+            dest='urls',
+            help='Also store the posting of URLs (default: False)'
+        )
+
+
+    def parse(self, args=None):
+        return self.parser.parse_args(args)
+
+
+def stream_tweets(file=None):
+    """Yields the tweets in the given file (gzipped if it ends in z) or stdin."""
+    if file and file != '-':
+        opener = gzip.open if file[-1] in 'Zz' else open
+        with opener(file, 'rt', encoding='utf-8') as f:
+            for l in f:
+                if l.strip(): yield json.loads(l)
+    else:
+        for l in sys.stdin:
+            if l.strip(): yield json.loads(l)
+
+
+def eprint(*args, **kwargs):
+    """Print to stderr"""
+    print(*args, file=sys.stderr, **kwargs)
+
+
+DEBUG=False
+def log(msg):
+    if DEBUG: eprint(msg)
+
+
+if __name__=='__main__':
+    options = Options()
+    opts = options.parse(sys.argv[1:])
+
+    DEBUG=opts.verbose
+
+    g_types = [g for g in opts.g_types.split(',') if g]
+    if opts.hashtags: g_types.append('HASHTAG')
+    if opts.urls: g_types.append('URL')
+    for g_type in g_types:
+        if g_type not in GRAPH_TYPES + ENTITY_GRAPH_TYPES:
+            options.parser.error('Unknown graph type: %s (options: %s)' % (g_type, ','.join(GRAPH_TYPES)))
+    if not opts.out_file.endswith('.npz'):
+        options.parser.error('The store must be saved to a .npz file')
+
+    log('In:          %s' % opts.in_file)
+    log('Out:         %s' % opts.out_file)
+    log('Graph types: %s' % ','.join(g_types))
+
+    store = TemporalEdgeStore.from_tweets(stream_tweets(opts.in_file), g_types)
+    store.save(opts.out_file)
+
+    (first, last) = store.time_span()
+    print('DONE - Store[tweets=%d,interactions=%d,nodes=%d,span=%ss]' % (
+        len(store.tweet_ts), len(store), len(store.labels), (last - first) if first is not None else 0
+    ))
@@ -6,16 +6,49 @@ from copy import deepcopy
 
 
 import csv
-import heapq
-import networkx as nx
 import ntpath  # https://stackoverflow.com/a/8384788
 import os
 import sys
 
 
+from centrality_cache import get_cached, put_cached
+from centrality_functions import add_centrality_arguments
+from graph_io import read_graph
+from rank_tables import RankTable
+from sparse_centralities import centralities, scorer_args
+
+
+# the metrics that can be computed (by default, the first four; HARMONIC, a
+# seeded estimate, is only computed if asked for), with their columns in the
+# averages line and the top x table
+METRICS = [
+    'DEGREE', 'BETWEENNESS', 'CLOSENESS', 'EIGENVECTOR', 'PAGERANK', 'HITS_HUB', 'HITS_AUTHORITY', 'KATZ',
+    'HARMONIC'
+]
+DEFAULT_METRICS = ['DEGREE', 'BETWEENNESS', 'CLOSENESS', 'EIGENVECTOR']
+METRIC_COLUMNS = {
+    'DEGREE'         : ('AveDegC',     'DegNodeID',      'DegC'),
+    'BETWEENNESS'    : ('AveBetwC',    'BetwNodeID',     'BetwC'),
+    'CLOSENESS'      : ('AveCloseC',   'CloseNodeID',    'CloseC'),
+    'EIGENVECTOR'    : ('AveEigenC',   'EigenNodeID',    'EigenC'),
+    'PAGERANK'       : ('AvePageRank', 'PageRankNodeID', 'PageRank'),
+    'HITS_HUB'       : ('AveHubC',     'HubNodeID',      'HubC'),
+    'HITS_AUTHORITY' : ('AveAuthC',    'AuthNodeID',     'AuthC'),
+    'KATZ'           : ('AveKatzC',    'KatzNodeID',     'KatzC'),
+    'HARMONIC'       : ('AveHarmC',    'HarmNodeID',     'HarmC')
+}
+ITERATED_NAMES = {
+    'EIGENVECTOR'    : 'Eigenvector centrality',
+    'PAGERANK'       : 'PageRank',
+    'HITS_HUB'       : 'HITS',
+    'HITS_AUTHORITY' : 'HITS',
+    'KATZ'           : 'Katz centrality'
+}
+
+
 class Options:
     def __init__(self):
-        self.usage = 'centralities.py -f <graphmlfilename>'
+        self.usage = 'centralities.py -f <graphmlfilename> [-m <DEGREE,BETWEENNESS,...>] [-j <jobs>] [--values-file <values.csv>]'
         self._init_parser()
 
     def _init_parser(self):
@@ -35,6 +68,28 @@ class Options:
             type=int,
             help='Top x results to list (default: 20)'
         )
+        add_centrality_arguments(self.parser)
+        self.parser.add_argument(
+            '-m', '--metrics',
+            dest='metrics',
+            default=','.join(DEFAULT_METRICS),
+            help='Comma separated centralities to compute, of %s (default: %s)' % (
+                ','.join(METRICS), ','.join(DEFAULT_METRICS)
+            )
+        )
+        self.parser.add_argument(
+            '-j', '--jobs',
+            dest='jobs',
+            default=1,
+            type=int,
+            help='Number of worker processes to compute the centralities in at the same time, sharing the graph (default: 1)'
+        )
+        self.parser.add_argument(
+            '--values-file',
+            dest='values_file',
+            default=None,
+            help='CSV file to write every node\'s centralities to, as well as printing the top x (default: None)'
+        )
         self.parser.add_argument(
             '-f', '--file',
             dest='graphml_file',
@@ -56,35 +111,43 @@ def extract_filename(filepath, default_name='UNKNOWN.txt'):
     return os.path.splitext(filename)[0]
 
 
-def get_top(top_x, kv_map):
-    heap = []
-    for k in kv_map:
-        v = kv_map[k]
-        # If we have not yet found top_x items, or the current item is larger
-        # than the smallest item on the heap,
-        if len(heap) < top_x or v > heap[0][1]:  # [1] is the value
-            # If the heap is full, remove the smallest element on the heap.
-            if len(heap) == top_x: heapq.heappop( heap )
-            # Add the current element as the new smallest.
-            heapq.heappush( heap, (k,v) )
-
-    # Sort tuples by largest value first
-    heap.sort(key=lambda kv: kv[1], reverse=True)
-
-    return heap
-
-
 def average(l):
     return sum(l)/len(l) if len(l) else 0
 
 
 def pad(kv_list, k, v):
     if len(kv_list) < k:
-        return kv_list + [deepcopy(v) for i in k - len(kv_list)]
+        return kv_list + [deepcopy(v) for i in range(k - len(kv_list))]
     else:
         return kv_list
 
 
+def warn_unconverged(name, info):
+    if not info['converged']:
+        eprint('%s did not converge within %d iterations (last change: %.3g)' % (
+            name, info['iterations'], info['error']
+        ))
+
+
+def report(metric, info, n, top_x):
+    """Prints what's worth knowing of how metric was computed to stderr."""
+    if metric == 'BETWEENNESS' and info:
+        eprint('Betweenness from %d of %d sources: top %d %.0f%% stable, 95%% error <= %.3g' % (
+            info['samples'], n, top_x, 100 * info['agreement'], info['error']
+        ))
+    elif metric in ITERATED_NAMES:
+        warn_unconverged(ITERATED_NAMES[metric], info)
+
+
+def write_values(out_file, labels, metrics, cs):
+    """Writes each node's value of each of the metrics (blank if it has none) to a CSV file."""
+    with open(out_file, 'w', encoding='utf-8', newline='') as f:
+        csv_f = csv.writer(f)
+        csv_f.writerow(['NodeID'] + metrics)
+        for l in labels:
+            csv_f.writerow([l] + [cs[m].get(l, '') for m in metrics])
+
+
 def eprint(*args, **kwargs):
     """Print to stderr"""
     print(*args, file=sys.stderr, **kwargs)
@@ -102,33 +165,45 @@ if __name__=='__main__':
     DEBUG=opts.verbose
     log('Inspecting GraphML file %s' % opts.graphml_file)
 
+    metrics = [m for m in opts.metrics.split(',') if m]
+    for m in metrics:
+        if m not in METRICS:
+            options.parser.error('Unknown centrality: %s (options: %s)' % (m, ','.join(METRICS)))
+    if opts.jobs < 1:
+        options.parser.error('--jobs must be at least 1')
+
     gf = opts.graphml_file
     fn = extract_filename(gf)
-    g  = nx.read_graphml(gf)
-
-    degree_cs = nx.degree_centrality(g)
-    betw_cs   = nx.betweenness_centrality(g, weight='weight')
-    close_cs  = nx.closeness_centrality(g, distance='weight')
-    eigen_cs  = nx.eigenvector_centrality(g, weight='weight')
-
-    ave_degree_c = average(degree_cs.values())
-    ave_betw_c   = average(betw_cs.values())
-    ave_close_c  = average(close_cs.values())
-    ave_eigen_c  = average(eigen_cs.values())
+    (sg, _, _, _) = read_graph(gf)
+
+    # take what we can from the cache, and compute the rest all at once
+    c_opts = vars(opts)
+    cs = {}
+    for m in metrics:
+        cached = get_cached(sg, m, c_opts, opts.cache)
+        if cached is not None:
+            log('%s: cached' % m)
+            cs[m] = cached
+    missing = [m for m in metrics if m not in cs]
+    results = centralities(sg, dict((m, scorer_args(m, c_opts)) for m in missing), opts.jobs)
+    reported = set()  # infos, which HITS hubs and authorities share
+    for m in missing:
+        (scores, info) = results[m]
+        if id(info) not in reported:
+            report(m, info, len(sg), opts.top_x)
+            reported.add(id(info))
+        cs[m] = dict((l, v) for l, v in zip(sg.labels, scores.tolist()) if v == v)  # no NaNs
+        put_cached(sg, m, c_opts, cs[m], opts.cache)
+
+    if opts.values_file:
+        write_values(opts.values_file, sg.labels, metrics, cs)
 
     x = opts.top_x
-    top_x_degree_cs = pad(get_top(x, degree_cs), x, ('', 0))
-    top_x_betw_cs   = pad(get_top(x, betw_cs),   x, ('', 0))
-    top_x_close_cs  = pad(get_top(x, close_cs),  x, ('', 0))
-    top_x_eigen_cs  = pad(get_top(x, eigen_cs),  x, ('', 0))
+    tops = [pad(RankTable.from_dict(cs[m]).top_items(x), x, ('', 0)) for m in metrics]
 
-    print('Filename,AveDegC,AveBetwC,AveCloseC,AveEigenC')
-    print('%s,%s,%s,%s,%s\n' % (fn, ave_degree_c, ave_betw_c, ave_close_c, ave_eigen_c))
+    print(','.join(['Filename'] + [METRIC_COLUMNS[m][0] for m in metrics]))
+    print('%s\n' % ','.join([fn] + [str(average(list(cs[m].values()))) for m in metrics]))
 
-    print('DegNodeID,DegC,BetwNodeID,BetwC,CloseNodeID,CloseC,EigenNodeID,EigenC')
+    print(','.join('%s,%s' % METRIC_COLUMNS[m][1:] for m in metrics))
     for i in range(x):
-        d = top_x_degree_cs[i]
-        b = top_x_betw_cs[i]
-        c = top_x_close_cs[i]
-        e = top_x_eigen_cs[i]
-        print(','.join(['"%s",%s']*4) % (d[0],d[1],b[0],b[1],c[0],c[1],e[0],e[1]))
+        print(','.join('"%s",%s' % top[i] for top in tops))
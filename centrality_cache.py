@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+
+import hashlib
+import json
+import numpy as np
+import os
+import weakref
+
+
+from sparse_graphs import SparseGraph
+
+
+#
+# Centralities kept on disk as .npz files of (labels, values) arrays, named by
+# a hash of the graph's edge list, the centrality type and the options it was
+# computed with, so the same graph's centralities are only computed once, no
+# matter how many other graphs it is compared against (set
+# CENTRALITY_CACHE_DIR to '' to turn this off).
+#
+
+
+CACHE_DIR = os.environ.get(
+    'CENTRALITY_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'centralities')
+)
+
+# the options (by dest) each centrality type's values depend on
+CENTRALITY_PARAMS = {
+    'DEGREE'         : [],
+    'BETWEENNESS'    : ['betweenness_samples', 'betweenness_tolerance', 'seed', 'top_x'],
+    'CLOSENESS'      : ['closeness_samples', 'largest_component', 'seed'],
+    'EIGENVECTOR'    : ['power_tolerance', 'power_max_iter'],
+    'PAGERANK'       : ['pagerank_damping', 'power_tolerance', 'power_max_iter'],
+    'HITS_HUB'       : ['power_tolerance', 'power_max_iter'],
+    'HITS_AUTHORITY' : ['power_tolerance', 'power_max_iter'],
+    'KATZ'           : ['katz_alpha', 'power_tolerance', 'power_max_iter'],
+    'HARMONIC'       : ['harmonic_registers', 'seed']
+}
+# the option that turns sampling on for each sampled centrality type, and the
+# options that only matter when it's on
+SAMPLES_PARAMS = {
+    'BETWEENNESS' : ('betweenness_samples', ['betweenness_tolerance', 'seed', 'top_x']),
+    'CLOSENESS'   : ('closeness_samples', ['seed'])
+}
+# part of every key, so bumping it (e.g. when a scorer's values change) retires old entries
+CACHE_VERSION = 3
+
+
+_graph_hashes = weakref.WeakKeyDictionary()  # so each graph is only hashed once
+
+
+def graph_hash(g, weight='weight'):
+    """
+    A hash of g's (a networkx graph or a SparseGraph) nodes and weighted
+    edges, which doesn't depend on the order they were added in.
+    """
+    if g in _graph_hashes:
+        return _graph_hashes[g]
+    sg = g if isinstance(g, SparseGraph) else SparseGraph.from_networkx(g, weight)
+    labels = [str(l) for l in sg.labels]
+    order = sorted(range(len(labels)), key=labels.__getitem__)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    m = sg.matrix.tocoo()
+    (rows, cols) = (rank[m.row], rank[m.col])
+    edges = np.lexsort((cols, rows))
+
+    h = hashlib.sha1()
+    h.update(b'directed' if sg.directed else b'undirected')
+    h.update('\0'.join(labels[i] for i in order).encode('utf-8'))
+    h.update(rows[edges].astype('<i8').tobytes())
+    h.update(cols[edges].astype('<i8').tobytes())
+    h.update(m.data[edges].astype('<f8').tobytes())
+    _graph_hashes[g] = h.hexdigest()
+    return _graph_hashes[g]
+
+
+def centrality_params(c_type, c_opts):
+    """
+    The { option : value } of c_opts that c_type's values depend on (the
+    sampling-only options only count if it's sampled).
+    """
+    names = CENTRALITY_PARAMS.get(c_type, sorted(c_opts.keys()))
+    if c_type in SAMPLES_PARAMS:
+        (samples, sampling_only) = SAMPLES_PARAMS[c_type]
+        if c_opts.get(samples) is None:
+            names = [n for n in names if n not in sampling_only]
+    return dict((n, c_opts.get(n)) for n in names)
+
+
+def cache_path(g, c_type, c_opts):
+    params = json.dumps(centrality_params(c_type, c_opts), sort_keys=True)
+    key = hashlib.sha1(
+        ('%d|%s|%s|%s' % (CACHE_VERSION, graph_hash(g), c_type, params)).encode('utf-8')
+    ).hexdigest()
+    return os.path.join(CACHE_DIR, '%s-%s.npz' % (c_type, key))
+
+
+def load_centralities(path):
+    with np.load(path) as f:
+        return dict(zip(f['labels'].tolist(), f['values'].tolist()))
+
+
+def save_centralities(cs, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = '%s.%d.npz' % (path[:-4], os.getpid())  # so readers never see half a file
+    np.savez(partial, labels=np.array(list(cs.keys())), values=np.array(list(cs.values()), dtype=np.float64))
+    os.replace(partial, path)
+
+
+def get_cached(g, c_type, c_opts, cache=True):
+    """g's c_type centralities (as computed with c_opts) from the cache, or None."""
+    if not (cache and CACHE_DIR):
+        return None
+    path = cache_path(g, c_type, c_opts)
+    return load_centralities(path) if os.path.exists(path) else None
+
+
+def put_cached(g, c_type, c_opts, cs, cache=True):
+    """Saves g's c_type centralities cs (as computed with c_opts) in the cache."""
+    if cache and CACHE_DIR:
+        save_centralities(cs, cache_path(g, c_type, c_opts))
+
+
+def cached_centralities(g, c_type, c_opts, compute, cache=True):
+    """
+    g's c_type centralities (as computed with c_opts) from the cache, or from
+    compute() (and then saved in the cache) if they aren't there, unless
+    cache is False.
+    """
+    cs = get_cached(g, c_type, c_opts, cache)
+    if cs is None:
+        cs = compute()
+        put_cached(g, c_type, c_opts, cs, cache)
+    return cs
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+
+import networkx as nx
+import sys
+
+
+from sparse_centralities import (
+    betweenness_centrality, closeness_centrality, eigenvector_centrality, harmonic_centrality, hits_centralities,
+    katz_centrality, pagerank_centrality
+)
+
+
+#
+# The centralities compare_centralities.py and
+# compare_centralities_longitudinally_from_tweets.py rank nodes by, as
+# functions of a networkx graph and the options (by dest) those scripts share
+# with centralities.py, along with the command line arguments that set them.
+# Set DEBUG to log how sampled and iterative centralities were computed.
+#
+
+
+# the options (by dest) passed on to the CENTRALITY_FUNCTIONS
+CENTRALITY_OPTIONS = [
+    'betweenness_samples', 'betweenness_tolerance', 'betweenness_jobs', 'closeness_samples', 'largest_component',
+    'power_tolerance', 'power_max_iter', 'pagerank_damping', 'katz_alpha', 'harmonic_registers',
+    'seed'
+]
+
+
+def betweenness(g, betweenness_samples=None, betweenness_tolerance=0.01, betweenness_jobs=1, seed=0, top_x=100,
+                **opts):
+    """Betweenness centralities, estimated from sampled sources if betweenness_samples is given."""
+    (cs, info) = betweenness_centrality(
+        g, betweenness_samples, top_x=top_x, tolerance=betweenness_tolerance, seed=seed, jobs=betweenness_jobs
+    )
+    if info:
+        log('Betweenness from %d of %d sources: top %d %.0f%% stable, 95%% error <= %.3g' % (
+            info['samples'], len(g), top_x, 100 * info['agreement'], info['error']
+        ))
+    return cs
+
+
+def closeness(g, closeness_samples=None, largest_component=False, seed=0, **opts):
+    """Closeness centralities, estimated from sampled sources if closeness_samples is given."""
+    return closeness_centrality(g, largest_only=largest_component, samples=closeness_samples, seed=seed)
+
+
+def iterated(name, f, g, *args):
+    """f(g, *args), the results of an iterative centrality, with a warning if it didn't converge."""
+    results = f(g, *args)
+    info = results[-1]
+    log('%s: %d iterations' % (name, info['iterations']))
+    if not info['converged']:
+        eprint('%s did not converge within %d iterations (last change: %.3g)' % (
+            name, info['iterations'], info['error']
+        ))
+    return results
+
+
+def eigenvector(g, power_tolerance=None, power_max_iter=1000, **opts):
+    return iterated('Eigenvector centrality', eigenvector_centrality, g, power_tolerance or 1e-6, power_max_iter)[0]
+
+
+def pagerank(g, pagerank_damping=0.85, power_tolerance=None, power_max_iter=1000, **opts):
+    return iterated('PageRank', pagerank_centrality, g, pagerank_damping, power_tolerance or 1e-6, power_max_iter)[0]
+
+
+def hits(g, authorities=False, power_tolerance=None, power_max_iter=1000, **opts):
+    """HITS hub (or authority) scores, which share the one iteration."""
+    results = iterated('HITS', hits_centralities, g, power_tolerance or 1e-8, power_max_iter)
+    return results[1] if authorities else results[0]
+
+
+def katz(g, katz_alpha=None, power_tolerance=None, power_max_iter=1000, **opts):
+    return iterated('Katz centrality', katz_centrality, g, katz_alpha, 1.0, power_tolerance or 1e-6, power_max_iter)[0]
+
+
+def harmonic(g, harmonic_registers=64, seed=0, **opts):
+    """Harmonic centralities, estimated with HyperLogLog counters of harmonic_registers registers (HyperBall)."""
+    return harmonic_centrality(g, harmonic_registers, seed)[0]
+
+CENTRALITY_FUNCTIONS = {
+    'DEGREE'         : lambda g, **opts: nx.degree_centrality(g),
+    'BETWEENNESS'    : betweenness,
+    'CLOSENESS'      : closeness,
+    'EIGENVECTOR'    : eigenvector,
+    'PAGERANK'       : pagerank,
+    'HITS_HUB'       : hits,
+    'HITS_AUTHORITY' : lambda g, **opts: hits(g, authorities=True, **opts),
+    'KATZ'           : katz,
+    'HARMONIC'       : harmonic
+}
+
+
+def add_centrality_arguments(parser):
+    """Adds the arguments setting the CENTRALITY_OPTIONS, and --no-cache, to parser."""
+    parser.add_argument(
+        '--betweenness-samples',
+        dest='betweenness_samples',
+        default=None,
+        type=int,
+        help='Estimate betweenness from at most this many randomly sampled source nodes, rather than from all of them (default: None, i.e. exact)'
+    )
+    parser.add_argument(
+        '--betweenness-tolerance',
+        dest='betweenness_tolerance',
+        default=0.01,
+        type=float,
+        help='Stop sampling sources once the top x nodes change by no more than this proportion between batches (default: 0.01)'
+    )
+    parser.add_argument(
+        '--betweenness-jobs',
+        dest='betweenness_jobs',
+        default=1,
+        type=int,
+        help='Number of worker processes to split betweenness\' source nodes over (default: 1)'
+    )
+    parser.add_argument(
+        '--closeness-samples',
+        dest='closeness_samples',
+        default=None,
+        type=int,
+        help='Estimate closeness from the distances from at most this many randomly sampled source nodes, rather than from all of them (default: None, i.e. exact)'
+    )
+    parser.add_argument(
+        '--largest-component',
+        action='store_true',
+        default=False,
+        dest='largest_component',
+        help='Only score closeness within the largest (weakly) connected component (default: False)'
+    )
+    parser.add_argument(
+        '--power-tolerance',
+        dest='power_tolerance',
+        default=None,
+        type=float,
+        help='Stop the power iterations of EIGENVECTOR, PAGERANK, HITS_* and KATZ once they change by less than this (per node, but for HITS) (default: 1e-6, or 1e-8 for HITS)'
+    )
+    parser.add_argument(
+        '--power-max-iter',
+        dest='power_max_iter',
+        default=1000,
+        type=int,
+        help='Most power iterations to run for EIGENVECTOR, PAGERANK, HITS_* and KATZ (default: 1000)'
+    )
+    parser.add_argument(
+        '--pagerank-damping',
+        dest='pagerank_damping',
+        default=0.85,
+        type=float,
+        help='PageRank\'s damping factor (default: 0.85)'
+    )
+    parser.add_argument(
+        '--katz-alpha',
+        dest='katz_alpha',
+        default=None,
+        type=float,
+        help='Katz centrality\'s attenuation factor, which must be less than 1 / the largest eigenvalue of the weighted adjacency matrix (default: 0.9 / that eigenvalue)'
+    )
+    parser.add_argument(
+        '--harmonic-registers',
+        dest='harmonic_registers',
+        default=64,
+        type=int,
+        help='HyperLogLog registers per node (a power of two, >= 16) for HARMONIC, whose relative error is about 1.04 / sqrt(registers) (default: 64)'
+    )
+    parser.add_argument(
+        '--seed',
+        dest='seed',
+        default=0,
+        type=int,
+        help='Random seed for sampled (and HARMONIC\'s hashed) centralities (default: 0)'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_false',
+        default=True,
+        dest='cache',
+        help='Compute the centralities afresh rather than reusing (and saving) those in the centrality cache (default: use it)'
+    )
+
+
+def eprint(*args, **kwargs):
+    """Print to stderr"""
+    print(*args, file=sys.stderr, **kwargs)
+
+
+DEBUG=False
+def log(msg):
+    if DEBUG: eprint(msg)
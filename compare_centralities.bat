@@ -15,7 +15,7 @@ rem if "%G2%" == "" set G2=graphs\rapid
 
 
 echo MENTIONS - %G1% %G2%
-echo Interaction,Centrality,top_x,in_common,tau,tau_p-value,rho,rho_p-value
+echo Interaction,Centrality,top_x,in_common,tau,tau_p-value,rho,rho_p-value,wtau,rbo
 echo|set /p="MENTION,DEGREE,"
 python %CALC% -x %TOPX% -f1 %G1%-mentions.graphml -f2 %G2%-mentions.graphml -t DEGREE      -o %OUT_PREFIX%-mentions-DEGREE.csv %EXTRA_ARGS%
 echo|set /p="MENTION,BETWEENNESS,"
@@ -35,7 +35,7 @@ rem python %CALC% -x %TOPX% -f1 %G1%-quotes.graphml -f2 %G2%-quotes.graphml -t E
 
 echo ""
 echo REPLIES - %G1% %G2%
-echo Interaction,Centrality,top_x,in_common,tau,tau_p-value,rho,rho_p-value
+echo Interaction,Centrality,top_x,in_common,tau,tau_p-value,rho,rho_p-value,wtau,rbo
 echo|set /p="REPLY,DEGREE,"
 python %CALC% -x %TOPX% -f1 %G1%-replies.graphml -f2 %G2%-replies.graphml -t DEGREE      -o %OUT_PREFIX%-replies-DEGREE.csv %EXTRA_ARGS%
 echo|set /p="REPLY,BETWEENNESS,"
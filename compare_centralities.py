@@ -5,32 +5,23 @@ from argparse import ArgumentParser
 from copy import deepcopy
 
 
+import centrality_functions
 import csv
-import heapq
-import networkx as nx
 import ntpath  # https://stackoverflow.com/a/8384788
-import operator
 import os
-import scipy.stats as stats
 import sys
 
 
-def safe_eigenvector(g):
-    try:
-        return nx.eigenvector_centrality(g, weight='weight')
-    except nx.PowerIterationFailedConvergence:
-        log('power iteration failed to converge within 100 iterations')
-        return dict([(n, 0.0) for n in g.nodes()])
+from centrality_cache import cached_centralities
+from centrality_functions import CENTRALITY_FUNCTIONS, CENTRALITY_OPTIONS, add_centrality_arguments
+from graph_io import read_networkx
+from rank_correlations import similarities, similarity
+from rank_tables import RankTable
+
 
-CENTRALITY_FUNCTIONS = {
-    'DEGREE'      : lambda g: nx.degree_centrality(g),
-    'BETWEENNESS' : lambda g: nx.betweenness_centrality(g, weight='weight'),
-    'CLOSENESS'   : lambda g: nx.closeness_centrality(g, distance='weight'),
-    'EIGENVECTOR' : safe_eigenvector
-}
 class Options:
     def __init__(self):
-        self.usage = 'compare_centralities.py -f1 <graphmlfilename> -f2 <graphmlfilename> -t (DEGREE|BETWEENNESS|CLOSENESS|EIGENVECTOR) [-x <top_x>]'
+        self.usage = 'compare_centralities.py (-f1 <graphmlfilename> -f2 <graphmlfilename> | --files <graphmlfilename,...>) -t (DEGREE|BETWEENNESS|CLOSENESS|EIGENVECTOR|PAGERANK|HITS_HUB|HITS_AUTHORITY|KATZ|HARMONIC) [-x <top_x>]'
         self._init_parser()
 
     def _init_parser(self):
@@ -57,6 +48,7 @@ class Options:
             type=int,
             help='Top x results to list (default: 20)'
         )
+        add_centrality_arguments(self.parser)
         self.parser.add_argument(
             '-t', '--type',
             dest='c_type',
@@ -67,20 +59,32 @@ class Options:
         self.parser.add_argument(
             '-f1', '--file1',
             dest='graphml_file1',
-            required=True,
-            help='GraphML filename to read'
+            default=None,
+            help='GraphML filename to read (required unless --files is used)'
         )
         self.parser.add_argument(
             '-f2', '--file2',
             dest='graphml_file2',
-            required=True,
-            help='GraphML filename to read'
+            default=None,
+            help='GraphML filename to read (required unless --files is used)'
+        )
+        self.parser.add_argument(
+            '--files',
+            dest='graphml_files',
+            default=None,
+            help='Comma separated graph files to compare every pair of, instead of -f1 and -f2'
+        )
+        self.parser.add_argument(
+            '--matrix-file',
+            dest='matrix_file',
+            default='centrality_matrix.csv',
+            help='Where to write the matrices of statistics comparing each pair of --files (default: centrality_matrix.csv)'
         )
         self.parser.add_argument(
             '-o', '--out-file',
             dest='out_file',
             default='ranked_nodes.csv',
-            help='Top common ranked nodes from each file (default: ranked_nodes.csv)'
+            help='Top common ranked nodes from each file (default: ranked_nodes.csv); with --files, one file per pair, named after this one and the pair'
         )
 
 
@@ -104,27 +108,7 @@ def extract_parent_dir(filepath, default_dir='./'):
     return os.path.abspath(os.path.join(filepath, os.pardir))
 
 
-def get_top(top_x, kv_tuples):
-    heap = []
-    for kv in kv_tuples:
-        k,v = kv
-        # v = kv_map[k]
-        # If we have not yet found top_x items, or the current item is larger
-        # than the smallest item on the heap,
-        if len(heap) < top_x or v > heap[0][1]:  # [1] is the value
-            # If the heap is full, remove the smallest element on the heap.
-            if len(heap) == top_x: heapq.heappop( heap )
-            # Add the current element as the new smallest.
-            heapq.heappush( heap, (k,v) )
-
-    # Sort tuples by largest value first
-    # heap.sort(key=lambda kv: kv[1], reverse=True)
-    heap.sort(key=operator.itemgetter(1), reverse=True)  # faster than lambda x: x[1])
-
-    return heap
-
-
-def log_top_x(ids1, ids2):
+def log_top_x(ids1, ids2, common_ids=()):
     top_x = min(len(ids1), len(ids2))  # in case len(ids1) or len(ids2) < top_x
     log('Revised top x: %d' % top_x)
     anon_ids = {}
@@ -151,6 +135,66 @@ def log_top_x(ids1, ids2):
         ))
 
 
+# the matrices written by compare_all(), by the similarities() they come from
+MATRIX_STATISTICS = ['tau', 'tau_p', 'rho', 'rho_p', 'wtau', 'rbo']
+
+
+def write_ranked_nodes(out_file, fn1, fn2, ids1, ids2):
+    """Writes the top x nodes in common of each of a pair of files, side by side."""
+    with open(out_file, 'w', encoding='utf-8') as f:
+        f.write('%s,%s\n' % (fn1, fn2))
+        for i in range(len(ids1)):
+            f.write('%s,%s\n' % (ids1[i], ids2[i]))
+
+
+def pair_filename(out_file, fn1, fn2):
+    """out_file, with the names of the pair of files compared in it."""
+    (base, ext) = os.path.splitext(out_file)
+    return '%s-%s-%s%s' % (base, fn1, fn2, ext or '.csv')
+
+
+def compare_all(fns, gs, tables, top_x, incl_header, out_file, matrix_file):
+    """
+    Compares the top_x centralities (RankTables) of every pair of the graphs
+    gs (from files named fns) at once, printing a line per pair and writing
+    its top x nodes to its own pair_filename() of out_file, and then writing
+    matrices (one per statistic, with the nodes and top x nodes the graphs
+    have in common) of them all to matrix_file.
+    """
+    n = len(gs)
+    pairs = [(i, j) for i in range(n) for j in range(i, n)]  # with each graph against itself
+    sims = similarities([(tables[i], tables[j]) for (i, j) in pairs], top_x)
+    node_sets = [set(g.nodes()) for g in gs]
+
+    matrices = dict((s, [[''] * n for i in range(n)]) for s in ['nodes_in_common', 'top_x_in_common'] + MATRIX_STATISTICS)
+    if incl_header:
+        print('file1,file2,top_x,in_common,tau,tau_p-value,rho,rho_p-value,wtau,rbo')
+    for (k, (i, j)) in enumerate(pairs):
+        values = dict((s, sims[s][k]) for s in MATRIX_STATISTICS)
+        values['nodes_in_common'] = len(node_sets[i].intersection(node_sets[j]))
+        values['top_x_in_common'] = len(sims['labels1'][k])
+        for s, v in values.items():
+            matrices[s][i][j] = matrices[s][j][i] = v
+        if i == j:
+            continue
+
+        (ids1, ids2) = (list(map(str, sims['labels1'][k])), list(map(str, sims['labels2'][k])))
+        log('%s vs %s: %d nodes in common, %d in the top x' % (fns[i], fns[j], values['nodes_in_common'], len(ids1)))
+        if DEBUG: log_top_x(ids1, ids2, node_sets[i].intersection(node_sets[j]))
+        print('%s,%s,%d,%d,%s,%s,%s,%s,%s,%s' % (
+            fns[i], fns[j], top_x, len(ids1),
+            values['tau'], values['tau_p'], values['rho'], values['rho_p'], values['wtau'], values['rbo']
+        ))
+        write_ranked_nodes(pair_filename(out_file, fns[i], fns[j]), fns[i], fns[j], ids1, ids2)
+
+    with open(matrix_file, 'w', encoding='utf-8', newline='') as f:
+        csv_f = csv.writer(f)
+        csv_f.writerow(['statistic', 'file'] + fns)
+        for s in ['nodes_in_common', 'top_x_in_common'] + MATRIX_STATISTICS:
+            for i in range(n):
+                csv_f.writerow([s, fns[i]] + matrices[s][i])
+
+
 def eprint(*args, **kwargs):
     """Print to stderr"""
     print(*args, file=sys.stderr, **kwargs)
@@ -166,57 +210,58 @@ if __name__=='__main__':
     opts = options.parse(sys.argv[1:])
 
     DEBUG=opts.verbose
-
-    gf1 = opts.graphml_file1
-    gf2 = opts.graphml_file2
-    fn1 = extract_filename(gf1)
-    fn2 = extract_filename(gf2)
-    log('f1: %s' % fn1)
-    log('f2: %s' % fn2)
-
-    g1  = nx.read_graphml(gf1)
-    g2  = nx.read_graphml(gf2)
-
-    log('G1: %d' % len(g1))
-    log('G2: %d' % len(g2))
+    centrality_functions.DEBUG=DEBUG
+
+    if opts.graphml_files:
+        if opts.graphml_file1 or opts.graphml_file2:
+            options.parser.error('Use either -f1 and -f2 or --files')
+        gfs = [gf for gf in opts.graphml_files.split(',') if gf]
+        if len(gfs) < 2:
+            options.parser.error('--files needs at least two files')
+    elif opts.graphml_file1 and opts.graphml_file2:
+        gfs = [opts.graphml_file1, opts.graphml_file2]
+    else:
+        options.parser.error('-f1 and -f2 are required unless --files is used')
+
+    fns = [extract_filename(gf) for gf in gfs]
+    gs  = []
+    for (gf, fn) in zip(gfs, fns):
+        log('f%d: %s' % (len(gs) + 1, fn))
+        gs.append(read_networkx(gf))
+        log('G%d: %d' % (len(gs), len(gs[-1])))
+
+    # each graph's centralities are only computed once, however many others it's compared with
+    c_opts = dict((o, getattr(opts, o)) for o in CENTRALITY_OPTIONS)
+    c_opts['top_x'] = opts.top_x
+    centralities = lambda g: cached_centralities(
+        g, opts.c_type, c_opts, lambda: CENTRALITY_FUNCTIONS[opts.c_type](g, **c_opts), opts.cache
+    )
+    tables = [RankTable.from_dict(centralities(g)) for g in gs]
+
+    if opts.graphml_files:
+        compare_all(fns, gs, tables, opts.top_x, opts.incl_header, opts.out_file, opts.matrix_file)
+        sys.exit(0)
+
+    (fn1, fn2) = fns
+    (g1, g2) = gs
     common_ids = set(g1.nodes()).intersection(g2.nodes())
     log('in common: %d' % len(common_ids))
 
-    cs1 = CENTRALITY_FUNCTIONS[opts.c_type](g1)
-    cs2 = CENTRALITY_FUNCTIONS[opts.c_type](g2)
+    sims = similarity(tables[0], tables[1], opts.top_x)
+    cs1_topx = list(map(str, sims['labels1']))
+    cs2_topx = list(map(str, sims['labels2']))
+    topx_common_ids = set(cs1_topx)
+    log('top x in common: %d' % len(topx_common_ids))
 
-    in_common_ids = lambda t: t[0] in common_ids
-    first = lambda t: t[0]
-    cs1_topx = list(map(first, get_top(opts.top_x, filter(in_common_ids, cs1.items()))))
-    cs2_topx = list(map(first, get_top(opts.top_x, filter(in_common_ids, cs2.items()))))
-
-    log('cs1_topx: %d' % len(cs1_topx))
-    log('cs2_topx: %d' % len(cs2_topx))
-
-    topx_common_ids = set(cs1_topx).intersection(cs2_topx)
-
-    in_topx_common_ids = lambda id: id in topx_common_ids
-    cs1_topx = list(map(str, filter(in_topx_common_ids, cs1_topx)))
-    cs2_topx = list(map(str, filter(in_topx_common_ids, cs2_topx)))
-
-    if DEBUG: log_top_x(cs1_topx, cs2_topx)
-
-    try:
-        tau, tau_p_value = stats.kendalltau(cs1_topx, cs2_topx, nan_policy='omit')
-    except OverflowError as e:
-        eprint('Overflow error: %s' % e)
-        tau, tau_p_value = (0, 0)
-    rho, rho_p_value = stats.spearmanr(cs1_topx, cs2_topx)
+    if DEBUG: log_top_x(cs1_topx, cs2_topx, common_ids)
 
     if opts.incl_header:
-        print('top_x,in_common,tau,tau_p-value,rho,rho_p-value')
-    print('%d,%d,%s,%s,%s,%s' % (
+        print('top_x,in_common,tau,tau_p-value,rho,rho_p-value,wtau,rbo')
+    print('%d,%d,%s,%s,%s,%s,%s,%s' % (
         opts.top_x, len(topx_common_ids),
-        tau, tau_p_value,
-        rho, rho_p_value
+        sims['tau'], sims['tau_p'],
+        sims['rho'], sims['rho_p'],
+        sims['wtau'], sims['rbo']
     ))
 
-    with open(opts.out_file, 'w', encoding='utf-8') as f:
-        f.write('%s,%s\n' % (fn1, fn2))
-        for i in range(len(topx_common_ids)):
-            f.write('%s,%s\n' % (cs1_topx[i], cs2_topx[i]))
+    write_ranked_nodes(opts.out_file, fn1, fn2, cs1_topx, cs2_topx)
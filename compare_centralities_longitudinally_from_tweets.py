@@ -2,33 +2,58 @@
 
 from __future__ import print_function
 from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from copy import deepcopy
-from datetime import datetime
 
 
+import centrality_functions
 import csv
 import heapq
 import json
-import math
-import networkx as nx
+import numpy as np
 import ntpath  # https://stackoverflow.com/a/8384788
 import operator
 import os
-import scipy.stats as stats
+import scipy.sparse as sp
 import sys
-import time
 
 
-CENTRALITY_FUNCTIONS = {
-    'DEGREE'      : lambda g: nx.degree_centrality(g),
-    'BETWEENNESS' : lambda g: nx.betweenness_centrality(g, weight='weight'),
-    'CLOSENESS'   : lambda g: nx.closeness_centrality(g, distance='weight'),
-    'EIGENVECTOR' : lambda g: nx.eigenvector_centrality_numpy(g, weight='weight')
+from centrality_cache import cached_centralities
+from centrality_functions import CENTRALITY_FUNCTIONS, CENTRALITY_OPTIONS, add_centrality_arguments
+from interaction_graphs import (
+    GRAPH_TYPES, InteractionGraphsBuilder, interactions_from, parse_ts, timestamp_2_epoch_seconds
+)
+from rank_correlations import similarity
+from rank_significance import SIGNIFICANCE_METHODS, bootstrap_test, permutation_test
+from rank_tables import RankTable
+from sparse_centralities import scorer_args
+from sparse_graphs import SparseGraph
+from temporal_edge_store import TemporalEdgeStore
+
+
+# short forms used in batch output filenames
+GRAPH_TYPE_ABBREVS = {
+    'RETWEET' : 'RT',
+    'REPLY'   : 'REP',
+    'QUOTE'   : 'QT',
+    'MENTION' : 'MEN',
+    'RTQT'    : 'RTQT'
+}
+CENTRALITY_ABBREVS = {
+    'DEGREE'         : 'DEG',
+    'BETWEENNESS'    : 'BET',
+    'CLOSENESS'      : 'CLO',
+    'EIGENVECTOR'    : 'EIG',
+    'PAGERANK'       : 'PR',
+    'HITS_HUB'       : 'HUB',
+    'HITS_AUTHORITY' : 'AUTH',
+    'KATZ'           : 'KATZ',
+    'HARMONIC'       : 'HARM'
 }
-GRAPH_TYPES = ['RETWEET','REPLY','QUOTE','MENTION','RTQT']
 class Options:
     def __init__(self):
-        self.usage = 'compare_centralities_longitudinally_from_tweets.py -f1 <tweets_file1> -f2 <tweets_file2> -w <window_in_mins> -c (DEGREE|BETWEENNESS|CLOSENESS|EIGENVECTOR) -t (REPLY|RETWEET|QUOTE|MENTION|RTQT) [-x <top_x>]'
+        self.usage = 'compare_centralities_longitudinally_from_tweets.py -f1 <tweets_file1> -f2 <tweets_file2> -w <window_in_mins> -c (DEGREE|BETWEENNESS|CLOSENESS|EIGENVECTOR|PAGERANK|HITS_HUB|HITS_AUTHORITY|KATZ|HARMONIC) -t (REPLY|RETWEET|QUOTE|MENTION|RTQT) [-x <top_x>] [--step <step_in_mins>] [-b <graph:centrality[:cum],...> -o <out_dir>] [--significance (PERMUTATION|BOOTSTRAP) --resamples <n>]'
         self._init_parser()
 
     def _init_parser(self):
@@ -62,31 +87,53 @@ class Options:
             type=int,
             help='Top x results to list (default: 20)'
         )
+        add_centrality_arguments(self.parser)
+        self.parser.add_argument(
+            '--significance',
+            dest='significance',
+            default=None,
+            choices=SIGNIFICANCE_METHODS,
+            help='Also test each window\'s tau and rho by resampling: PERMUTATION relabels one corpus\' nodes (for p-values, with their 95%% intervals), BOOTSTRAP resamples both graphs\' interactions (for 95%% confidence intervals) (default: None)'
+        )
+        self.parser.add_argument(
+            '--resamples',
+            dest='resamples',
+            default=None,
+            type=int,
+            help='Number of resamples for --significance (default: 1000 permutations or 200 bootstrap resamples)'
+        )
+        self.parser.add_argument(
+            '--resample-jobs',
+            dest='resample_jobs',
+            default=1,
+            type=int,
+            help='Number of worker processes to share each window\'s resamples (default: 1)'
+        )
         self.parser.add_argument(
             '-c', '--centrality',
             dest='c_type',
-            required=True,  # default='DEGREE',
+            default=None,  # required unless --batch is used
             choices=list(CENTRALITY_FUNCTIONS.keys()),
-            help='Centrality metric (default: DEGREE)'
+            help='Centrality metric (required unless --batch is used)'
         )
         self.parser.add_argument(
             '-t', '--graph-type',
             dest='g_type',
-            required=True,  # default=GRAPH_TYPES[0],
+            default=None,  # required unless --batch is used
             choices=GRAPH_TYPES,
-            help='Graph type to analyse (options: %s, default: %s)' % (str(GRAPH_TYPES), GRAPH_TYPES[0])
+            help='Graph type to analyse (options: %s, required unless --batch is used)' % str(GRAPH_TYPES)
         )
         self.parser.add_argument(
             '-f1', '--tweets1',
             dest='tweets_file1',
             required=True,
-            help='First file of tweets to analyse'
+            help='First file of tweets to analyse (or a temporal edge store of them, ending in .npz)'
         )
         self.parser.add_argument(
             '-f2', '--tweets2',
             dest='tweets_file2',
             required=True,
-            help='First file of tweets to analyse'
+            help='Second file of tweets to analyse (or a temporal edge store of them, ending in .npz)'
         )
         self.parser.add_argument(
             '-w', '--window',
@@ -95,6 +142,39 @@ class Options:
             type=int,
             help='Window size to use (in minutes)'
         )
+        self.parser.add_argument(
+            '--step',
+            dest='step_mins',
+            default=None,
+            type=int,
+            help='Slide overlapping windows along by this many minutes rather than using back-to-back windows (default: None)'
+        )
+        self.parser.add_argument(
+            '--max-lag',
+            dest='max_lag_mins',
+            default=60,
+            type=int,
+            help='How far out of time order (in minutes) tweets in each file may be (default: 60)'
+        )
+        self.parser.add_argument(
+            '-j', '--jobs',
+            dest='jobs',
+            default=1,
+            type=int,
+            help='Number of worker processes to score windows with (default: 1)'
+        )
+        self.parser.add_argument(
+            '-b', '--batch',
+            dest='batch',
+            default=None,
+            help='Comma-separated comparisons to run in one pass over the tweets, each GRAPH_TYPE:CENTRALITY with an optional :cum suffix for cumulative windows, e.g. "MENTION:DEGREE,MENTION:DEGREE:cum" - each is written to its own CSV in --out-dir (default: None)'
+        )
+        self.parser.add_argument(
+            '-o', '--out-dir',
+            dest='out_dir',
+            default='.',
+            help='Directory to write --batch CSVs to (default: .)'
+        )
         # self.parser.add_argument(
         #     '-o', '--out-file',
         #     dest='out_file',
@@ -123,45 +203,65 @@ def extract_parent_dir(filepath, default_dir='./'):
     return os.path.abspath(os.path.join(filepath, os.pardir))
 
 
-def read_lines(file=None):
-    """Gets the lines from the given file or stdin if it's None or '' or '-'."""
+def stream_lines(file=None):
+    """Yields the lines from the given file or stdin if it's None or '' or '-'."""
     if file and file != '-':
         with open(file, 'r', encoding='utf-8') as f:
-            return [l.strip() for l in f.readlines()]
+            for l in f:
+                yield l.strip()
     else:
-        return [l.strip() for l in sys.stdin]
+        for l in sys.stdin:
+            yield l.strip()
 
 
-def load_tweets(tweets_file):
-    tweets = []
-    for line in read_lines(tweets_file):
-        # read tweet from JSON
+def stream_interactions(tweets_file, g_types):
+    """
+    Yields (ts, { g_type : [(src, tgt), ...] }) for each tweet in the file, in
+    file order, so several graph types can be built from one read of the file.
+    """
+    for line in stream_lines(tweets_file):
+        if not line: continue
         tweet = json.loads(line)
-        tweet['ts'] = timestamp_2_epoch_seconds(parse_ts(tweet['created_at']))
-        tweets.append(tweet)
-
-    tweets.sort(key=lambda t: t['ts'])
-    return tweets
+        ts = timestamp_2_epoch_seconds(parse_ts(tweet['created_at']))
+        yield (ts, dict((g_type, list(interactions_from(tweet, g_type))) for g_type in g_types))
 
 
-def get_top(top_x, kv_tuples):
+def in_time_order(events, max_lag_secs):
+    """
+    Yields (ts, ...) events in time order, provided no event turns up more
+    than max_lag_secs after a later one. Only the events within that lag are
+    held back, so the stream is never loaded in full.
+    """
     heap = []
-    for kv in kv_tuples:
-        k,v = kv
-        # v = kv_map[k]
-        # If we have not yet found top_x items, or the current item is larger
-        # than the smallest item on the heap,
-        if len(heap) < top_x or v > heap[0][1]:  # [1] is the value
-            # If the heap is full, remove the smallest element on the heap.
-            if len(heap) == top_x: heapq.heappop( heap )
-            # Add the current element as the new smallest.
-            heapq.heappush( heap, (k,v) )
-
-    # Sort tuples by largest value first
-    # heap.sort(key=lambda kv: kv[1], reverse=True)
-    heap.sort(key=operator.itemgetter(1), reverse=True)  # faster than lambda x: x[1])
-
-    return heap
+    latest = None
+    count = 0
+    for ev in events:
+        count += 1  # tie-breaker, so events themselves are never compared
+        heapq.heappush(heap, (ev[0], count, ev))
+        latest = ev[0] if latest is None else max(latest, ev[0])
+        while heap[0][0] < latest - max_lag_secs:
+            yield heapq.heappop(heap)[2]
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+
+def stream_events(corpus_file, g_types, max_lag_secs):
+    """
+    Time-ordered (ts, { g_type : [(src, tgt), ...] }) events from a file of
+    tweets or, if it ends in .npz, from a temporal edge store built from one.
+    """
+    if corpus_file.endswith('.npz'):
+        return TemporalEdgeStore.load(corpus_file).events(g_types)
+    return in_time_order(stream_interactions(corpus_file, g_types), max_lag_secs)
+
+
+def merge_corpora(*event_streams):
+    """Merges time-ordered event streams into (ts, corpus_idx, interactions) events."""
+    def tag(events, c):
+        for (ts, interactions) in events:
+            yield (ts, c, interactions)
+    tagged = [tag(events, c) for c, events in enumerate(event_streams)]
+    return heapq.merge(*tagged, key=operator.itemgetter(0))
 
 
 def log_top_x(ids1, ids2):
@@ -191,56 +291,285 @@ def log_top_x(ids1, ids2):
         ))
 
 
-def timestamp_2_epoch_seconds(ts):
-    return int(time.mktime(ts.timetuple()))
-
-
-TWITTER_TS_FORMAT = '%a %b %d %H:%M:%S +0000 %Y'  #Tue Apr 26 08:57:55 +0000 2011
-ARG_TS_FORMAT = '%Y-%m-%d %H:%M' # 2016-12-25 7:53
+def build_graph(tweets, g_type):
+    builder = InteractionGraphsBuilder([g_type], weight_type=int)
+    builder.add_all(tweets)
+    return builder.build()[g_type].to_networkx(edge_attrs={'edge_type': g_type})
+
+
+class WindowGraph:
+    """
+    A g_type graph of the interactions currently inside a window, held as a
+    live map of (src, tgt) -> weight that is updated in place as interactions
+    enter the window and leave it again, with the degree of each node, so
+    nodes are dropped as soon as their last edge leaves. Each step only costs
+    the edges that changed; the CSR matrix (and networkx graph) are only made
+    when the graph is asked for, so windows that are never scored cost next
+    to nothing.
+    """
+    def __init__(self, g_type):
+        self.g_type = g_type
+        self.weights = {}  # (src, tgt) : weight
+        self.degrees = {}  # node : number of (distinct) edges it's in
+        self._sg = None
+        self._g = None
+
+    def _link(self, node, change):
+        d = self.degrees.get(node, 0) + change
+        if d:
+            self.degrees[node] = d
+        else:
+            del self.degrees[node]
+
+    def _change(self, src, tgt, change):
+        key = (src, tgt)
+        w = self.weights.get(key, 0) + change
+        if w and key not in self.weights:  # a new edge
+            self._link(src, 1)
+            if tgt != src: self._link(tgt, 1)
+        elif not w:  # its last interaction has left
+            self._link(src, -1)
+            if tgt != src: self._link(tgt, -1)
+        if w:
+            self.weights[key] = w
+        else:
+            del self.weights[key]
+        self._sg = self._g = None
+
+    def add(self, pairs):
+        for src, tgt in pairs:
+            self._change(src, tgt, 1)
+
+    def remove(self, pairs):
+        for src, tgt in pairs:
+            self._change(src, tgt, -1)
+
+    @property
+    def sg(self):
+        """The window's SparseGraph, only rebuilt if the window has changed."""
+        if self._sg is None:
+            labels = list(self.degrees)
+            codes = dict((l, i) for i, l in enumerate(labels))
+            n = len(labels)
+            srcs = np.fromiter((codes[s] for s, _ in self.weights), dtype=np.int64, count=len(self.weights))
+            tgts = np.fromiter((codes[t] for _, t in self.weights), dtype=np.int64, count=len(self.weights))
+            weights = np.fromiter(self.weights.values(), dtype=np.int64, count=len(self.weights))
+            self._sg = SparseGraph(sp.csr_matrix((weights, (srcs, tgts)), shape=(n, n)), labels)
+        return self._sg
+
+    @property
+    def g(self):
+        """The window's networkx graph, only rebuilt if the window has changed."""
+        if self._g is None:
+            self._g = self.sg.to_networkx(edge_attrs={'edge_type': self.g_type})
+        return self._g
+
+
+def window_views(events, g_types, span_secs, step_secs, track_windows=True):
+    """
+    Yields (i, is_last, current, totals) for each window i, [start, start +
+    span_secs), over a time-ordered stream of (ts, corpus_idx, interactions)
+    events, with start advancing step_secs at a time from the first event.
+    current holds each g_type's [wg1, wg2] WindowGraphs for the window itself
+    (only tracked if track_windows) and totals holds each g_type's [wg1, wg2]
+    for every event up to the window's end. Only the current window's graphs
+    and the totals are held in memory, and they are updated in place, so use
+    them before asking for the next window.
+    """
+    def new_graphs():
+        return dict((g_type, [WindowGraph(g_type), WindowGraph(g_type)]) for g_type in g_types)
+
+    totals = new_graphs()
+    current = new_graphs() if track_windows else {}
+    in_window = deque()  # only needed to retire events from overlapping windows
+    sliding = step_secs < span_secs and track_windows
+    i = 0
+    start = end = prev_ts = None
+    late = 0
+    for ev in events:
+        ts, c, interactions = ev
+        if start is None:
+            start, end, prev_ts = ts, ts + span_secs, ts
+        if ts < prev_ts:  # too far out of order to place in a window
+            late += 1
+            for g_type in totals: totals[g_type][c].add(interactions[g_type])
+            continue
+        prev_ts = ts
+        while ts >= end:
+            yield (i, False, current, totals)
+            i += 1
+            start += step_secs
+            end += step_secs
+            if sliding:
+                while in_window and in_window[0][0] < start:
+                    _, c_out, interactions_out = in_window.popleft()
+                    for g_type in current: current[g_type][c_out].remove(interactions_out[g_type])
+            elif track_windows:
+                current = new_graphs()
+        if track_windows and ts >= start:
+            for g_type in current: current[g_type][c].add(interactions[g_type])
+            if sliding: in_window.append(ev)
+        for g_type in totals: totals[g_type][c].add(interactions[g_type])
+
+    if late:
+        eprint('%d tweets arrived too late to be windowed (try a larger --max-lag)' % late)
+    if start is not None:
+        yield (i, True, current, totals)
+
+
+def windows(events, g_type, span_secs, step_secs, cumulative=False):
+    """
+    Yields (label, wg1, wg2) for each g_type window from window_views,
+    followed by the 'Total' graphs of every event (the last cumulative window
+    is the 'Total').
+    """
+    for (i, is_last, current, totals) in window_views(events, [g_type], span_secs, step_secs, not cumulative):
+        if cumulative:
+            yield ('Total' if is_last else str(i + 1), totals[g_type][0], totals[g_type][1])
+        else:
+            yield (str(i + 1), current[g_type][0], current[g_type][1])
+            if is_last:
+                yield ('Total', totals[g_type][0], totals[g_type][1])
+
+
+def compare_graphs(g1, g2, c_type, top_x, c_opts=None, cache=True, significance=None):
+    """
+    The CSV fields (after the window label) comparing the top_x c_type
+    centralities of g1 and g2, computed with the options in c_opts (or taken
+    from the centrality cache, if cache is True). If significance is given, as
+    (method, resamples, jobs, seed), the fields of its test follow.
+    """
+    common_ids = set(g1.nodes()).intersection(g2.nodes())
+    if len(common_ids) == 0:
+        return '%d,%d,0,0.0,0,0,0,0,0,0,0,0' % (len(g1), len(g2)) + ',0' * len(significance_fields(significance))
+    c_opts = dict(c_opts or {}, top_x=top_x)
+    centralities = lambda g: cached_centralities(g, c_type, c_opts, lambda: CENTRALITY_FUNCTIONS[c_type](g, **c_opts), cache)
+    cs1 = centralities(g1)
+    cs2 = centralities(g2)
+
+    sims = similarity(RankTable.from_dict(cs1), RankTable.from_dict(cs2), top_x)
+
+    compared = len(sims['labels1'])
+    proportion_compared = float(compared) / min(len(g1), len(g2))
+    fields = '%d,%d,%d,%.2f,%d,%d,%s,%s,%s,%s,%s,%s' % (
+        len(g1), len(g2), compared, proportion_compared, top_x, len(common_ids),
+        sims['tau'], sims['tau_p'], sims['rho'], sims['rho_p'], sims['wtau'], sims['rbo']
+    )
+    if significance:
+        fields += ',' + ','.join(map(str, significance_test(g1, g2, cs1, cs2, sims, c_type, c_opts, significance)))
+    return fields
+
+
+def significance_fields(significance):
+    """The names of the fields significance_test() adds to each row."""
+    if not significance:
+        return []
+    if significance[0] == 'PERMUTATION':
+        return ['%s_perm_p%s' % (s, b) for s in ['tau', 'rho'] for b in ['', '_lo', '_hi']]
+    return ['%s_%s' % (s, b) for s in ['tau', 'rho'] for b in ['lo', 'hi']]
+
+
+def significance_test(g1, g2, cs1, cs2, sims, c_type, c_opts, significance):
+    """
+    The significance_fields() of the comparison (sims) of centralities cs1
+    and cs2 of g1 and g2, tested by (method, resamples, jobs, seed).
+    """
+    (method, resamples, jobs, seed) = significance
+    if method == 'PERMUTATION':
+        x = [cs1[l] for l in sims['labels1']]
+        y = [cs2[l] for l in sims['labels1']]
+        results = permutation_test(x, y, resamples or 1000, seed, jobs)
+    else:
+        results = bootstrap_test(
+            SparseGraph.from_networkx(g1), SparseGraph.from_networkx(g2), c_type, scorer_args(c_type, c_opts),
+            c_opts['top_x'], resamples or 200, seed, jobs
+        )
+    return results['tau'] + results['rho']
+
+
+def parse_batch(spec):
+    """Parses 'GRAPH_TYPE:CENTRALITY[:cum],...' into (g_type, c_type, cumulative) jobs."""
+    batch = []
+    for item in spec.split(','):
+        parts = item.strip().split(':')
+        if len(parts) not in [2, 3] or parts[0] not in GRAPH_TYPES or \
+           parts[1] not in CENTRALITY_FUNCTIONS or (len(parts) == 3 and parts[2] != 'cum'):
+            raise ValueError('Unrecognised batch comparison: %s' % item)
+        job = (parts[0], parts[1], len(parts) == 3)
+        if job not in batch:
+            batch.append(job)
+    return batch
+
+
+def batch_filename(fn1, fn2, job, w_mins, step_mins, top_x):
+    """The CSV filename run_A_vs_B_longitudinal_centrality_comparisons.sh uses for a job."""
+    (g_type, c_type, cumulative) = job
+    return '%s_%s_long-comp_t%s_c%s_w%d%s_x%d%s.csv' % (
+        fn1, fn2,
+        GRAPH_TYPE_ABBREVS.get(g_type, g_type), CENTRALITY_ABBREVS.get(c_type, c_type),
+        w_mins, ('_s%d' % step_mins) if step_mins else '', top_x,
+        '_cum' if cumulative else ''
+    )
+
+
+def batch_rows(batch, i, is_last, current, totals):
+    """
+    Works out what each (g_type, c_type, cumulative) job in batch reports for
+    window i of window_views. Returns the rows as (job, label, key) tuples and
+    the graphs to compare as { key : [wg1, wg2] }, where key is (g_type, view,
+    c_type), so graphs shared by jobs (e.g. the 'Total' of a job and of its
+    cumulative twin) are only scored once.
+    """
+    rows = []
+    to_score = {}
+    def add(job, label, view, graphs):
+        key = (job[0], view, job[1])
+        rows.append((job, label, key))
+        to_score[key] = graphs
+    for job in batch:
+        (g_type, c_type, cumulative) = job
+        if cumulative:
+            if is_last:
+                add(job, 'Total', 'TOTAL', totals[g_type])
+            else:
+                add(job, str(i + 1), 'CUMULATIVE', totals[g_type])
+        else:
+            add(job, str(i + 1), 'WINDOW', current[g_type])
+            if is_last:
+                add(job, 'Total', 'TOTAL', totals[g_type])
+    return (rows, to_score)
 
 
-def parse_ts(ts_str, fmt=TWITTER_TS_FORMAT):
-    # print(ts_str)
-    time_struct = time.strptime(ts_str, fmt)
-    return datetime.fromtimestamp(time.mktime(time_struct))
+def write_batch_rows(rows, scores, out_files):
+    for (job, label, key) in rows:
+        out_files[job].write('%s,%s\n' % (label, scores[key]))
+        out_files[job].flush()
 
 
-def get_ts_extrema(tweets1, tweets2, idx, comp_func):
-    ts = comp_func(tweets1[idx]['ts'], tweets2[idx]['ts'])
-    ts_str = tweets1[idx]['created_at'] if tweets1[idx]['ts'] == ts else tweets2[idx]['created_at']
-    return (ts, ts_str)
+def csv_header(fn1, fn2, significance=None):
+    return 'window, %s nodes, %s nodes, compared, %% compared, top_x, in common, tau, tau_p, rho, rho_p, wtau, rbo' % (fn1, fn2) + \
+        ''.join(', %s' % f for f in significance_fields(significance))
 
 
-def fill_buckets(tweets, buckets, bucket_span_secs, first_ts):
-    current_bucket_idx = 0
-    for t in tweets:
-        current_bucket_idx = int(math.floor((t['ts'] - first_ts) / bucket_span_secs))
-        buckets[current_bucket_idx].append(t)
+def to_edge_list(sg):
+    """A compact, picklable copy of a SparseGraph: its node IDs and integer-coded weighted edges."""
+    (srcs, tgts, weights) = sg.edge_arrays()
+    return (sg.labels, srcs, tgts, weights)
 
 
-def build_graph(tweets, g_type):
-    g = nx.DiGraph()
-    def link(src, tgt):
-        if g.has_edge(src, tgt):
-            g[src][tgt]['weight'] += 1
-        else:
-            g.add_edge(src, tgt, weight=1, edge_type=g_type)
+def from_edge_list(edge_list):
+    """Rebuilds the networkx graph of the SparseGraph copied by to_edge_list."""
+    (nodes, srcs, tgts, weights) = edge_list
+    n = len(nodes)
+    m = sp.coo_matrix((weights, (srcs, tgts)), shape=(n, n))
+    return SparseGraph(m, nodes).to_networkx()
 
-    for t in tweets:
-        if g_type in ['RETWEET', 'RTQT'] and 'retweeted_status' in t and t['retweeted_status'] != None:
-            link(t['user']['id_str'], t['retweeted_status']['user']['id_str'])
-        elif g_type in ['QUOTE', 'RTQT'] and 'quoted_status' in t and t['quoted_status'] != None:
-            link(t['user']['id_str'], t['quoted_status']['user']['id_str'])
-        elif g_type == 'REPLY' and t['in_reply_to_status_id_str'] != None:
-            link(t['user']['id_str'], t['in_reply_to_user_id_str'])
-        elif g_type == 'MENTION' and len(t['entities']['user_mentions']) > 0:
-            mentions = t['entities']['user_mentions']
-            if 'extended_tweet' in t:
-                mentions = t['extended_tweet']['entities']['user_mentions']
-            for m in mentions:
-                link(t['user']['id_str'], m['id_str'])
 
-    return g
+def compare_edge_lists(edge_list1, edge_list2, c_type, top_x, c_opts=None, cache=True, significance=None):
+    """compare_graphs for graphs sent to a worker process as edge lists."""
+    return compare_graphs(
+        from_edge_list(edge_list1), from_edge_list(edge_list2), c_type, top_x, c_opts, cache, significance
+    )
 
 
 def eprint(*args, **kwargs):
@@ -258,6 +587,7 @@ if __name__=='__main__':
     opts = options.parse(sys.argv[1:])
 
     DEBUG=opts.verbose
+    centrality_functions.DEBUG=DEBUG
 
     tweets_file1 = opts.tweets_file1
     tweets_fn1 = extract_filename(tweets_file1)
@@ -268,101 +598,133 @@ if __name__=='__main__':
     g_type = opts.g_type
     c_type = opts.c_type
     cumulative = opts.cumulative
+    batch = None
+    if opts.batch:
+        try:
+            batch = parse_batch(opts.batch)
+        except ValueError as e:
+            options.parser.error(str(e))
+        if cumulative:
+            options.parser.error('use the :cum suffix to request cumulative comparisons with --batch')
+    elif not (g_type and c_type):
+        options.parser.error('-t and -c are required unless --batch is used')
+    step_mins = opts.step_mins
+    jobs = opts.jobs
+    if jobs < 1:
+        options.parser.error('--jobs must be at least 1')
+    if opts.resample_jobs < 1:
+        options.parser.error('--resample-jobs must be at least 1')
+    if opts.resamples is not None and opts.resamples < 1:
+        options.parser.error('--resamples must be at least 1')
+    if step_mins is not None and step_mins <= 0:
+        options.parser.error('--step must be a positive number of minutes')
+    if step_mins and (cumulative or (batch and any(job[2] for job in batch))):
+        options.parser.error('--step cannot be combined with --cumulative')
     log('Tweets file #1: %s' % tweets_fn1)
     log('Tweets file #2: %s' % tweets_fn2)
     log('Window (mins): %d' % w_mins)
     log('Top X: %d' % top_x)
     log('Graph: %s' % g_type)
     log('Centrality: %s' % c_type)
+    log('Batch: %s' % batch)
     log('Cumulative: %s' % cumulative)
+    log('Step (mins): %s' % step_mins)
+    log('Max lag (mins): %d' % opts.max_lag_mins)
+    log('Jobs: %d' % jobs)
+    log('Significance: %s' % opts.significance)
+    log('Centrality options: %s' % ', '.join('%s=%s' % (o, getattr(opts, o)) for o in CENTRALITY_OPTIONS))
+
+    c_opts = dict((o, getattr(opts, o)) for o in CENTRALITY_OPTIONS)
+    significance = (opts.significance, opts.resamples, opts.resample_jobs, opts.seed) if opts.significance else None
+
+    span_secs = w_mins * 60
+    step_secs = step_mins * 60 if step_mins else span_secs
+    max_lag_secs = opts.max_lag_mins * 60
+
+    if batch:
+        g_types = []
+        for job in batch:
+            if job[0] not in g_types: g_types.append(job[0])
+        events = merge_corpora(
+            stream_events(tweets_file1, g_types, max_lag_secs),
+            stream_events(tweets_file2, g_types, max_lag_secs)
+        )
 
-    tweets1 = load_tweets(tweets_file1)
-    tweets2 = load_tweets(tweets_file2)
-    log('Tweets in #1: %d' % len(tweets1))
-    log('Tweets in #2: %d' % len(tweets2))
-
-    (first_ts, first_ts_str) = get_ts_extrema(tweets1, tweets2, 0, min)
-    (last_ts, last_ts_str)   = get_ts_extrema(tweets1, tweets2, -1, max)
-    duration_secs = last_ts - first_ts
-    log('First: %s (UTC %d)' % (first_ts_str, first_ts))
-    log('Last:  %s (UTC %d)' % (last_ts_str, last_ts))
-
-    bucket_span_secs = w_mins * 60
-    num_buckets = int(duration_secs / bucket_span_secs) + 1
-    log('Buckets required: %d' % num_buckets)
-
-    buckets1 = [[] for i in range(num_buckets)]
-    buckets2 = [[] for i in range(num_buckets)]
-    fill_buckets(tweets1, buckets1, bucket_span_secs, first_ts)
-    fill_buckets(tweets2, buckets2, bucket_span_secs, first_ts)
-
-    if cumulative:
-        for i in range(1, num_buckets):
-            buckets1[i] = buckets1[i-1] + buckets1[i]
-            buckets2[i] = buckets2[i-1] + buckets2[i]
-
-    log('Buckets,%s,%s' % (tweets_fn1, tweets_fn2))
-    for i in range(num_buckets):
-        r = 'bucket %2d:\t%d\t%d' % (i+1, len(buckets1[i]), len(buckets2[i]))
-        r += '\t%d' % (first_ts + i * bucket_span_secs)
-        def ts_str(bucket, idx):
-            return '%s [%d]' % (bucket[idx]['created_at'], bucket[idx]['ts']) if len(bucket) != 0 else 'XXX [0]'
-        r += '\t(%s - %s)' % (ts_str(buckets1[i], 0), ts_str(buckets1[i], -1))
-        r += '\t(%s - %s)' % (ts_str(buckets2[i], 0), ts_str(buckets2[i], -1))
-        log(r)
-        # log('bucket %2d:\t%d\t%d' % (i+1, len(buckets1[i]), len(buckets2[i])))
-        # log('bucket %2d:\t%d\t%d\t(%s - %s)\t(%s - %s)' % (i+1, len(buckets1[i]), len(buckets2[i]), buckets1[i][0]['created_at'], buckets1[i][-1]['created_at'], buckets2[i][0]['created_at'], buckets1[i][-1]['created_at']))
-        # log('bucket %2d:\t%d\t%d\t(%s[%d] - %s[%d])\t(%s[%d] - %s[%d])' % (i+1, len(buckets1[i]), len(buckets2[i]), buckets1[i][0]['created_at'], buckets1[i][0]['ts'], buckets1[i][-1]['created_at'], buckets1[i][-1]['ts'], buckets2[i][0]['created_at'], buckets2[i][0]['ts'], buckets2[i][-1]['created_at'], buckets2[i][-1]['ts']))
-    log('Total:\t%d\t%d' % (len(tweets1), len(tweets2)))
-
-    # create graphs
-    graphs1 = []
-    graphs2 = []
-    for tweets in (buckets1 + [tweets1]):
-        graphs1.append(build_graph(tweets, g_type))
-    for tweets in (buckets2 + [tweets2]):
-        graphs2.append(build_graph(tweets, g_type))
-
-    log('G\tnodes,edges\tnodes,edges')
-    for i in range(len(graphs1)):
-        log('%d\t%d,%d\t%d,%d' % (i, len(graphs1[i]), len(graphs1[i].edges), len(graphs2[i]), len(graphs2[i].edges)))
-
-    # compare graphs, calculating tau for them.
+        out_dir = opts.out_dir
+        if not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        out_files = {}
+        for job in batch:
+            out_file = os.path.join(out_dir, batch_filename(tweets_fn1, tweets_fn2, job, w_mins, step_mins, top_x))
+            log('%s -> %s' % (':'.join(map(str, job)), out_file))
+            out_files[job] = open(out_file, 'w', encoding='utf-8')
+            out_files[job].write(csv_header(tweets_fn1, tweets_fn2, significance) + '\n')
+
+        track_windows = not all(job[2] for job in batch)
+        views = window_views(events, g_types, span_secs, step_secs, track_windows)
+        try:
+            if jobs == 1:
+                for (i, is_last, current, totals) in views:
+                    (rows, to_score) = batch_rows(batch, i, is_last, current, totals)
+                    scores = dict(
+                        (key, compare_graphs(wg1.g, wg2.g, key[2], top_x, c_opts, opts.cache, significance)) for key, (wg1, wg2) in to_score.items()
+                    )
+                    write_batch_rows(rows, scores, out_files)
+            else:
+                with ProcessPoolExecutor(max_workers=jobs) as pool:
+                    pending = deque()
+                    for (i, is_last, current, totals) in views:
+                        (rows, to_score) = batch_rows(batch, i, is_last, current, totals)
+                        edge_lists = {}  # shared by the centralities of the same graphs
+                        futures = {}
+                        for key, (wg1, wg2) in to_score.items():
+                            if key[:2] not in edge_lists:
+                                edge_lists[key[:2]] = (to_edge_list(wg1.sg), to_edge_list(wg2.sg))
+                            (el1, el2) = edge_lists[key[:2]]
+                            futures[key] = pool.submit(compare_edge_lists, el1, el2, key[2], top_x, c_opts, opts.cache, significance)
+                        pending.append((rows, futures))
+                        while len(pending) > 2 * jobs or (pending and all(f.done() for f in pending[0][1].values())):
+                            (rows, futures) = pending.popleft()
+                            write_batch_rows(rows, dict((k, f.result()) for k, f in futures.items()), out_files)
+                    while pending:
+                        (rows, futures) = pending.popleft()
+                        write_batch_rows(rows, dict((k, f.result()) for k, f in futures.items()), out_files)
+        finally:
+            for f in out_files.values():
+                f.close()
+        sys.exit(0)
+
+    events = merge_corpora(
+        stream_events(tweets_file1, [g_type], max_lag_secs),
+        stream_events(tweets_file2, [g_type], max_lag_secs)
+    )
+
+    # compare graphs, calculating tau for them, one window at a time.
     # G1 nodes, G2 nodes, in common, tau, p_value
-    print('window, %s nodes, %s nodes, compared, %% compared, top_x, in common, tau, tau_p, rho, rho_p' % (tweets_fn1, tweets_fn2))
-    window_labels = list(map(str, range(1, num_buckets + 1)))
-    if not cumulative:
-        window_labels += ['Total']
+    print(csv_header(tweets_fn1, tweets_fn2, significance))
+    if jobs == 1:
+        for (w, wg1, wg2) in windows(events, g_type, span_secs, step_secs, cumulative):
+            (g1, g2) = (wg1.g, wg2.g)
+            log('%s\t%d,%d\t%d,%d' % (w, len(g1), len(g1.edges), len(g2), len(g2.edges)))
+            print('%s,%s' % (w, compare_graphs(g1, g2, c_type, top_x, c_opts, opts.cache, significance)), flush=True)
     else:
-        window_labels[-1] = 'Total'
-    for (w, g1, g2) in zip(window_labels,graphs1, graphs2):
-        common_ids = set(g1.nodes()).intersection(g2.nodes())
-        if len(common_ids) == 0:
-            print('%s,%d,%d,0,0.0,0,0,0,0,0,0' % (w, len(g1), len(g2)))
-            continue
-        cs1 = CENTRALITY_FUNCTIONS[c_type](g1)
-        cs2 = CENTRALITY_FUNCTIONS[c_type](g2)
-
-        in_common_ids = lambda t: t[0] in common_ids
-        first = lambda t: t[0]
-        cs1_topx = list(map(first, get_top(top_x, filter(in_common_ids, cs1.items()))))
-        cs2_topx = list(map(first, get_top(top_x, filter(in_common_ids, cs2.items()))))
-
-        topx_common_ids = set(cs1_topx).intersection(cs2_topx)
-        in_topx_common_ids = lambda id: id in topx_common_ids
-        cs1_topx = list(filter(in_topx_common_ids, cs1_topx))
-        cs2_topx = list(filter(in_topx_common_ids, cs2_topx))
-
-        tau, tau_p = stats.kendalltau(cs1_topx, cs2_topx, nan_policy='omit')
-        rho, rho_p = stats.spearmanr(cs1_topx, cs2_topx)
-
-        compared = len(cs1_topx)
-        proportion_compared = float(compared) / min(len(g1), len(g2))
-        print('%s,%d,%d,%d,%.2f,%d,%d,%s,%s,%s,%s' % (
-            w, len(g1), len(g2), compared, proportion_compared, top_x, len(common_ids),
-            tau, tau_p, rho, rho_p
-        ))
-
+        # score windows in worker processes, but print them in window order,
+        # keeping only a few windows in flight per worker
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            pending = deque()
+            for (w, wg1, wg2) in windows(events, g_type, span_secs, step_secs, cumulative):
+                (sg1, sg2) = (wg1.sg, wg2.sg)
+                log('%s\t%d,%d\t%d,%d' % (w, len(sg1), sg1.number_of_edges(), len(sg2), sg2.number_of_edges()))
+                pending.append((w, pool.submit(
+                    compare_edge_lists, to_edge_list(sg1), to_edge_list(sg2), c_type, top_x, c_opts, opts.cache,
+                    significance
+                )))
+                while len(pending) > 2 * jobs or (pending and pending[0][1].done()):
+                    (w, f) = pending.popleft()
+                    print('%s,%s' % (w, f.result()), flush=True)
+            while pending:
+                (w, f) = pending.popleft()
+                print('%s,%s' % (w, f.result()), flush=True)
 
     # gf1 = opts.graphml_file1
     # gf2 = opts.graphml_file2
@@ -15,6 +15,9 @@ import os
 import sys
 
 
+from graph_io import read_networkx
+
+
 #
 # Given two GraphML graphs, extract clusters using the Louvain method and do
 # a pairwise similarity comparison of those clusters using a Jaccard-style
@@ -125,8 +128,8 @@ if __name__=='__main__':
     f1 = opts.file1
     f2 = opts.file2
 
-    g1 = nx.read_graphml(f1).to_undirected()
-    g2 = nx.read_graphml(f2).to_undirected()
+    g1 = read_networkx(f1).to_undirected()
+    g2 = read_networkx(f2).to_undirected()
 
     print('graph1 %d nodes' % len(g1))
     print('graph2 %d nodes' % len(g2))
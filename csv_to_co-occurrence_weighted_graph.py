@@ -5,15 +5,18 @@ from argparse import ArgumentParser
 
 
 import csv
-import networkx as nx
 import ntpath  # https://stackoverflow.com/a/8384788
 import os
 import sys
 
 
+from graph_io import write_graph
+from sparse_graphs import BACKBONE_METHODS, BACKBONE_THRESHOLDS, CooccurrenceBuilder, backbone as sparse_backbone
+
+
 class Options:
     def __init__(self):
-        self.usage = 'csv_to_co-occurrence_weighted_graph.py -f <csvfilename> -n <nodecol> -w <weightcol> -o <outfile> [-v --header]'
+        self.usage = 'csv_to_co-occurrence_weighted_graph.py -f <csvfilename> -n <nodecol> -w <weightcol> -o <outfile> [-v --header --min-weight <w> --backbone (DISPARITY|NOISE_CORRECTED)]'
         self._init_parser()
 
     def _init_parser(self):
@@ -54,6 +57,13 @@ class Options:
             type=int,
             help='Column for distinguishing co-occurrence of nodes (column index starts at 1)'
         )
+        self.parser.add_argument(
+            '--min-weight',
+            dest='min_weight',
+            default=1,
+            type=int,
+            help='Smallest permitted count of co-occurrences (default: 1)'
+        )
         self.parser.add_argument(
             '-f', '--csvfile',
             dest='csv_file',
@@ -65,8 +75,25 @@ class Options:
             dest='out_file',
             default=None,
             required=False,
-            help='Filename to which to write output (default <infile-".csv">.graphml)'
+            help='Filename to which to write output, as .graphml, .npz or .parquet (default <infile-".csv">-cooccurrence.graphml)'
         )
+        self.parser.add_argument(
+            '--backbone',
+            dest='backbone',
+            default=None,
+            choices=BACKBONE_METHODS,
+            help='Only keep the edges that stand out from what their nodes\' strengths would lead one to expect (default: None)'
+        )
+        self.parser.add_argument(
+            '--backbone-threshold',
+            dest='backbone_threshold',
+            default=None,
+            type=float,
+            help='Significance level for DISPARITY, or standard deviations for NOISE_CORRECTED (default: %s)' % ', '.join(
+                '%s for %s' % (BACKBONE_THRESHOLDS[m], m) for m in BACKBONE_METHODS
+            )
+        )
+
 
 
     def parse(self, args=None):
@@ -112,6 +139,9 @@ if __name__=='__main__':
     out_file = opts.out_file
     header   = opts.expect_header
     ci       = opts.case_insensitive
+    min_weight = opts.min_weight
+    backbone   = opts.backbone
+    backbone_threshold = opts.backbone_threshold
 
     log('csv_file: %s' % csv_file)
     log('node_col: %s' % node_col)
@@ -119,8 +149,10 @@ if __name__=='__main__':
     log('out_file: %s' % out_file)
     log('header:   %s' % header)
     log('case-ins: %s' % ci)
+    log('min weight: %d' % min_weight)
+    log('backbone: %s (%s)' % (backbone, backbone_threshold))
 
-    cooccurrences = {}  # tweet ID: [hashtags]
+    cooccurrences = CooccurrenceBuilder()  # tweet ID x hashtag incidence
     with open(csv_file, encoding='utf-8') as f:
         csv_reader = csv.reader(f, delimiter=',')   # handles URLs with commas
         line_count = 0
@@ -138,36 +170,19 @@ if __name__=='__main__':
             if ci:
                 node = node.lower()
 
-            if t_id in cooccurrences:
-                cooccurrences[t_id].append(node)
-            else:
-                cooccurrences[t_id] = [node]
-
-    log(cooccurrences)
-    g = nx.Graph()
-    for t_id in cooccurrences:
-        if len(cooccurrences[t_id]) > 1:
-            nodes = cooccurrences[t_id]
-            for i in range(len(nodes) - 1):
-                for j in range(i+1, len(nodes)):
-                    log('[%d,%d]' % (i,j))
-                    n1 = nodes[i]
-                    n2 = nodes[j]
-                    if n1 not in g: g.add_node(n1, label=n1)
-                    if n2 not in g: g.add_node(n2, label=n2)
-                    if g.has_edge(n1, n2):
-                        g[n1][n2]['weight'] += 1.0
-                    else:
-                        g.add_edge(n1, n2, weight=1.0)
-
-    for u,v,d in g.edges(data=True):
-        d['label'] = '%d' % d['weight']
+            cooccurrences.add(t_id, node)
+
+    sg = cooccurrences.build(min_weight)
+    log('Graph: %d nodes, %d edges' % (len(sg), sg.number_of_edges()))
+    if backbone:
+        sg = sparse_backbone(sg, backbone, backbone_threshold)
+        log('Backbone: %d nodes, %d edges' % (len(sg), sg.number_of_edges()))
 
     if not out_file:
-        out_file = os.path.join(out_dir, '%s-cooccurrence.graphml' % extract_filename(csv_file))
+        out_file = os.path.join(extract_parent_dir(csv_file), '%s-cooccurrence.graphml' % extract_filename(csv_file))
     parent_dir = extract_parent_dir(out_file)
     if not os.path.exists(parent_dir):
         os.mkdir(parent_dir)
-    nx.write_graphml(g, out_file)
+    write_graph(sg, out_file, node_attrs=lambda n: { 'label' : n }, edge_label='%d')
 
     print('Wrote graph to %s' % out_file)
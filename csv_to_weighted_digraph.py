@@ -2,18 +2,24 @@
 
 from __future__ import print_function
 from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
 
 
 import csv
-import networkx as nx
 import ntpath  # https://stackoverflow.com/a/8384788
+import numpy as np
 import os
 import sys
 
 
+from graph_io import write_graph
+from sparse_graphs import SparseGraphBuilder
+
+
 class Options:
     def __init__(self):
-        self.usage = 'csv_to_weighted_digraph.py -f <csvfilename> -s <srccol> -t <tgtcol> [-k <kindcol> -v -o <outdir>]'
+        self.usage = 'csv_to_weighted_digraph.py (-f <csvfilename> -s <srccol> -t <tgtcol> [-k <kindcol> -o <outfile>] | --spec <csvfilename>,<srccol>,<tgtcol>[,<kindcol>[,<outfile>]] ...) [-v -j <jobs>]'
         self._init_parser()
 
     def _init_parser(self):
@@ -46,16 +52,16 @@ class Options:
         self.parser.add_argument(
             '-s', '--src-col',
             dest='src_col',
-            required=True,
+            default=None,
             type=int,
-            help='Column for source nodes IDs (column index starts at 1)'
+            help='Column for source nodes IDs (column index starts at 1, required unless --spec is used)'
         )
         self.parser.add_argument(
             '-t', '--tgt-col',
             dest='tgt_col',
-            required=True,
+            default=None,
             type=int,
-            help='Column for target nodes IDs (column index starts at 1)'
+            help='Column for target nodes IDs (column index starts at 1, required unless --spec is used)'
         )
         self.parser.add_argument(
             '-k', '--kind-col',
@@ -79,15 +85,29 @@ class Options:
         self.parser.add_argument(
             '-f', '--csvfile',
             dest='csv_file',
-            required=True,
-            help='CSV filename to read'
+            default=None,
+            help='CSV filename to read (required unless --spec is used)'
         )
         self.parser.add_argument(
             '-o', '--out-file',
             dest='out_file',
             default=None,
             required=False,
-            help='Filename to which to write output (default <infile-".csv">.graphml)'
+            help='Filename to which to write output, as .graphml, .npz or .parquet (default <infile-".csv">.graphml)'
+        )
+        self.parser.add_argument(
+            '--spec',
+            dest='specs',
+            action='append',
+            default=[],
+            help='A CSV to convert as <csvfilename>,<srccol>,<tgtcol>[,<kindcol>[,<outfile>]] - may be given many times, sharing the other options'
+        )
+        self.parser.add_argument(
+            '-j', '--jobs',
+            dest='jobs',
+            default=1,
+            type=int,
+            help='Number of CSVs to convert at once, in separate processes (default: 1)'
         )
 
 
@@ -111,6 +131,88 @@ def extract_filename(filepath, default_name='UNKNOWN.txt'):
     return os.path.splitext(filename)[0]
 
 
+def parse_spec(spec):
+    """(csv_file, src_col, tgt_col, type_col, out_file) from '<file>,<src>,<tgt>[,<kind>[,<out>]]'."""
+    parts = spec.split(',')
+    if len(parts) < 3 or len(parts) > 5:
+        raise ValueError('Bad spec: %s' % spec)
+    kind = int(parts[3]) if len(parts) > 3 and parts[3] else None
+    out = parts[4] if len(parts) > 4 and parts[4] else None
+    return (parts[0], int(parts[1]), int(parts[2]), kind, out)
+
+
+def read_columns(csv_file, cols, header):
+    """
+    The given (0-based) columns of a CSV file as numpy string arrays, read by
+    pandas if it's installed, and otherwise by csv.reader, picking the columns
+    out of each row with itemgetter.
+    """
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+    if pd is not None:
+        df = pd.read_csv(
+            csv_file, header=None, skiprows=1 if header else 0, usecols=sorted(set(cols)),
+            dtype=str, keep_default_na=False, encoding='utf-8'
+        )
+        return [df[c].to_numpy(dtype=str) for c in cols]
+    with open(csv_file, encoding='utf-8', newline='') as f:
+        csv_reader = csv.reader(f, delimiter=',')   # handles URLs with commas
+        if header:
+            next(csv_reader, None)
+        rows = list(map(itemgetter(*cols), filter(None, csv_reader)))
+    if not rows:
+        return [np.zeros(0, dtype=str) for c in cols]
+    return [np.array(column, dtype=str) for column in zip(*rows)]
+
+
+def build_digraph(csv_file, src_col, tgt_col, type_col, header, ci, src_type, tgt_type):
+    """
+    (SparseGraph, { node : n_type }) of the src to tgt links in a CSV file,
+    weighted by how often they appear and tagged with the first kind given
+    (from type_col, if not None). Columns start at 0. Nodes get the n_type
+    of the column they first appeared in.
+    """
+    cols = [src_col, tgt_col] + ([type_col] if type_col is not None else [])
+    columns = read_columns(csv_file, cols, header)
+    (srcs, tgts) = (columns[0], columns[1])
+    if ci:
+        srcs = np.char.lower(srcs)
+        tgts = np.char.lower(tgts)
+
+    builder = SparseGraphBuilder(weight_type=float)
+    (s, t) = builder.add_edge_arrays(srcs, tgts, 1.0, columns[2] if type_col is not None else None)
+    sg = builder.build()  # e_type is the first kind seen
+
+    both = np.empty(2 * len(s), dtype=np.int64)
+    both[0::2] = s
+    both[1::2] = t
+    (codes, firsts) = np.unique(both, return_index=True)
+    first_as_src = np.zeros(len(sg), dtype=bool)
+    first_as_src[codes] = firsts % 2 == 0
+    n_types = dict(
+        (n, src_type if is_src else tgt_type) for n, is_src in zip(sg.labels, first_as_src.tolist())
+    )
+    return (sg, n_types)
+
+
+def convert(spec, header, ci, src_type, tgt_type):
+    """Writes the graph of one (csv_file, src_col, tgt_col, type_col, out_file) spec (columns start at 1)."""
+    (csv_file, src_col, tgt_col, type_col, out_file) = spec
+    (sg, n_types) = build_digraph(
+        csv_file, src_col - 1, tgt_col - 1, type_col - 1 if type_col else None, header, ci, src_type, tgt_type
+    )
+
+    if not out_file:
+        out_file = os.path.join(extract_parent_dir(csv_file), '%s.graphml' % extract_filename(csv_file))
+    parent_dir = extract_parent_dir(out_file)
+    if not os.path.exists(parent_dir):
+        os.makedirs(parent_dir)
+    write_graph(sg, out_file, node_attrs=lambda n: { 'label' : n, 'n_type' : n_types[n] }, tag_name='e_type')
+    return (out_file, len(sg), sg.number_of_edges())
+
+
 def eprint(*args, **kwargs):
     """Print to stderr"""
     print(*args, file=sys.stderr, **kwargs)
@@ -126,50 +228,37 @@ if __name__=='__main__':
     opts = options.parse(sys.argv[1:])
 
     DEBUG=opts.verbose
-    log('Inspecting CSV file %s' % opts.csv_file)
 
-    csv_file = opts.csv_file
-    src_col  = opts.src_col - 1
-    tgt_col  = opts.tgt_col - 1
-    type_col = opts.type_col - 1
-    out_file = opts.out_file
+    specs = []
+    if opts.csv_file:
+        if opts.src_col is None or opts.tgt_col is None:
+            options.parser.error('-s and -t are required with -f')
+        specs.append((opts.csv_file, opts.src_col, opts.tgt_col, opts.type_col, opts.out_file))
+    try:
+        specs.extend(parse_spec(spec) for spec in opts.specs)
+    except ValueError as e:
+        options.parser.error(str(e))
+    if not specs:
+        options.parser.error('Either -f (with -s and -t) or --spec is required')
+    if opts.jobs < 1:
+        options.parser.error('--jobs must be at least 1')
+
     header   = opts.expect_header
     src_type = opts.src_type
     tgt_type = opts.tgt_type
     ci       = opts.case_insensitive
 
-    g = nx.DiGraph()
-    with open(csv_file, encoding='utf-8') as f:
-        csv_reader = csv.reader(f, delimiter=',')   # handles URLs with commas
-        line_count = 0
-        for row in csv_reader:
-            # print('linecount: %d, header: %s' % (line_count, header))
-            line_count += 1
-            if line_count == 1 and header:
-                continue
-
-            src = row[src_col]
-            tgt = row[tgt_col]
-            e_t = row[type_col]
-
-            if ci:
-                src = src.lower()
-                tgt = tgt.lower()
-
-            if g.has_edge(src, tgt):
-                g[src][tgt]['weight'] += 1.0
-            else:
-                if not g.has_node(src): g.add_node(src, label=src, n_type=src_type)
-                if not g.has_node(tgt): g.add_node(tgt, label=tgt, n_type=tgt_type)
-                g.add_edge(src, tgt, weight=1.0, e_type=e_t)
-
-            line_count += 1
-
-    if not out_file:
-        out_file = os.path.join(out_dir, '%s.graphml' % extract_filename(csv_file))
-    parent_dir = extract_parent_dir(out_file)
-    if not os.path.exists(parent_dir):
-        os.mkdir(parent_dir)
-    nx.write_graphml(g, out_file)
-
-    log('Wrote graph to %s' % out_file)
+    args = (header, ci, src_type, tgt_type)
+    if opts.jobs == 1 or len(specs) == 1:
+        for spec in specs:
+            log('Inspecting CSV file %s' % spec[0])
+            (out_file, n_nodes, n_edges) = convert(spec, *args)
+            log('Graph: %d nodes, %d edges' % (n_nodes, n_edges))
+            log('Wrote graph to %s' % out_file)
+    else:
+        with ProcessPoolExecutor(max_workers=opts.jobs) as pool:
+            futures = [pool.submit(convert, spec, *args) for spec in specs]
+            for spec, future in zip(specs, futures):
+                (out_file, n_nodes, n_edges) = future.result()
+                log('%s: %d nodes, %d edges' % (spec[0], n_nodes, n_edges))
+                log('Wrote graph to %s' % out_file)
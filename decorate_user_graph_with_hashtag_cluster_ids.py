@@ -2,6 +2,7 @@
 
 import json
 import networkx as nx
+import numpy as np
 import statistics
 import sys
 
@@ -10,6 +11,8 @@ from argparse import ArgumentParser
 from basic_tweet_corpus_stats import lowered_hashtags_from
 from collections import Counter
 from community import community_louvain
+from graph_io import read_networkx, write_graph
+from sparse_graphs import BipartiteBuilder, SparseGraph
 
 
 class Options:
@@ -63,7 +66,7 @@ class Options:
             '-o',
             dest='out_file',
             required=True,
-            help='GraphML file to write hashtag graph to.'
+            help='File to write the decorated user graph to (.graphml, .npz or .parquet).'
         )
         # self.parser.add_argument(
         #     '--ignore',
@@ -85,20 +88,6 @@ class Options:
         return self.parser.parse_args(args)
 
 
-def add_nodes(g, *nodes):
-    for n in nodes:
-        if n not in g:
-            g.add_node(n, label=n)
-
-
-def add_weighted_edge(g, u, v, weight_property='weight'):
-    if g.has_edge(u, v):
-        g[u][v][weight_property] += 1.0
-    else:
-        g.add_edge(u, v)
-        g[u][v][weight_property] = 1.0
-
-
 def safe_mode(l):
     try:
         return statistics.mode(l)
@@ -136,14 +125,14 @@ if __name__=='__main__':
     log('Users:     %s' % users_file)
     log('Hashtags:  %s' % hashtags_file)
     log('Tweets:    %s' % tweets_file)
-    log('Out GraphML: %s' % out_file)
+    log('Out graph:   %s' % out_file)
     # log('Ignore:      %s' % ','.join(to_ignore))
     # log('Min weight:  %d' % min_weight)
     log('Dry run:     %s' % dry_run)
     log('Propagate labels: %s' % propagate_labels)
 
     # record the hashtag uses
-    users_hashtags = {}  # user_id : map(hashtags:counts)
+    users_hashtags = BipartiteBuilder()  # user x hashtag uses
     tweet_count = 0
     with open(tweets_file, 'r', encoding='utf-8') as f:
         for line in f.readlines():
@@ -165,43 +154,33 @@ if __name__=='__main__':
             # if 'quoted_status' in tweet and tweet['quoted_status']:
             #     hashtags = list(set(hashtags + lowered_hashtags_from(tweet['quoted_status'])))
 
-            if user_id not in users_hashtags:
-                users_hashtags[user_id] = dict([(ht, 1) for ht in hashtags])
-            else:
-                for ht in hashtags:
-                    if ht in users_hashtags[user_id]:
-                        users_hashtags[user_id][ht] += 1
-                    else:
-                        users_hashtags[user_id][ht] = 1
+            users_hashtags.row(user_id)
+            for ht in hashtags:
+                users_hashtags.add(user_id, ht)
 
     log('')
     log('Tweets: %d' % tweet_count)
-    log('Users: %d' % len(users_hashtags))
+    log('Users: %d' % len(users_hashtags.row_labels))
 
     # read graph files
-    u_g  = nx.read_graphml(users_file)
-    ht_g = nx.read_graphml(hashtags_file)
+    u_g  = read_networkx(users_file)
+    ht_g = read_networkx(hashtags_file)
 
     # look for communities (Louvain): { hashtag : cluster_id }
     partition = community_louvain.best_partition(ht_g)
-    sorted_hashtags = sorted(list(partition.keys()))
-
-    # find users' preferred/predominant hashtags
-    users_preferred_hashtag = {}
-    for user in users_hashtags:
-        hashtag_counts = users_hashtags[user]
-        if len(hashtag_counts) == 0:
-            users_preferred_hashtag[user] = ''
-            continue
-        max_count = max(hashtag_counts.values())
-        for ht in sorted_hashtags:
-            if ht in hashtag_counts and hashtag_counts[ht] == max_count:
-                users_preferred_hashtag[user] = ht
-                continue
-        for ht in sorted(hashtag_counts.keys()):  # keep key order consistent
-            if hashtag_counts[ht] == max_count:
-                users_preferred_hashtag[user] = ht
-                break
+
+    # find users' preferred/predominant hashtags: their most used, with ties
+    # going to the alphabetically first (users without hashtags get '')
+    users_preferred_hashtag = dict([(user, '') for user in users_hashtags.row_labels])
+    uses = users_hashtags.matrix().tocoo()
+    hashtags = users_hashtags.col_labels
+    alphabetical_rank = np.zeros(len(hashtags), dtype=np.int64)
+    alphabetical_rank[sorted(range(len(hashtags)), key=lambda i: hashtags[i])] = np.arange(len(hashtags))
+    order = np.lexsort((alphabetical_rank[uses.col], -uses.data, uses.row))
+    rows, cols = uses.row[order], uses.col[order]
+    firsts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    for user, ht in zip(rows[firsts].tolist(), cols[firsts].tolist()):
+        users_preferred_hashtag[users_hashtags.row_labels[user]] = hashtags[ht]
 
     UNASSIGNED = max(set(partition.values())) + 1
     unassigned_count = 0
@@ -237,7 +216,10 @@ if __name__=='__main__':
 
         unassigned_count = len(unassigned_nodes)
 
-    nx.write_graphml(u_g, out_file)
+    write_graph(
+        SparseGraph.from_networkx(u_g, tag_name='e_type', keep_attrs=True), out_file,
+        node_attrs=lambda n: u_g.nodes[n], tag_name='e_type'
+    )
 
     print('DONE - Hashtag Graph[file=%s,nodes=%d,edges=%d,ht_clusters=%d,unassigned=%d(%.2f)]' % (
         out_file, len(u_g), len(u_g.edges()), len(set(partition.values())), unassigned_count,
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+from argparse import ArgumentParser
+
+
+import sys
+
+
+from graph_io import write_graph
+from interaction_graphs import ARG_TS_FORMAT, node_types, parse_ts, timestamp_2_epoch_seconds
+from temporal_edge_store import TemporalEdgeStore
+
+
+# Writes the graph of one interaction type over a [start, end) window from a
+# temporal edge store made by build_temporal_edge_store.py, straight from its
+# time-sorted edge columns, without going back to the tweets.
+
+
+class Options:
+    def __init__(self):
+        self.usage = 'extract_window_graph.py -s <store.npz> -t <graph_type> -o <outfile.(graphml|npz|parquet)> [--start "YYYY-MM-DD HH:MM" (--end "YYYY-MM-DD HH:MM" | -w <window_in_mins>)]'
+        self._init_parser()
+
+    def _init_parser(self):
+
+        self.parser = ArgumentParser(usage=self.usage,conflict_handler='resolve')
+        self.parser.add_argument(
+            '-v', '--verbose',
+            action='store_true',
+            default=False,
+            dest='verbose',
+            help='Turn on verbose logging (default: False)'
+        )
+        self.parser.add_argument(
+            '-s', '--store',
+            dest='store_file',
+            required=True,
+            help='Temporal edge store to read (.npz)'
+        )
+        self.parser.add_argument(
+            '-t', '--type',
+            dest='g_type',
+            default='MENTION',
+            help='Graph type to extract (default: MENTION)'
+        )
+        self.parser.add_argument(
+            '--start',
+            dest='start',
+            default=None,
+            help='Start of the window, inclusive, as "%s" (default: the first tweet)' % ARG_TS_FORMAT.replace('%', '%%')
+        )
+        self.parser.add_argument(
+            '--end',
+            dest='end',
+            default=None,
+            help='End of the window, exclusive, as "%s" (default: after the last tweet)' % ARG_TS_FORMAT.replace('%', '%%')
+        )
+        self.parser.add_argument(
+            '-w', '--window',
+            dest='window_mins',
+            default=None,
+            type=int,
+            help='Length of the window in minutes, instead of --end'
+        )
+        self.parser.add_argument(
+            '-o',
+            dest='out_file',
+            required=True,
+            help='File to write the graph to (.graphml, .npz or .parquet)'
+        )
+
+
+    def parse(self, args=None):
+        return self.parser.parse_args(args)
+
+
+def eprint(*args, **kwargs):
+    """Print to stderr"""
+    print(*args, file=sys.stderr, **kwargs)
+
+
+DEBUG=False
+def log(msg):
+    if DEBUG: eprint(msg)
+
+
+if __name__=='__main__':
+    options = Options()
+    opts = options.parse(sys.argv[1:])
+
+    DEBUG=opts.verbose
+
+    store = TemporalEdgeStore.load(opts.store_file)
+
+    to_epoch = lambda ts_str: timestamp_2_epoch_seconds(parse_ts(ts_str, ARG_TS_FORMAT))
+    start = to_epoch(opts.start) if opts.start else store.time_span()[0]
+    if opts.end and opts.window_mins:
+        options.parser.error('Use one of --end and --window')
+    end = to_epoch(opts.end) if opts.end else None
+    if opts.window_mins:
+        end = start + opts.window_mins * 60
+
+    log('Store:  %s (%d interactions)' % (opts.store_file, len(store)))
+    log('Type:   %s' % opts.g_type)
+    log('Window: [%s, %s)' % (start, end))
+
+    try:
+        sg = store.graph(opts.g_type, start, end)
+    except ValueError as e:
+        options.parser.error(str(e))
+    n_types = node_types(sg, opts.g_type)
+    write_graph(
+        sg, opts.out_file, node_attrs=lambda n: { 'label' : n, 'n_type' : n_types[n] }, tag_name='e_type'
+    )
+
+    print('DONE - %s Graph[file=%s,nodes=%d,edges=%d]' % (opts.g_type, opts.out_file, len(sg), sg.number_of_edges()))
@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+from xml.sax.saxutils import escape, quoteattr
+
+
+import hashlib
+import json
+import numpy as np
+import os
+import scipy.sparse as sp
+import xml.etree.ElementTree as ET
+
+
+from sparse_graphs import SparseGraph, SparseGraphBuilder, edge_columns
+
+
+#
+# Writing (and reading back) SparseGraphs in a format chosen by file extension:
+# GraphML (streamed out a node and a chunk of edges at a time, straight from
+# the edge arrays, rather than built as an XML tree in memory the way
+# nx.write_graphml does), NPZ (the CSR arrays, node labels and attributes and
+# edge tags, via numpy) or Parquet (an edge list table, with the nodes in the
+# file's metadata; needs pyarrow).
+#
+
+
+GRAPH_FORMATS = {
+    '.graphml' : 'GRAPHML',
+    '.npz'     : 'NPZ',
+    '.parquet' : 'PARQUET'
+}
+
+
+def graph_format(path):
+    """The format (GRAPHML, NPZ or PARQUET) implied by path's extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in GRAPH_FORMATS:
+        raise ValueError(
+            'Cannot tell graph format of %s (expected one of: %s)' % (path, ', '.join(GRAPH_FORMATS))
+        )
+    return GRAPH_FORMATS[ext]
+
+
+def node_columns(sg, node_attrs=None):
+    """
+    { attr_name : [value per node, or None] }, in the order attributes are
+    first seen, from calling node_attrs with each of sg's node labels.
+    """
+    columns = {}
+    if not node_attrs:
+        return columns
+    n = len(sg)
+    for i, label in enumerate(sg.labels):
+        for k, v in node_attrs(label).items():
+            if k not in columns:
+                columns[k] = [None] * n
+            columns[k][i] = v
+    return columns
+
+
+def graphml_type(value):
+    if isinstance(value, (bool, np.bool_)):
+        return 'boolean'
+    if isinstance(value, (int, np.integer)):
+        return 'long'
+    if isinstance(value, (float, np.floating)):
+        return 'double'
+    return 'string'
+
+
+def graphml_value(value):
+    if isinstance(value, (bool, np.bool_)):
+        return 'true' if value else 'false'
+    return escape(str(value))
+
+
+GRAPHML_HEADER = """<?xml version='1.0' encoding='utf-8'?>
+<graphml xmlns="http://graphml.graphdrawing.org/xmlns" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">
+"""
+
+
+def write_graphml(sg, path, node_attrs=None, edge_attrs=None, tag_name=None, weight='weight',
+                  edge_label=None, chunk_size=100000):
+    """
+    Streams sg out as GraphML, with its edge_columns. node_attrs, edge_attrs,
+    tag_name and weight are as for SparseGraph.to_networkx; edge_label, if
+    given, is a %-format applied to each edge's weight to give it a label
+    attribute (e.g. '%d').
+    """
+    columns = node_columns(sg, node_attrs)
+    constant = edge_attrs or {}
+
+    # declare the attribute keys up front, typed by their first values
+    keys = []  # (key_id, for, name, type)
+    node_keys = []  # (key_id, column)
+    for name, values in columns.items():
+        first = next((v for v in values if v is not None), '')
+        key_id = 'd%d' % len(keys)
+        keys.append((key_id, 'node', name, graphml_type(first)))
+        node_keys.append((key_id, values))
+    edge_data = ''  # the same for every edge
+    for name, value in constant.items():
+        key_id = 'd%d' % len(keys)
+        keys.append((key_id, 'edge', name, graphml_type(value)))
+        edge_data += '      <data key="%s">%s</data>\n' % (key_id, graphml_value(value))
+    edge_keys = []  # (key_id, column)
+    for name, values in sg.edge_columns.items():
+        first = next((v for v in values if v is not None), '')
+        key_id = 'd%d' % len(keys)
+        keys.append((key_id, 'edge', name, graphml_type(first)))
+        edge_keys.append((key_id, values))
+    if weight is not None:
+        w_type = 'long' if np.issubdtype(sg.matrix.dtype, np.integer) else 'double'
+        w_key = 'd%d' % len(keys)
+        keys.append((w_key, 'edge', weight, w_type))
+    if tag_name:
+        tag_key = 'd%d' % len(keys)
+        keys.append((tag_key, 'edge', tag_name, 'string'))
+    if edge_label:
+        label_key = 'd%d' % len(keys)
+        keys.append((label_key, 'edge', 'label', 'string'))
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(GRAPHML_HEADER)
+        for key in keys:
+            f.write('  <key id="%s" for="%s" attr.name=%s attr.type="%s" />\n' % (
+                key[0], key[1], quoteattr(key[2]), key[3]
+            ))
+        f.write('  <graph edgedefault="%s">\n' % ('directed' if sg.directed else 'undirected'))
+
+        ids = [quoteattr(str(l)) for l in sg.labels]
+        for i, node_id in enumerate(ids):
+            data = ''.join(
+                '      <data key="%s">%s</data>\n' % (key_id, graphml_value(values[i]))
+                for key_id, values in node_keys if values[i] is not None
+            )
+            if data:
+                f.write('    <node id=%s>\n%s    </node>\n' % (node_id, data))
+            else:
+                f.write('    <node id=%s />\n' % node_id)
+
+        (srcs, tgts, weights) = sg.edge_arrays()
+        tags = sg.edge_tag_list() if tag_name else None
+        for start in range(0, len(srcs), chunk_size):
+            end = start + chunk_size
+            lines = []
+            for j, (s, t, w) in enumerate(zip(
+                    srcs[start:end].tolist(), tgts[start:end].tolist(), weights[start:end].tolist())):
+                data = edge_data + ''.join(
+                    '      <data key="%s">%s</data>\n' % (key_id, graphml_value(values[start + j]))
+                    for key_id, values in edge_keys if values[start + j] is not None
+                )
+                if weight is not None:
+                    data += '      <data key="%s">%s</data>\n' % (w_key, w)
+                if tags is not None and tags[start + j] is not None:
+                    data += '      <data key="%s">%s</data>\n' % (tag_key, escape(str(tags[start + j])))
+                if edge_label:
+                    data += '      <data key="%s">%s</data>\n' % (label_key, escape(edge_label % w))
+                lines.append('    <edge source=%s target=%s>\n%s    </edge>\n' % (ids[s], ids[t], data))
+            f.write(''.join(lines))
+
+        f.write('  </graph>\n</graphml>\n')
+
+
+GRAPHML_TYPES = {
+    'boolean' : lambda v: v.strip().lower() in ('true', '1'),
+    'int'     : int,
+    'long'    : int,
+    'float'   : float,
+    'double'  : float,
+    'string'  : str
+}
+
+
+def local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def read_graphml(path, tag_name='e_type', weight='weight'):
+    """
+    (SparseGraph, { attr_name : node values }, tag_name, weight) parsed from a
+    GraphML file incrementally, going straight into edge arrays and dropping
+    each node and edge element once read. Edges' other attributes go in the
+    SparseGraph's edge_columns. Parallel edges have their weights summed (and
+    the last one's other attributes kept). weight is None if the file has no
+    such edge attribute, every edge then weighing 1 (but having no weight
+    attribute when converted to networkx).
+    """
+    keys = {}  # key_id : (for, name, convert, default)
+    graph = None
+    builder = None
+    node_data = []  # attributes of each node, by code
+    (e_srcs, e_tgts, e_data) = ([], [], [])  # edges with other attributes
+    for event, elem in ET.iterparse(path, events=('start', 'end')):
+        kind = local_name(elem.tag)
+        if event == 'start':
+            if kind == 'graph' and graph is None:  # keys are all declared by now
+                graph = elem
+                directed = elem.get('edgedefault', 'directed') == 'directed'
+                tag_key = tag_name if directed else None  # only directed graphs have tags
+                w_type = float
+                w_default = 1
+                has_weight = False
+                node_defaults = {}
+                edge_defaults = {}  # of the other edge attributes
+                edge_keys = {}  # key_id : attr name
+                for k_id, (k_for, k_name, convert, default) in keys.items():
+                    if k_for in ('node', 'all') and default is not None:
+                        node_defaults[k_name] = default
+                    if k_for in ('edge', 'all'):
+                        edge_keys[k_id] = k_name
+                        if k_name == weight:
+                            has_weight = True
+                            w_type = int if convert is int else float
+                            w_default = default if default is not None else 1
+                        elif k_name != tag_key and default is not None:
+                            edge_defaults[k_name] = default
+                builder = SparseGraphBuilder(directed=directed, weight_type=w_type)
+            continue
+
+        if kind == 'key':
+            convert = GRAPHML_TYPES.get(elem.get('attr.type', 'string'), str)
+            default = None
+            for child in elem:
+                if local_name(child.tag) == 'default':
+                    default = convert(child.text or '')
+            keys[elem.get('id')] = (elem.get('for'), elem.get('attr.name'), convert, default)
+        elif kind == 'node' and builder is not None:
+            c = builder.code(elem.get('id'))
+            while len(node_data) <= c:
+                node_data.append(dict(node_defaults))
+            for child in elem:
+                k = keys.get(child.get('key'))
+                if local_name(child.tag) == 'data' and k and k[0] in ('node', 'all'):
+                    node_data[c][k[1]] = k[2](child.text or '')
+            graph.clear()
+        elif kind == 'edge' and builder is not None:
+            w = w_default
+            tag = None
+            d = dict(edge_defaults)
+            for child in elem:
+                name = edge_keys.get(child.get('key'))
+                if name == weight:
+                    w = keys[child.get('key')][2](child.text or '')
+                elif name == tag_key:
+                    tag = child.text or ''
+                elif name is not None and local_name(child.tag) == 'data':
+                    d[name] = keys[child.get('key')][2](child.text or '')
+            (src, tgt) = (elem.get('source'), elem.get('target'))
+            builder.add_edge(src, tgt, w, tag=tag)
+            if d:
+                e_srcs.append(builder.codes[src])
+                e_tgts.append(builder.codes[tgt])
+                e_data.append(d)
+            graph.clear()
+
+    if builder is None:
+        raise ValueError('No graph found in %s' % path)
+    sg = builder.build()
+    sg.edge_columns = edge_columns(sg, e_srcs, e_tgts, e_data)
+    while len(node_data) < len(sg):  # nodes only mentioned by edges
+        node_data.append(dict(node_defaults))
+    columns = {}
+    for c, d in enumerate(node_data):
+        for k, v in d.items():
+            if k not in columns:
+                columns[k] = [None] * len(node_data)
+            columns[k][c] = v
+    return (sg, columns, tag_key if sg.edge_tags is not None else None, weight if has_weight else None)
+
+
+def filled(values):
+    """
+    (array, missing) of values as a numpy array with Nones replaced by False,
+    0, NaN or '' (as fits the first value given), and a mask of where the
+    Nones were (or None, if there weren't any).
+    """
+    first = next((v for v in values if v is not None), '')
+    if isinstance(first, (bool, np.bool_)):
+        empty = False
+    elif isinstance(first, (int, np.integer)):
+        empty = 0
+    elif isinstance(first, (float, np.floating)):
+        empty = np.nan
+    else:
+        empty = ''
+        values = [v if v is None else str(v) for v in values]
+    missing = np.array([v is None for v in values], dtype=bool)
+    array = np.array([empty if v is None else v for v in values])
+    return (array, missing if missing.any() else None)
+
+
+def unfilled(array, missing=None):
+    """The list of values in array, with None where missing."""
+    values = array.tolist()
+    if missing is not None:
+        values = [None if m else v for v, m in zip(values, missing.tolist())]
+    return values
+
+
+def write_npz(sg, path, node_attrs=None, tag_name=None, weight='weight', compressed=True):
+    """
+    Saves sg's CSR arrays, node labels, node attribute columns (as from
+    node_attrs), edge tags (as tag_name) and edge_columns in a (compressed)
+    .npz file.
+    """
+    m = sg.matrix
+    arrays = {
+        'indptr'   : m.indptr,
+        'indices'  : m.indices,
+        'data'     : m.data,
+        'shape'    : np.array(m.shape),
+        'labels'   : np.array([str(l) for l in sg.labels]),
+        'directed' : np.array(sg.directed),
+        'weight'   : np.array(weight or '')  # '' for none
+    }
+    columns = node_columns(sg, node_attrs)
+    arrays['node_attrs'] = np.array(list(columns.keys()), dtype=str)
+    for name, values in columns.items():
+        (arrays['node:%s' % name], missing) = filled(values)
+        if missing is not None:
+            arrays['missing:%s' % name] = missing
+    arrays['edge_attrs'] = np.array(list(sg.edge_columns.keys()), dtype=str)
+    for name, values in sg.edge_columns.items():
+        (arrays['edge:%s' % name], missing) = filled(values)
+        if missing is not None:
+            arrays['edge_missing:%s' % name] = missing
+    if tag_name and sg.edge_tags is not None:
+        arrays['tag_name'] = np.array(tag_name)
+        arrays['edge_tags'] = sg.edge_tags
+        arrays['tag_labels'] = np.array([str(t) for t in sg.tag_labels])
+    (np.savez_compressed if compressed else np.savez)(path, **arrays)
+
+
+def read_npz(path):
+    """(SparseGraph, { attr_name : node values }, tag_name, weight) from write_npz's file."""
+    with np.load(path) as f:
+        m = sp.csr_matrix((f['data'], f['indices'], f['indptr']), shape=tuple(f['shape']))
+        tag_name = str(f['tag_name']) if 'tag_name' in f else None
+        column = lambda kind, missing, n: unfilled(
+            f['%s:%s' % (kind, n)], f['%s:%s' % (missing, n)] if '%s:%s' % (missing, n) in f else None
+        )
+        sg = SparseGraph(
+            m, f['labels'].tolist(), directed=bool(f['directed']),
+            edge_tags=f['edge_tags'] if tag_name else None,
+            tag_labels=f['tag_labels'].tolist() if tag_name else None,
+            edge_columns=dict(
+                (n, column('edge', 'edge_missing', n)) for n in (f['edge_attrs'].tolist() if 'edge_attrs' in f else [])
+            )
+        )
+        columns = dict((n, column('node', 'missing', n)) for n in f['node_attrs'].tolist())
+        return (sg, columns, tag_name, str(f['weight']) or None)
+
+
+def write_parquet(sg, path, node_attrs=None, tag_name=None, weight='weight'):
+    """
+    Saves sg as a Parquet table of (source, target, weight[, tag_name], edge
+    column...) rows, with its direction, node labels and node attributes in
+    the file metadata.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    (srcs, tgts, weights) = sg.edge_arrays()
+    labels = np.array([str(l) for l in sg.labels], dtype=object)
+    table = {
+        'source' : pa.array(labels[srcs]) if len(srcs) else pa.array([], type=pa.string()),
+        'target' : pa.array(labels[tgts]) if len(tgts) else pa.array([], type=pa.string()),
+        weight or 'weight' : pa.array(weights)
+    }
+    if tag_name:
+        table[tag_name] = pa.array(sg.edge_tag_list(), type=pa.string())
+    for name, values in sg.edge_columns.items():
+        table[name] = pa.array(values)
+    graph = {
+        'directed'   : sg.directed,
+        'weight'     : weight,
+        'tag_name'   : tag_name,
+        'labels'     : labels.tolist(),
+        'node_attrs' : dict((n, unfilled(*filled(v))) for n, v in node_columns(sg, node_attrs).items())
+    }
+    table = pa.table(table).replace_schema_metadata({'graph' : json.dumps(graph)})
+    pq.write_table(table, path)
+
+
+def read_parquet(path):
+    """(SparseGraph, { attr_name : node values }, tag_name, weight) from write_parquet's file."""
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path)
+    graph = json.loads(table.schema.metadata[b'graph'])
+    labels = graph['labels']
+    codes = dict((l, i) for i, l in enumerate(labels))
+    srcs = np.array([codes[l] for l in table.column('source').to_pylist()], dtype=np.int64)
+    tgts = np.array([codes[l] for l in table.column('target').to_pylist()], dtype=np.int64)
+    w_column = graph['weight'] or 'weight'
+    weights = table.column(w_column).to_numpy()
+    tag_name = graph['tag_name']
+    directed = graph['directed']
+    # rows are in edge_arrays() order already, as are their other attributes
+    columns = dict(
+        (name, table.column(name).to_pylist()) for name in table.column_names
+        if name not in ('source', 'target', w_column, tag_name)
+    )
+
+    n = len(labels)
+    edge_tags = tag_labels = None
+    if tag_name:  # rows are in CSR order already, as are their tags
+        tags = table.column(tag_name).to_pylist()
+        tag_labels = sorted(set(t for t in tags if t is not None))
+        tag_codes = dict((t, i) for i, t in enumerate(tag_labels))
+        edge_tags = np.array([tag_codes[t] if t is not None else -1 for t in tags], dtype=np.int64)
+    if not directed:  # mirror the upper triangle, without doubling self-loops
+        loops = srcs == tgts
+        srcs, tgts = np.r_[srcs, tgts[~loops]], np.r_[tgts, srcs[~loops]]
+        weights = np.r_[weights, weights[~loops]]
+    m = sp.csr_matrix((weights, (srcs, tgts)), shape=(n, n))
+    sg = SparseGraph(m, labels, directed=directed, edge_tags=edge_tags, tag_labels=tag_labels, edge_columns=columns)
+    return (sg, graph['node_attrs'], tag_name, graph['weight'])
+
+
+def write_graph(sg, path, node_attrs=None, edge_attrs=None, tag_name=None, weight='weight', edge_label=None):
+    """
+    Writes sg to path in the format its extension implies. Constant edge_attrs
+    and edge labels are only kept by GraphML, for the benefit of viewers.
+    """
+    fmt = graph_format(path)
+    if fmt == 'GRAPHML':
+        write_graphml(sg, path, node_attrs, edge_attrs, tag_name, weight, edge_label)
+    elif fmt == 'NPZ':
+        write_npz(sg, path, node_attrs, tag_name, weight)
+    else:
+        write_parquet(sg, path, node_attrs, tag_name, weight)
+
+
+def attrs_from(sg, columns):
+    """A node_attrs function giving each of sg's nodes its (non-None) values in columns."""
+    codes = dict((l, i) for i, l in enumerate(sg.labels))
+    return lambda n: dict(
+        (k, v[codes[n]]) for k, v in columns.items() if v[codes[n]] is not None
+    )
+
+
+# parsed GraphML files are kept here as uncompressed .npz files, named by the
+# hash of the GraphML's content and the parser's version, which is bumped
+# whenever what read_graphml keeps changes (set GRAPH_CACHE_DIR to '' to turn
+# this off)
+CACHE_DIR = os.environ.get('GRAPH_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'graph_io'))
+PARSER_VERSION = 2
+
+
+def file_hash(path, block_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_graph(path, cache=True):
+    """
+    (SparseGraph, { attr_name : node values }, tag_name, weight) from a file
+    in the format its extension implies. GraphML files are parsed once and
+    then loaded from the cache, unless cache is False.
+    """
+    fmt = graph_format(path)
+    if fmt == 'NPZ':
+        return read_npz(path)
+    if fmt == 'PARQUET':
+        return read_parquet(path)
+    if not (cache and CACHE_DIR):
+        return read_graphml(path)
+
+    cached = os.path.join(CACHE_DIR, '%s-v%d.npz' % (file_hash(path), PARSER_VERSION))
+    if os.path.exists(cached):
+        return read_npz(cached)
+    (sg, columns, tag_name, weight) = read_graphml(path)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    partial = '%s.%d.npz' % (cached[:-4], os.getpid())  # so readers never see half a file
+    write_npz(sg, partial, attrs_from(sg, columns), tag_name, weight, compressed=False)
+    os.replace(partial, cached)
+    return (sg, columns, tag_name, weight)
+
+
+def read_networkx(path, cache=True):
+    """
+    A networkx graph, with node and edge attributes, read from path. Parallel
+    edges become one, with their weights summed; edges of a file without
+    weights are given none.
+    """
+    (sg, columns, tag_name, weight) = read_graph(path, cache)
+    return sg.to_networkx(node_attrs=attrs_from(sg, columns), tag_name=tag_name, weight=weight)
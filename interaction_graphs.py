@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+from datetime import datetime
+
+
+import numpy as np
+import os
+import time
+
+
+from basic_tweet_corpus_stats import expanded_urls_from, lowered_hashtags_from
+from graph_io import write_graph
+from sparse_graphs import SparseGraphBuilder
+
+
+#
+# The user interaction graphs in a corpus of tweets (and, if wanted, the
+# graphs of users to the hashtags and URLs they use), all built side by side
+# from a single pass over the corpus rather than one pass per graph type.
+#
+
+
+TWITTER_TS_FORMAT = '%a %b %d %H:%M:%S +0000 %Y'  #Tue Apr 26 08:57:55 +0000 2011
+ARG_TS_FORMAT = '%Y-%m-%d %H:%M' # 2016-12-25 7:53
+
+
+def parse_ts(ts_str, fmt=TWITTER_TS_FORMAT):
+    time_struct = time.strptime(ts_str, fmt)
+    return datetime.fromtimestamp(time.mktime(time_struct))
+
+
+def timestamp_2_epoch_seconds(ts):
+    return int(time.mktime(ts.timetuple()))
+
+
+GRAPH_TYPES = ['RETWEET','REPLY','QUOTE','MENTION','RTQT']
+ENTITY_GRAPH_TYPES = ['HASHTAG','URL']
+# names used in graph filenames, as for the CSVs from extract_all_separately.sh
+GRAPH_FILE_SUFFIXES = {
+    'RETWEET' : 'retweets',
+    'REPLY'   : 'replies',
+    'QUOTE'   : 'quotes',
+    'MENTION' : 'mentions',
+    'RTQT'    : 'rtqts',
+    'HASHTAG' : 'hashtags',
+    'URL'     : 'urls'
+}
+
+
+def interactions_from(t, g_type):
+    """Yields the (src, tgt) pairs the tweet contributes to a g_type graph."""
+    if g_type in ['RETWEET', 'RTQT'] and 'retweeted_status' in t and t['retweeted_status'] != None:
+        yield (t['user']['id_str'], t['retweeted_status']['user']['id_str'])
+    elif g_type in ['QUOTE', 'RTQT'] and 'quoted_status' in t and t['quoted_status'] != None:
+        yield (t['user']['id_str'], t['quoted_status']['user']['id_str'])
+    elif g_type == 'REPLY' and t['in_reply_to_status_id_str'] != None:
+        yield (t['user']['id_str'], t['in_reply_to_user_id_str'])
+    elif g_type == 'MENTION' and len(t['entities']['user_mentions']) > 0:
+        mentions = t['entities']['user_mentions']
+        if 'extended_tweet' in t:
+            mentions = t['extended_tweet']['entities']['user_mentions']
+        for m in mentions:
+            yield (t['user']['id_str'], m['id_str'])
+    elif g_type == 'HASHTAG':
+        for ht in lowered_hashtags_from(t):
+            yield (t['user']['id_str'], ht)
+    elif g_type == 'URL':
+        for url in expanded_urls_from(t):
+            yield (t['user']['id_str'], url)
+
+
+def interaction_type(t, g_type):
+    """The kind of interaction the tweet is in a g_type graph (RTQT mixes two)."""
+    if g_type == 'RTQT':
+        return 'RETWEET' if 'retweeted_status' in t and t['retweeted_status'] != None else 'QUOTE'
+    return g_type
+
+
+class InteractionGraphsBuilder:
+    """
+    Builds a directed weighted graph for each of g_types as tweets are added,
+    so every graph comes from the same single pass over a corpus. Edges are
+    tagged with the kind of interaction they were first seen as.
+    """
+    def __init__(self, g_types=GRAPH_TYPES, weight_type=float):
+        self.g_types = list(g_types)
+        self.builders = dict(
+            (g_type, SparseGraphBuilder(weight_type=weight_type)) for g_type in self.g_types
+        )
+        self.tweet_count = 0
+
+    def add(self, tweet):
+        self.tweet_count += 1
+        for g_type in self.g_types:
+            builder = self.builders[g_type]
+            tag = interaction_type(tweet, g_type)
+            for src, tgt in interactions_from(tweet, g_type):
+                builder.add_edge(src, tgt, tag=tag)
+
+    def add_all(self, tweets):
+        for t in tweets:
+            self.add(t)
+
+    def build(self):
+        """{ g_type : SparseGraph } of the tweets added so far."""
+        return dict((g_type, self.builders[g_type].build()) for g_type in self.g_types)
+
+
+def node_types(sg, g_type):
+    """
+    { node : n_type } for a g_type graph: USER, except for the hashtags or
+    URLs in HASHTAG or URL graphs, which are never the source of an edge.
+    """
+    if g_type not in ENTITY_GRAPH_TYPES:
+        return dict((n, 'USER') for n in sg.labels)
+    is_user = np.diff(sg.matrix.indptr) > 0
+    return dict((n, 'USER' if u else g_type) for n, u in zip(sg.labels, is_user.tolist()))
+
+
+def graph_filename(out_dir, base, g_type, ext='graphml'):
+    return os.path.join(out_dir, '%s-%s.%s' % (base, GRAPH_FILE_SUFFIXES[g_type], ext))
+
+
+def write_graphs(graphs, out_dir, base, ext='graphml'):
+    """
+    Writes each of { g_type : SparseGraph } to <out_dir>/<base>-<suffix>.<ext>,
+    with the node and edge attributes csv_to_weighted_digraph.py would give
+    it, returning { g_type : path }.
+    """
+    paths = {}
+    for g_type, sg in graphs.items():
+        n_types = node_types(sg, g_type)
+        paths[g_type] = graph_filename(out_dir, base, g_type, ext)
+        write_graph(
+            sg, paths[g_type], node_attrs=lambda n: { 'label' : n, 'n_type' : n_types[n] }, tag_name='e_type'
+        )
+    return paths
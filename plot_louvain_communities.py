@@ -3,7 +3,9 @@ import matplotlib.pyplot as plt
 import networkx as nx
 import sys
 
-G = nx.read_graphml(sys.argv[1]).to_undirected()
+from graph_io import read_networkx
+
+G = read_networkx(sys.argv[1]).to_undirected()
 
 #first compute the best partition
 partition = community.best_partition(G)
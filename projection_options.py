@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+
+from sparse_graphs import BACKBONE_METHODS, BACKBONE_THRESHOLDS, PROJECTION_WEIGHTINGS
+
+
+#
+# The command line options shared by the scripts that link the entities of a
+# bipartite user x entity network (build_bipartite_projection.py and the
+# hashtag co-mention and co-mentioner graph builders): how the projection is
+# weighted and pruned, and which edge backbone (if any) is kept.
+#
+
+
+def add_projection_arguments(parser, min_weight=None, min_weight_help='Smallest permitted edge weight'):
+    """Adds -w/--weighting, --min-weight (defaulting to min_weight) and --top-k to parser."""
+    parser.add_argument(
+        '-w', '--weighting',
+        dest='weighting',
+        default='BINARY',
+        choices=PROJECTION_WEIGHTINGS,
+        help='How to weight links by what they share (default: BINARY)'
+    )
+    parser.add_argument(
+        '--min-weight',
+        dest='min_weight',
+        default=min_weight,
+        type=float,
+        help='%s (default: %s)' % (min_weight_help, min_weight)
+    )
+    parser.add_argument(
+        '--top-k',
+        dest='top_k',
+        default=None,
+        type=int,
+        help='Only keep edges among the k heaviest of at least one of their nodes (default: None)'
+    )
+
+
+def add_backbone_arguments(parser):
+    """Adds --backbone and --backbone-threshold to parser."""
+    parser.add_argument(
+        '--backbone',
+        dest='backbone',
+        default=None,
+        choices=BACKBONE_METHODS,
+        help='Only keep the edges that stand out from what their nodes\' strengths would lead one to expect (default: None)'
+    )
+    parser.add_argument(
+        '--backbone-threshold',
+        dest='backbone_threshold',
+        default=None,
+        type=float,
+        help='Significance level for DISPARITY, or standard deviations for NOISE_CORRECTED (default: %s)' % ', '.join(
+            '%s for %s' % (BACKBONE_THRESHOLDS[m], m) for m in BACKBONE_METHODS
+        )
+    )
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+
+import numpy as np
+import scipy.stats as stats
+import warnings
+
+
+from rank_tables import in_both, top_x_indexes
+
+
+#
+# How alike two rankings of the same nodes are, from their scores over a
+# shared node index (as RankTable.align() leaves them): Kendall's tau-b and
+# weighted tau (with scipy's O(n log n) algorithms), Spearman's rho (of the
+# tie-averaged ranks) and rank-biased overlap (RBO, Webber et al.) of two top
+# x lists, which weighs agreement at the top most and needn't have the same
+# nodes in each list. Many pairs of rankings (e.g. every window of every
+# centrality) can be compared in one call: their Spearman's rhos and RBOs are
+# computed for all of them at once, but tau-b and weighted tau are still
+# computed pair by pair, by scipy.
+#
+
+
+RBO_PERSISTENCE = 0.9  # the chance of looking one rank further down; 0.9 puts most weight on the top 10
+
+
+def segment_ranks(values, segments):
+    """
+    The rank (1 being the highest, ties averaged) of each of values among
+    those with the same segment (a non-negative int per value).
+    """
+    n = len(values)
+    if n == 0:
+        return np.zeros(0)
+    order = np.lexsort((-values, segments))
+    (s, v) = (segments[order], values[order])
+    seg_starts = np.flatnonzero(np.r_[True, s[1:] != s[:-1]])
+    seg_of = np.cumsum(np.r_[True, s[1:] != s[:-1]]) - 1
+    ordinal = np.arange(n) - seg_starts[seg_of] + 1.0
+
+    tie_starts = np.flatnonzero(np.r_[True, (s[1:] != s[:-1]) | (v[1:] != v[:-1])])
+    tie_ends = np.r_[tie_starts[1:] - 1, n - 1]
+    tie_of = np.repeat(np.arange(len(tie_starts)), tie_ends - tie_starts + 1)
+    ranks = np.empty(n)
+    ranks[order] = ((ordinal[tie_starts] + ordinal[tie_ends]) / 2.0)[tie_of]
+    return ranks
+
+
+def spearman(xs, ys):
+    """
+    (rhos, p_values) of Spearman's rho between each pair of score arrays in
+    xs and ys (lists of arrays, paired up in order), NaN where there are
+    fewer than three scores or either ranking is all ties.
+    """
+    lengths = np.array([len(x) for x in xs], dtype=np.int64)
+    segments = np.repeat(np.arange(len(xs)), lengths)
+    if not len(segments):
+        return (np.full(len(xs), np.nan), np.full(len(xs), np.nan))
+    rx = segment_ranks(np.concatenate(xs).astype(np.float64), segments)
+    ry = segment_ranks(np.concatenate(ys).astype(np.float64), segments)
+
+    # Pearson's r of the ranks of each segment, from its sums
+    counts = np.maximum(lengths, 1).astype(np.float64)
+    sums = lambda a: np.bincount(segments, weights=a, minlength=len(xs))
+    (mx, my) = (sums(rx) / counts, sums(ry) / counts)
+    (dx, dy) = (rx - mx[segments], ry - my[segments])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rhos = sums(dx * dy) / np.sqrt(sums(dx * dx) * sums(dy * dy))
+        rhos = np.where(lengths >= 3, np.clip(rhos, -1.0, 1.0), np.nan)
+        dof = lengths - 2.0
+        t = rhos * np.sqrt(dof / ((1.0 - rhos) * (1.0 + rhos)))
+        p_values = 2 * stats.t.sf(np.abs(t), np.maximum(dof, 1))
+    return (rhos, np.where(np.isnan(rhos), np.nan, p_values))
+
+
+def kendall_tau_b(x, y):
+    """
+    (tau-b, p-value) of two score arrays, NaN if there are fewer than two (one
+    pair of arrays per call, unlike spearman() and rbos()).
+    """
+    if len(x) < 2:
+        return (np.nan, np.nan)
+    with warnings.catch_warnings():  # e.g. about constant input, which is NaN anyway
+        warnings.simplefilter('ignore')
+        result = stats.kendalltau(x, y)
+    return (float(result[0]), float(result[1]))
+
+
+def weighted_tau(x, y):
+    """Weighted tau (hyperbolically weighting disagreements by rank) of two score arrays."""
+    if len(x) < 2:
+        return np.nan
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return float(stats.weightedtau(x, y)[0])
+
+
+def rbos(tops1, tops2, p=RBO_PERSISTENCE):
+    """
+    The extrapolated rank-biased overlap of each pair of top x lists of node
+    indexes (highest first) in tops1 and tops2, each pair cut to the length
+    of its shorter list: 1 for the same list, 0 for lists with no nodes in
+    common, NaN for an empty one.
+    """
+    ks = np.array([min(len(t1), len(t2)) for (t1, t2) in zip(tops1, tops2)], dtype=np.int64)
+    results = np.full(len(ks), np.nan)
+    if not ks.sum():
+        return results
+    segments = np.repeat(np.arange(len(ks)), ks)
+    starts = np.r_[0, np.cumsum(ks)[:-1]]
+    depths = np.arange(len(segments)) - starts[segments] + 1
+    cut = lambda tops: np.concatenate([np.asarray(t[:k], dtype=np.int64) for (t, k) in zip(tops, ks)])
+    (nodes1, nodes2) = (cut(tops1), cut(tops2))
+    width = max(nodes1.max(), nodes2.max()) + 1  # keying nodes by pair, so they only match within it
+    (_, i1, i2) = np.intersect1d(
+        segments * width + nodes1, segments * width + nodes2, assume_unique=True, return_indices=True
+    )
+    # a node in both lists is in the overlap from the deeper of its two ranks on
+    overlaps = np.cumsum(np.bincount(np.maximum(i1, i2), minlength=len(segments)))
+    overlaps = overlaps - np.r_[0, overlaps][starts][segments]
+    weighted = np.bincount(segments, weights=overlaps / depths * p ** depths, minlength=len(ks))
+    nonempty = np.flatnonzero(ks)
+    k = ks[nonempty]
+    results[nonempty] = overlaps[starts[nonempty] + k - 1] / k * p ** k + (1 - p) / p * weighted[nonempty]
+    return results
+
+
+def rbo(top1, top2, p=RBO_PERSISTENCE):
+    """rbos() of a single pair of top x lists."""
+    return float(rbos([top1], [top2], p)[0])
+
+
+def similarities(pairs, top_x, p=RBO_PERSISTENCE):
+    """
+    A dict of statistics comparing each pair of RankTables (t1, t2) in pairs
+    by their top_x nodes among those they have in common: 'labels1' and
+    'labels2' (the nodes in both top_xs, each in its own order), 'tau' and
+    'tau_p' (tau-b), 'rho' and 'rho_p' (Spearman), 'wtau' (weighted tau) of
+    their two scores of those nodes, and 'rbo' of the two top_x lists.
+    Each statistic is a list, aligned with pairs. Only rho and rbo are
+    computed for every pair at once; tau and wtau take a scipy call per pair.
+    """
+    results = dict((k, []) for k in ['labels1', 'labels2', 'tau', 'tau_p', 'wtau'])
+    (xs, ys, tops1, tops2) = ([], [], [], [])
+    for (t1, t2) in pairs:
+        (c1, c2, top1, top2) = top_x_indexes(t1, t2, top_x)
+        (kept1, kept2) = in_both(top1, top2)
+        results['labels1'].append(c1.labels[kept1].tolist())
+        results['labels2'].append(c2.labels[kept2].tolist())
+        (x, y) = (c1.scores[kept1], c2.scores[kept1])  # the same nodes, scored by each
+        (tau, tau_p) = kendall_tau_b(x, y)
+        results['tau'].append(tau)
+        results['tau_p'].append(tau_p)
+        results['wtau'].append(weighted_tau(x, y))
+        xs.append(x)
+        ys.append(y)
+        tops1.append(top1)
+        tops2.append(top2)
+    (rhos, rho_ps) = spearman(xs, ys)
+    results['rho'] = rhos.tolist()
+    results['rho_p'] = rho_ps.tolist()
+    results['rbo'] = rbos(tops1, tops2, p).tolist()
+    return results
+
+
+def similarity(t1, t2, top_x, p=RBO_PERSISTENCE):
+    """similarities() of a single pair of RankTables, as a dict of statistic -> value."""
+    return dict((k, v[0]) for k, v in similarities([(t1, t2)], top_x, p).items())
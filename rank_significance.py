@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+from concurrent.futures import ProcessPoolExecutor
+
+
+import numpy as np
+import scipy.sparse as sp
+import scipy.stats as stats
+
+
+from rank_correlations import kendall_tau_b, similarities, spearman
+from rank_tables import RankTable
+from sparse_centralities import SCORERS
+from sparse_graphs import SparseGraph
+
+
+#
+# Resampling tests of the agreement between two rankings, for when the p-values
+# of tau and rho (which assume independent observations) can't be trusted, as
+# with overlapping samples of a network. A permutation test shuffles which
+# node has which score in one of the rankings, for the null distribution of
+# tau and rho; an edge bootstrap resamples both graphs' interactions and
+# recomputes their centralities, for confidence intervals of tau and rho.
+# Resamples are drawn in batches (with independent seeds), which a pool of
+# worker processes can share.
+#
+
+
+SIGNIFICANCE_METHODS = ['PERMUTATION', 'BOOTSTRAP']
+BATCH_SIZE = 100  # resamples drawn at once
+CONFIDENCE = 0.95
+
+
+def _batches(resamples, seed):
+    """[(seed sequence, size)] of the batches of resamples, with independent seeds."""
+    sizes = [min(BATCH_SIZE, resamples - i) for i in range(0, resamples, BATCH_SIZE)]
+    return list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+
+
+def _run(f, batches, jobs, *args):
+    """The results of f(*args, seed, size) for each batch, over a pool of jobs processes if more than one."""
+    if jobs <= 1 or len(batches) < 2:
+        return [f(*(args + batch)) for batch in batches]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(f, *(args + batch)) for batch in batches]
+        return [future.result() for future in futures]
+
+
+def _permutation_batch(x, y, seed, size):
+    """(taus, rhos) of x against size random permutations of y."""
+    ys = np.random.default_rng(seed).permuted(np.tile(y, (size, 1)), axis=1)
+    taus = np.array([kendall_tau_b(x, row)[0] for row in ys])
+    (rhos, _) = spearman([x] * size, list(ys))
+    return (taus, rhos)
+
+
+def p_value(null, observed):
+    """
+    (p, low, high): the two-sided permutation p-value of observed against the
+    null distribution, and a Clopper-Pearson interval for it (being estimated
+    from a finite number of permutations).
+    """
+    null = null[~np.isnan(null)]
+    if np.isnan(observed) or not len(null):
+        return (np.nan, np.nan, np.nan)
+    (k, r) = (int(np.sum(np.abs(null) >= np.abs(observed) - 1e-12)), len(null))
+    alpha = 1 - CONFIDENCE
+    low = stats.beta.ppf(alpha / 2, k, r - k + 1) if k > 0 else 0.0
+    high = stats.beta.ppf(1 - alpha / 2, k + 1, r - k) if k < r else 1.0
+    return ((k + 1.0) / (r + 1.0), float(low), float(high))
+
+
+def permutation_test(x, y, resamples=1000, seed=0, jobs=1):
+    """
+    { 'tau' : (p, low, high), 'rho' : (p, low, high) }: permutation p-values
+    (see p_value()) of tau-b and Spearman's rho of the aligned score arrays x
+    and y, from resamples random relabellings of y's nodes.
+    """
+    (x, y) = (np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+    if len(x) < 3:
+        return { 'tau' : (np.nan,) * 3, 'rho' : (np.nan,) * 3 }
+    results = _run(_permutation_batch, _batches(resamples, seed), jobs, x, y)
+    (taus, rhos) = (np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results]))
+    (rhos_obs, _) = spearman([x], [y])
+    return {
+        'tau' : p_value(taus, kendall_tau_b(x, y)[0]),
+        'rho' : p_value(rhos, rhos_obs[0])
+    }
+
+
+def resample_edges(sg, rng, size):
+    """
+    size edge bootstrap resamples of SparseGraph sg's weights, as a (size x
+    edges) array aligned with sg.matrix.data (of an undirected graph, with
+    each edge resampled once, for both of its directions). Integer weights
+    count interactions, which are redrawn with replacement; otherwise the
+    edges themselves are, each keeping its weight times the times drawn.
+    """
+    m = sg.matrix
+    rows = np.repeat(np.arange(m.shape[0]), np.diff(m.indptr))
+    data = m.data.astype(np.float64)
+    once = np.ones(len(data), dtype=bool) if sg.directed else rows <= m.indices
+    w = data[once]
+    if not len(w):
+        return np.zeros((size, len(data)))
+    if np.all(w == np.round(w)) and w.sum() > 0:
+        draws = rng.multinomial(int(w.sum()), w / w.sum(), size=size).astype(np.float64)
+    else:
+        draws = w * rng.multinomial(len(w), np.full(len(w), 1.0 / len(w)), size=size)
+    if sg.directed:
+        return draws
+    # copy each edge's resampled weight to its other direction
+    pairs = sp.csr_matrix((np.arange(1, len(data) + 1), m.indices, m.indptr), shape=m.shape)
+    mirrored = np.asarray(pairs.T.tocsr()[m.nonzero()]).ravel() - 1  # index of each entry's reverse
+    full = np.empty((size, len(data)))
+    full[:, np.flatnonzero(once)] = draws
+    full[:, ~once] = full[:, mirrored[~once]]
+    return full
+
+
+def _resampled(sg, weights):
+    m = sg.matrix
+    matrix = sp.csr_matrix((weights, m.indices.copy(), m.indptr.copy()), shape=m.shape)
+    matrix.eliminate_zeros()  # edges not drawn are gone
+    return SparseGraph(matrix, sg.labels, sg.directed)
+
+
+def _bootstrap_batch(sg1, sg2, c_type, args, top_x, seed, size):
+    """(taus, rhos) comparing the c_type centralities of size edge bootstrap resamples of sg1 and sg2."""
+    (seed1, seed2) = seed.spawn(2)
+    (w1, w2) = (resample_edges(sg1, np.random.default_rng(seed1), size), resample_edges(sg2, np.random.default_rng(seed2), size))
+    (f, which) = SCORERS[c_type]
+    pairs = []
+    for i in range(size):
+        tables = []
+        for (sg, w) in [(sg1, w1[i]), (sg2, w2[i])]:
+            bsg = _resampled(sg, w)
+            scores = f(bsg, **args)[which]
+            keep = ~np.isnan(scores)
+            tables.append(RankTable(np.asarray(bsg.labels)[keep], scores[keep]))
+        pairs.append(tuple(tables))
+    sims = similarities(pairs, top_x)
+    return (np.array(sims['tau']), np.array(sims['rho']))
+
+
+def interval(values):
+    """The CONFIDENCE percentile interval of the (non-NaN) values, or NaNs if there are none."""
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return (np.nan, np.nan)
+    alpha = 1 - CONFIDENCE
+    return tuple(float(v) for v in np.percentile(values, [100 * alpha / 2, 100 * (1 - alpha / 2)]))
+
+
+def bootstrap_test(sg1, sg2, c_type, args, top_x, resamples=200, seed=0, jobs=1):
+    """
+    { 'tau' : (low, high), 'rho' : (low, high) }: percentile confidence
+    intervals of tau-b and Spearman's rho between the top_x c_type
+    centralities (from SCORERS, with args) of SparseGraphs sg1 and sg2, from
+    resamples edge bootstrap resamples of each (see resample_edges()).
+    """
+    results = _run(_bootstrap_batch, _batches(resamples, seed), jobs, sg1, sg2, c_type, args, top_x)
+    (taus, rhos) = (np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results]))
+    return { 'tau' : interval(taus), 'rho' : interval(rhos) }
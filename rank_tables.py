@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+
+import numpy as np
+import scipy.stats as stats
+
+
+#
+# Centralities held as a score array aligned with a sorted array of node
+# labels, so that picking the top x nodes, ranking them (ties and all) and
+# lining two graphs' nodes up are numpy operations over integer indexes
+# rather than loops over dicts of node -> score.
+#
+
+
+RANK_METHODS = ['average', 'min', 'max', 'dense', 'ordinal']
+
+
+def top_k(scores, k):
+    """
+    Indexes of the k highest of scores, highest first, ties broken by index,
+    found with a partition rather than a full sort.
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.arange(0)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        # bring in everything tied with the k-th so ties are broken by index, not by the partition
+        kth = scores[candidates].min()
+        candidates = np.r_[np.flatnonzero(scores > kth), np.flatnonzero(scores == kth)]
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:k]
+
+
+def rank(scores, method='average'):
+    """
+    The rank of each of scores, 1 being the highest, with ties ranked by
+    method (as scipy.stats.rankdata has it: 'average', 'min', 'max', 'dense'
+    or 'ordinal').
+    """
+    if len(scores) == 0:
+        return np.zeros(0)
+    return stats.rankdata(-np.asarray(scores, dtype=np.float64), method=method)
+
+
+class RankTable:
+    """
+    The scores of a graph's nodes, as arrays of labels (sorted, so they
+    double as an integer node index) and the scores aligned with them.
+    """
+    def __init__(self, labels, scores, presorted=False):
+        labels = np.asarray(labels)
+        scores = np.asarray(scores, dtype=np.float64)
+        if not presorted and len(labels):
+            order = np.argsort(labels, kind='stable')
+            (labels, scores) = (labels[order], scores[order])
+        self.labels = labels
+        self.scores = scores
+
+    @classmethod
+    def from_dict(cls, cs):
+        """A RankTable of a dict of node -> score."""
+        return cls(list(cs.keys()), list(cs.values()))
+
+    def __len__(self):
+        return len(self.labels)
+
+    def subset(self, index):
+        """A RankTable of the nodes at index (in label order)."""
+        return RankTable(self.labels[index], self.scores[index], presorted=True)
+
+    def top(self, k):
+        """Indexes of the k highest scoring nodes, highest first, ties broken by label."""
+        return top_k(self.scores, k)
+
+    def top_items(self, k):
+        """(label, score) of the k highest scoring nodes, highest first."""
+        index = self.top(k)
+        return list(zip(self.labels[index].tolist(), self.scores[index].tolist()))
+
+    def ranks(self, method='average'):
+        """The rank of each node, 1 being the highest, with ties ranked by method."""
+        return rank(self.scores, method)
+
+    def common(self, other):
+        """(index in self, index in other) of the nodes both have, in label order."""
+        (_, i1, i2) = np.intersect1d(self.labels, other.labels, assume_unique=True, return_indices=True)
+        return (i1, i2)
+
+    def align(self, other):
+        """(self, other) cut down to the nodes both have, which then share an index."""
+        (i1, i2) = self.common(other)
+        return (self.subset(i1), other.subset(i2))
+
+
+def top_x_indexes(t1, t2, top_x):
+    """
+    (c1, c2, top1, top2) where c1 and c2 are RankTables t1 and t2 cut down to
+    the nodes they have in common (so they share an index), and top1 and top2
+    are the indexes of their top_x nodes, highest first.
+    """
+    (c1, c2) = t1.align(t2)
+    return (c1, c2, c1.top(top_x), c2.top(top_x))
+
+
+def in_both(top1, top2):
+    """(top1, top2) cut down to the indexes they have in common, each in its own order."""
+    both = np.intersect1d(top1, top2, assume_unique=True)
+    return (top1[np.isin(top1, both, assume_unique=True)], top2[np.isin(top2, both, assume_unique=True)])
+
+
+def top_x_in_common(t1, t2, top_x):
+    """
+    The labels of the top_x nodes of RankTables t1 and t2 among the nodes they
+    have in common, cut down to those in both top_xs, each in its own order.
+    """
+    (c1, c2, top1, top2) = top_x_indexes(t1, t2, top_x)
+    (top1, top2) = in_both(top1, top2)
+    return (c1.labels[top1].tolist(), c2.labels[top2].tolist())
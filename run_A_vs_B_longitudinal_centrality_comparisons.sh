@@ -16,25 +16,12 @@ COMPARE=$SCRIPT_HOME/compare_centralities_longitudinally_from_tweets.py
 
 echo Script: $COMPARE
 
-echo Running straight longitudinal
+echo Running straight and cumulative longitudinal
 OPTS="-w 60 -x 1000 -v"
+JOBS="RETWEET:DEGREE,MENTION:DEGREE,MENTION:BETWEENNESS,MENTION:CLOSENESS,REPLY:DEGREE,REPLY:BETWEENNESS,REPLY:CLOSENESS"
+JOBS="${JOBS},RETWEET:DEGREE:cum,MENTION:DEGREE:cum,MENTION:BETWEENNESS:cum,MENTION:CLOSENESS:cum,REPLY:DEGREE:cum,REPLY:BETWEENNESS:cum,REPLY:CLOSENESS:cum"
 
-time $COMPARE -f1 "${A}.json" -f2 "${B}.json" -t RETWEET -c DEGREE      $OPTS > "${OUT_DIR}/${A}_${B}_long-comp_tRT_cDEG_w60_x1000.csv"
-time $COMPARE -f1 "${A}.json" -f2 "${B}.json" -t MENTION -c DEGREE      $OPTS > "${OUT_DIR}/${A}_${B}_long-comp_tMEN_cDEG_w60_x1000.csv"
-time $COMPARE -f1 "${A}.json" -f2 "${B}.json" -t MENTION -c BETWEENNESS $OPTS > "${OUT_DIR}/${A}_${B}_long-comp_tMEN_cBET_w60_x1000.csv"
-time $COMPARE -f1 "${A}.json" -f2 "${B}.json" -t MENTION -c CLOSENESS   $OPTS > "${OUT_DIR}/${A}_${B}_long-comp_tMEN_cCLO_w60_x1000.csv"
-time $COMPARE -f1 "${A}.json" -f2 "${B}.json" -t REPLY   -c DEGREE      $OPTS > "${OUT_DIR}/${A}_${B}_long-comp_tREP_cDEG_w60_x1000.csv"
-time $COMPARE -f1 "${A}.json" -f2 "${B}.json" -t REPLY   -c BETWEENNESS $OPTS > "${OUT_DIR}/${A}_${B}_long-comp_tREP_cBET_w60_x1000.csv"
-time $COMPARE -f1 "${A}.json" -f2 "${B}.json" -t REPLY   -c CLOSENESS   $OPTS > "${OUT_DIR}/${A}_${B}_long-comp_tREP_cCLO_w60_x1000.csv"
-
-echo Running cumulative longitudinal
-OPTS="-w 60 -x 1000 --cumulative -v"
-time $COMPARE -f1 "${A}.json" -f2 "${B}.json" -t RETWEET -c DEGREE      $OPTS > "${OUT_DIR}/${A}_${B}_long-comp_tRT_cDEG_w60_x1000_cum.csv"
-time $COMPARE -f1 "${A}.json" -f2 "${B}.json" -t MENTION -c DEGREE      $OPTS > "${OUT_DIR}/${A}_${B}_long-comp_tMEN_cDEG_w60_x1000_cum.csv"
-time $COMPARE -f1 "${A}.json" -f2 "${B}.json" -t MENTION -c BETWEENNESS $OPTS > "${OUT_DIR}/${A}_${B}_long-comp_tMEN_cBET_w60_x1000_cum.csv"
-time $COMPARE -f1 "${A}.json" -f2 "${B}.json" -t MENTION -c CLOSENESS   $OPTS > "${OUT_DIR}/${A}_${B}_long-comp_tMEN_cCLO_w60_x1000_cum.csv"
-time $COMPARE -f1 "${A}.json" -f2 "${B}.json" -t REPLY   -c DEGREE      $OPTS > "${OUT_DIR}/${A}_${B}_long-comp_tREP_cDEG_w60_x1000_cum.csv"
-time $COMPARE -f1 "${A}.json" -f2 "${B}.json" -t REPLY   -c BETWEENNESS $OPTS > "${OUT_DIR}/${A}_${B}_long-comp_tREP_cBET_w60_x1000_cum.csv"
-time $COMPARE -f1 "${A}.json" -f2 "${B}.json" -t REPLY   -c CLOSENESS   $OPTS > "${OUT_DIR}/${A}_${B}_long-comp_tREP_cCLO_w60_x1000_cum.csv"
+# one pass over the corpora writes ${OUT_DIR}/${A}_${B}_long-comp_t<type>_c<centrality>_w60_x1000[_cum].csv for each job
+time $COMPARE -f1 "${A}.json" -f2 "${B}.json" --batch "$JOBS" -o "${OUT_DIR}" $OPTS
 
 echo Done
@@ -0,0 +1,822 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import blake2b
+from multiprocessing import shared_memory
+
+
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.csgraph as csgraph
+
+
+from sparse_graphs import SparseGraph
+
+
+#
+# Centralities computed over a SparseGraph's CSR adjacency matrix with
+# compiled shortest paths and numpy, instead of networkx's pure Python ones.
+# Scores come back as arrays aligned with the graph's labels; the *_centrality
+# functions take and return what the networkx versions do (a graph in, a dict
+# of node -> score out), so they can stand in for them in CENTRALITY_FUNCTIONS.
+# As in the comparison scripts, edge weights are taken as distances.
+#
+
+
+DISTANCE_ROWS_BUDGET = 2 ** 23  # entries of the (sources x nodes) distance matrix held at once
+CHUNKS_PER_JOB = 4  # source chunks handed to each worker, to even out their loads
+
+
+class SharedCSR:
+    """
+    A CSR matrix's arrays copied into shared memory, so worker processes can
+    all read the one copy of a graph instead of each being sent their own.
+    Use as a context manager; spec() is what workers pass to attach_csr().
+    """
+    def __init__(self, m):
+        self.shape = m.shape
+        self.blocks = []
+        for a in (m.indptr, m.indices, m.data):
+            shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+            np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf)[:] = a
+            self.blocks.append((shm, a.dtype.str, a.shape))
+
+    def spec(self):
+        return (self.shape, [(shm.name, dtype, shape) for (shm, dtype, shape) in self.blocks])
+
+    def close(self):
+        for (shm, _, _) in self.blocks:
+            shm.close()
+            shm.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_worker_matrix = None  # the graph a worker process attached to
+_worker_blocks = []
+
+
+def attach_csr(spec):
+    """Worker process initialiser: (read-only) views of a SharedCSR's matrix."""
+    global _worker_matrix
+    (shape, blocks) = spec
+    arrays = []
+    for (name, dtype, a_shape) in blocks:
+        shm = shared_memory.SharedMemory(name=name)
+        _worker_blocks.append(shm)  # kept open for as long as the worker lives
+        a = np.ndarray(a_shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        a.flags.writeable = False
+        arrays.append(a)
+    (indptr, indices, data) = arrays
+    _worker_matrix = sp.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+
+
+def _worker_dependencies(sources, weighted):
+    return shortest_path_dependencies(_worker_matrix, sources, weighted)
+
+
+def distance_matrix(sg, weighted=True):
+    """sg's CSR matrix with float64 weights, as scipy's shortest paths want them."""
+    m = sg.matrix
+    if weighted and m.dtype != np.float64:
+        m = m.astype(np.float64)
+    return m
+
+
+def _chunks(sources, jobs):
+    size = max(1, -(-len(sources) // (jobs * CHUNKS_PER_JOB)))
+    return [sources[i:i + size] for i in range(0, len(sources), size)]
+
+
+def dependencies(m, sources, weighted=True, pool=None, jobs=1):
+    """
+    shortest_path_dependencies() of the sources, split into chunks summed
+    over the pool's workers (attached to m with attach_csr) if there's a pool.
+    """
+    if pool is None or len(sources) < 2:
+        return shortest_path_dependencies(m, sources, weighted)
+    sums = np.zeros(m.shape[0])
+    squares = np.zeros(m.shape[0])
+    chunks = _chunks(sources, jobs)
+    for (s, sq) in pool.map(_worker_dependencies, chunks, [weighted] * len(chunks)):
+        sums += s
+        squares += sq
+    return (sums, squares)
+
+
+def process_pool(m, jobs):
+    """(SharedCSR, ProcessPoolExecutor) of jobs workers sharing m, or (None, None) for one job."""
+    if jobs <= 1:
+        return (None, None)
+    shared = SharedCSR(m)
+    try:
+        return (shared, ProcessPoolExecutor(max_workers=jobs, initializer=attach_csr, initargs=(shared.spec(),)))
+    except Exception:
+        shared.close()
+        raise
+
+
+def _dag_groups(d, a, b, w):
+    """
+    The shortest path DAG edges (a -> b) among all the (a, b, w) edges out of
+    nodes reached at distances d, sorted by a's distance, plus the bounds of
+    the runs of edges whose sources are equally far away.
+    """
+    (da, db) = (d[a], d[b])
+    on = np.abs(da + w - db) <= 1e-9 * np.maximum(1.0, db)
+    (a, b, da) = (a[on], b[on], da[on])
+    order = np.argsort(da, kind='stable')
+    (a, b, da) = (a[order], b[order], da[order])
+    bounds = np.flatnonzero(np.r_[True, da[1:] != da[:-1], True]) if len(da) else np.array([0])
+    return (a, b, bounds)
+
+
+def shortest_path_dependencies(m, sources, weighted=True):
+    """
+    (sums, squares) over the given sources of Brandes' dependency of each
+    source on every node of the CSR matrix m - how much of the traffic
+    from that source to all other nodes would pass through it - and of the
+    dependencies squared. Distances are found for batches of sources at a
+    time with scipy's Dijkstra (or BFS if not weighted), then the paths are
+    counted and the dependencies accumulated one distance level at a time.
+    """
+    n = m.shape[0]
+    indptr = m.indptr
+    sums = np.zeros(n)
+    squares = np.zeros(n)
+    local = np.full(n, -1, dtype=np.int64)  # node code -> position among the reached nodes
+    batch_size = max(1, DISTANCE_ROWS_BUDGET // max(n, 1))
+    sources = np.asarray(sources, dtype=np.int64)
+    for lo in range(0, len(sources), batch_size):
+        batch = sources[lo:lo + batch_size]
+        dists = csgraph.dijkstra(m, directed=True, indices=batch, unweighted=not weighted)
+        for s, d in zip(batch.tolist(), dists):
+            reached = np.flatnonzero(np.isfinite(d))
+            r = len(reached)
+            if r < 3:
+                continue
+            local[reached] = np.arange(r)
+
+            # every edge out of a reached node, in local codes
+            starts = indptr[reached]
+            counts = indptr[reached + 1] - starts
+            offsets = np.cumsum(counts) - counts
+            e = np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+            a = np.repeat(np.arange(r), counts)
+            b = local[m.indices[e]]
+            w = m.data[e].astype(np.float64) if weighted else np.ones(len(e))
+            (a, b, bounds) = _dag_groups(d[reached], a, b, w)
+
+            sigma = np.zeros(r)
+            sigma[local[s]] = 1.0
+            for i in range(len(bounds) - 1):
+                (ga, gb) = (a[bounds[i]:bounds[i + 1]], b[bounds[i]:bounds[i + 1]])
+                np.add.at(sigma, gb, sigma[ga])
+            delta = np.zeros(r)
+            for i in range(len(bounds) - 2, -1, -1):
+                (ga, gb) = (a[bounds[i]:bounds[i + 1]], b[bounds[i]:bounds[i + 1]])
+                np.add.at(delta, ga, sigma[ga] / sigma[gb] * (1.0 + delta[gb]))
+            delta[local[s]] = 0.0
+
+            sums[reached] += delta
+            squares[reached] += delta * delta
+            local[reached] = -1
+    return (sums, squares)
+
+
+def betweenness_scale(n, directed):
+    """What networkx multiplies summed dependencies by to normalise betweenness."""
+    return 1.0 / ((n - 1) * (n - 2)) if n > 2 else 1.0 if directed else 0.5
+
+
+def _top(scores, x):
+    """Codes of the (at most) x highest scoring nodes with non-zero scores."""
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) <= x:
+        return candidates
+    return candidates[np.argpartition(-scores[candidates], x - 1)[:x]]
+
+
+def betweenness(sg, weighted=True, jobs=1):
+    """
+    The normalised betweenness of each node of a SparseGraph, as
+    nx.betweenness_centrality() has it, from every node's dependencies,
+    with the sources split over jobs worker processes sharing the graph.
+    """
+    n = len(sg)
+    if n < 3:
+        return np.zeros(n)
+    m = distance_matrix(sg, weighted)
+    (shared, pool) = process_pool(m, jobs)
+    try:
+        (sums, _) = dependencies(m, np.arange(n), weighted, pool, jobs)
+    finally:
+        if pool:
+            pool.shutdown()
+            shared.close()
+    return sums * betweenness_scale(n, sg.directed)
+
+
+def estimate_betweenness(sg, samples=1000, top_x=100, tolerance=0.01, patience=2,
+                         batch_size=64, seed=0, weighted=True, jobs=1):
+    """
+    Estimates the normalised betweenness of the nodes of a SparseGraph from
+    the dependencies on a random sample of source nodes (Brandes & Pich).
+    Sources are drawn (reproducibly, for a given seed) batch_size at a time,
+    up to samples of them, stopping early once the top_x nodes have agreed to
+    within tolerance (as a proportion of the set) for patience batches in a
+    row. Returns (scores, info), where info has the number of sources used,
+    whether that was all of them, the last top_x agreement and the largest
+    95% confidence half-width of the top_x scores ('error'). Each batch is
+    split over jobs worker processes sharing the graph.
+    """
+    n = len(sg)
+    scores = np.zeros(n)
+    info = { 'samples' : 0, 'exact' : True, 'agreement' : 1.0, 'error' : 0.0 }
+    if n < 3:
+        return (scores, info)
+
+    order = np.random.default_rng(seed).permutation(n)[:min(samples, n)]
+    scale = betweenness_scale(n, sg.directed)
+    m = distance_matrix(sg, weighted)
+    sums = np.zeros(n)
+    squares = np.zeros(n)
+    (top, stable, k) = (None, 0, 0)
+    (shared, pool) = process_pool(m, jobs)
+    try:
+        while k < len(order):
+            batch = order[k:k + max(batch_size, jobs)]
+            (s, sq) = dependencies(m, batch, weighted, pool, jobs)
+            sums += s
+            squares += sq
+            k += len(batch)
+
+            scores = sums * (scale * n / k)
+            new_top = _top(scores, top_x)
+            if top is not None:
+                agreement = len(np.intersect1d(top, new_top)) / float(max(len(top), len(new_top), 1))
+                info['agreement'] = agreement
+                stable = stable + 1 if agreement >= 1.0 - tolerance else 0
+            top = new_top
+            if stable >= patience:
+                break
+    finally:
+        if pool:
+            pool.shutdown()
+            shared.close()
+
+    info['samples'] = k
+    info['exact'] = k == n
+    if k < n and k > 1 and len(top):
+        means = sums[top] / k
+        variances = np.maximum(squares[top] / k - means * means, 0) * k / (k - 1)
+        fpc = (n - k) / float(n - 1)  # sampling without replacement
+        info['error'] = float(1.96 * scale * n * np.sqrt(variances.max() / k * fpc))
+    return (scores, info)
+
+
+def betweenness_centrality(g, samples=None, top_x=100, tolerance=0.01, seed=0, jobs=1):
+    """
+    What nx.betweenness_centrality(g, weight='weight') gives if samples is
+    None, or else estimate_betweenness() of g from at most that many sources,
+    using jobs processes, as (dict of node -> betweenness, info or None).
+    """
+    sg = SparseGraph.from_networkx(g)
+    if not samples:
+        return (dict(zip(sg.labels, betweenness(sg, jobs=jobs).tolist())), None)
+    (scores, info) = estimate_betweenness(sg, samples, top_x=top_x, tolerance=tolerance, seed=seed, jobs=jobs)
+    return (dict(zip(sg.labels, scores.tolist())), info)
+
+
+def shortest_path_totals(m, sources, weighted=True, per_source=True):
+    """
+    (counts, sums) of the other nodes reached and the lengths of the shortest
+    paths to them, from each of the sources in the CSR matrix m (aligned
+    with sources), or if not per_source, of the sources reaching each node
+    and the lengths of their paths to it (aligned with m's nodes). Distances
+    come from scipy's Dijkstra (or BFS if not weighted), a batch of sources
+    at a time.
+    """
+    n = m.shape[0]
+    sources = np.asarray(sources, dtype=np.int64)
+    size = len(sources) if per_source else n
+    counts = np.zeros(size, dtype=np.int64)
+    sums = np.zeros(size)
+    batch_size = max(1, DISTANCE_ROWS_BUDGET // max(n, 1))
+    for lo in range(0, len(sources), batch_size):
+        batch = sources[lo:lo + batch_size]
+        d = csgraph.dijkstra(m, directed=True, indices=batch, unweighted=not weighted)
+        reached = np.isfinite(d)
+        reached[np.arange(len(batch)), batch] = False
+        d[~reached] = 0.0
+        if per_source:
+            counts[lo:lo + len(batch)] = reached.sum(axis=1)
+            sums[lo:lo + len(batch)] = d.sum(axis=1)
+        else:
+            counts += reached.sum(axis=0)
+            sums += d.sum(axis=0)
+    return (counts, sums)
+
+
+def largest_component(sg):
+    """Codes of the nodes in sg's largest (weakly, if directed) connected component."""
+    (_, components) = csgraph.connected_components(sg.matrix, directed=sg.directed, connection='weak')
+    if not len(components):
+        return np.arange(0)
+    return np.flatnonzero(components == np.bincount(components).argmax())
+
+
+def closeness(sg, weighted=True, largest_only=False, samples=None, seed=0):
+    """
+    The closeness of each node of a SparseGraph, as nx.closeness_centrality()
+    has it: by the distances to it from the nodes that can reach it (in
+    either direction, if undirected), scaled by the share of all the nodes
+    they are. If largest_only, only the nodes of the largest component are
+    scored (as if it were the whole graph) and the rest are NaN. If samples
+    is given, the distances are estimated from at most that many randomly
+    chosen (per seed) source nodes (Eppstein & Wang) instead of all of them.
+    """
+    scores = np.full(len(sg), np.nan)
+    nodes = largest_component(sg) if largest_only else np.arange(len(sg))
+    n = len(nodes)
+    m = distance_matrix(sg, weighted)
+    if largest_only and n < len(sg):
+        m = m[nodes][:, nodes]
+    if n < 2:
+        scores[nodes] = 0.0
+        return scores
+
+    if samples and samples < n:
+        pivots = np.random.default_rng(seed).permutation(n)[:samples]
+        (counts, sums) = shortest_path_totals(m, pivots, weighted, per_source=False)
+        # reached by (n - 1) * counts / samples, over paths (n - 1) * sums / samples long in all
+        (reaching, totals) = ((n - 1) * counts / float(samples), (n - 1) * sums / float(samples))
+    else:
+        if sg.directed:  # from every node to each node
+            m = m.T.tocsr()
+        (reaching, totals) = shortest_path_totals(m, np.arange(n), weighted)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        c = np.where(totals > 0, (reaching / totals) * (reaching / (n - 1.0)), 0.0)
+    scores[nodes] = c
+    return scores
+
+
+def closeness_centrality(g, largest_only=False, samples=None, seed=0):
+    """
+    What nx.closeness_centrality(g, distance='weight') gives, as a dict of
+    node -> closeness, but see closeness() for largest_only and samples.
+    Nodes outside the largest component are left out if largest_only.
+    """
+    sg = SparseGraph.from_networkx(g)
+    scores = closeness(sg, largest_only=largest_only, samples=samples, seed=seed)
+    return dict((l, s) for l, s in zip(sg.labels, scores.tolist()) if s == s)
+
+
+def eigenvector(sg, tol=1e-6, max_iter=1000, start=None):
+    """
+    The eigenvector centrality of each node of a SparseGraph, by the power
+    iteration nx.eigenvector_centrality() does (x <- x + A'x, which also
+    settles on graphs that are disconnected or periodic), as sparse matrix
+    products. It starts from start (e.g. the centralities of an overlapping
+    graph), if given, or else from the same value for every node, and stops
+    once the iterates differ by less than tol per node. Returns (scores,
+    info), with the iterations taken, whether they converged and the last
+    change ('error'); scores hold the last iterate, converged or not.
+    """
+    n = len(sg)
+    info = { 'iterations' : 0, 'converged' : True, 'error' : 0.0 }
+    if n == 0:
+        return (np.zeros(0), info)
+    at = sg.matrix.T.tocsr().astype(np.float64)
+    x = np.ones(n) if start is None else np.asarray(start, dtype=np.float64)
+    if not (x > 0).any():
+        x = np.ones(n)
+    x = x / x.sum()
+    for i in range(max_iter):
+        last = x
+        x = last + at.dot(last)
+        norm = np.sqrt(x.dot(x))
+        x = x / (norm or 1.0)
+        info['iterations'] = i + 1
+        info['error'] = float(np.abs(x - last).sum())
+        if info['error'] < n * tol:
+            return (x, info)
+    info['converged'] = False
+    return (x, info)
+
+
+def eigenvector_centrality(g, tol=1e-6, max_iter=1000, start=None):
+    """
+    What nx.eigenvector_centrality(g, weight='weight') gives, as (dict of
+    node -> centrality, info), but see eigenvector(). start may be a dict of
+    node -> centrality (e.g. from the previous window); nodes missing from it
+    start at the average of the rest.
+    """
+    sg = SparseGraph.from_networkx(g)
+    (scores, info) = eigenvector(sg, tol, max_iter, start_vector(sg.labels, start))
+    return (dict(zip(sg.labels, scores.tolist())), info)
+
+
+def start_vector(labels, start):
+    """
+    An array of the start (dict of node -> value) values of the nodes in
+    labels, with those missing from it at the average of the rest, or None
+    if there's no start.
+    """
+    if not start:
+        return None
+    known = [start.get(l) for l in labels]
+    values = [v for v in known if v is not None]
+    if not values:
+        return None
+    fill = sum(values) / len(values)
+    return np.array([fill if v is None else v for v in known], dtype=np.float64)
+
+
+def _initial(n, start):
+    """start, or the same value for every node if there's no (positive) start, summing to 1."""
+    x = np.ones(n) if start is None or not (np.asarray(start) > 0).any() else np.array(start, dtype=np.float64)
+    return x / x.sum()
+
+
+def pagerank(sg, damping=0.85, tol=1e-6, max_iter=1000, start=None):
+    """
+    The PageRank of each node of a SparseGraph, as nx.pagerank() has it:
+    power iteration over the weighted random walk, jumping to a random node
+    with probability 1 - damping and from nodes without out-edges. Returns
+    (scores, info), as eigenvector() does.
+    """
+    n = len(sg)
+    info = { 'iterations' : 0, 'converged' : True, 'error' : 0.0 }
+    if n == 0:
+        return (np.zeros(0), info)
+    m = sg.matrix.astype(np.float64)
+    out = np.asarray(m.sum(axis=1)).ravel()
+    inverse = np.where(out != 0, 1.0 / np.where(out != 0, out, 1.0), 0.0)
+    pt = sp.csr_matrix(sp.diags(inverse).dot(m).T)  # column stochastic, but for dangling nodes
+    dangling = out == 0
+    x = _initial(n, start)
+    for i in range(max_iter):
+        last = x
+        x = damping * (pt.dot(last) + last[dangling].sum() / n) + (1.0 - damping) / n
+        info['iterations'] = i + 1
+        info['error'] = float(np.abs(x - last).sum())
+        if info['error'] < n * tol:
+            return (x, info)
+    info['converged'] = False
+    return (x, info)
+
+
+def hits(sg, tol=1e-8, max_iter=1000, start=None):
+    """
+    The HITS hub and authority scores of each node of a SparseGraph, as
+    nx.hits() has them (each summing to 1), by power iteration from start
+    hub scores, if given. Returns (hubs, authorities, info).
+    """
+    n = len(sg)
+    info = { 'iterations' : 0, 'converged' : True, 'error' : 0.0 }
+    if n == 0:
+        return (np.zeros(0), np.zeros(0), info)
+    m = sg.matrix.astype(np.float64).tocsr()
+    mt = m.T.tocsr()
+    h = _initial(n, start)
+    a = mt.dot(h)
+    for i in range(max_iter):
+        last = h
+        a = mt.dot(last)
+        h = m.dot(a)
+        h = h / (h.max() or 1.0)
+        a = a / (a.max() or 1.0)
+        info['iterations'] = i + 1
+        info['error'] = float(np.abs(h - last).sum())
+        if info['error'] < tol:
+            break
+    else:
+        info['converged'] = False
+    return (h / (h.sum() or 1.0), a / (a.sum() or 1.0), info)
+
+
+def spectral_radius(sg, tol=1e-6, max_iter=1000):
+    """
+    An estimate of the largest eigenvalue of sg's weighted adjacency matrix,
+    from the eigenvector() it leads to.
+    """
+    (x, _) = eigenvector(sg, tol, max_iter)
+    if not len(x) or x.sum() == 0:
+        return 0.0
+    return float(sg.matrix.T.dot(x).sum() / x.sum())
+
+
+def katz(sg, alpha=None, beta=1.0, tol=1e-6, max_iter=1000, start=None):
+    """
+    The Katz centrality of each node of a SparseGraph, as
+    nx.katz_centrality(weight='weight') has it: x <- alpha A'x + beta,
+    iterated from zeros (or the multiple of start, e.g. scaled centralities
+    from an overlapping graph, that best fits that) until it changes by less
+    than tol per node, then scaled to unit length. It only converges if
+    alpha is less than 1 / the largest eigenvalue of the (weighted)
+    adjacency matrix, so by default alpha is 0.9 / that eigenvalue (or 0.9,
+    if it's less than 1), and the iteration is abandoned as soon as it
+    overflows. Returns (scores, info), with the alpha used in info.
+    """
+    n = len(sg)
+    info = { 'iterations' : 0, 'converged' : False, 'error' : 0.0, 'alpha' : alpha }
+    if n == 0:
+        info['converged'] = True
+        return (np.zeros(0), info)
+    if alpha is None:
+        alpha = info['alpha'] = 0.9 / max(spectral_radius(sg, tol, max_iter), 1.0)
+    at = sg.matrix.T.tocsr().astype(np.float64)
+    x = np.zeros(n)
+    if start is not None:
+        x = np.array(start, dtype=np.float64)
+        r = x - alpha * at.dot(x)
+        x = x * (beta * r.sum() / r.dot(r)) if r.dot(r) > 0 else np.zeros(n)
+    with np.errstate(over='ignore', invalid='ignore'):
+        for i in range(max_iter):
+            last = x
+            x = alpha * at.dot(last) + beta
+            info['iterations'] = i + 1
+            info['error'] = float(np.abs(x - last).sum())
+            if not np.isfinite(info['error']):
+                break
+            if info['error'] < n * tol:
+                info['converged'] = True
+                break
+        norm = np.sqrt(x.dot(x))
+    return (x / norm if np.isfinite(norm) and norm > 0 else x, info)
+
+
+def pagerank_centrality(g, damping=0.85, tol=1e-6, max_iter=1000, start=None):
+    """What nx.pagerank(g, damping, weight='weight') gives, as (dict of node -> PageRank, info)."""
+    sg = SparseGraph.from_networkx(g)
+    (scores, info) = pagerank(sg, damping, tol, max_iter, start_vector(sg.labels, start))
+    return (dict(zip(sg.labels, scores.tolist())), info)
+
+
+def hits_centralities(g, tol=1e-8, max_iter=1000, start=None):
+    """What nx.hits(g) gives, as (dict of node -> hub score, dict of node -> authority score, info)."""
+    sg = SparseGraph.from_networkx(g)
+    (hubs, authorities, info) = hits(sg, tol, max_iter, start_vector(sg.labels, start))
+    return (dict(zip(sg.labels, hubs.tolist())), dict(zip(sg.labels, authorities.tolist())), info)
+
+
+def katz_centrality(g, alpha=None, beta=1.0, tol=1e-6, max_iter=1000, start=None):
+    """What nx.katz_centrality(g, alpha, beta, weight='weight') gives, as (dict of node -> centrality, info)."""
+    sg = SparseGraph.from_networkx(g)
+    (scores, info) = katz(sg, alpha, beta, tol, max_iter, start_vector(sg.labels, start))
+    return (dict(zip(sg.labels, scores.tolist())), info)
+
+
+def _splitmix64(x):
+    """The splitmix64 finaliser: well mixed 64 bit hashes of the uint64s in x."""
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def label_hashes(labels):
+    """Stable 64 bit hashes of the node labels (as strings), the same whatever order they come in."""
+    return np.array(
+        [int.from_bytes(blake2b(str(l).encode('utf-8'), digest_size=8).digest(), 'little') for l in labels],
+        dtype=np.uint64
+    )
+
+
+def hll_counters(hashes, registers=64, seed=0):
+    """
+    A (len(hashes) x registers) uint8 array of HyperLogLog counters, each
+    holding just its own node (its label_hashes() hash, mixed with seed), so
+    a node's counter doesn't depend on its code. registers must be a power of
+    two >= 16.
+    """
+    b = int(registers).bit_length() - 1
+    if registers < 16 or registers != 1 << b:
+        raise ValueError('HyperLogLog counters need a power of two (>= 16) registers, not %s' % registers)
+    n = len(hashes)
+    with np.errstate(over='ignore'):
+        h = _splitmix64(np.asarray(hashes, dtype=np.uint64) ^ _splitmix64(np.array([seed], dtype=np.uint64)))
+    buckets = (h & np.uint64(registers - 1)).astype(np.int64)
+    w = ((h >> np.uint64(b)) & np.uint64(0xFFFFFFFF)).astype(np.float64)  # exact in a double
+    bits = np.frexp(w)[1]  # bit length, 0 for 0
+    counters = np.zeros((n, registers), dtype=np.uint8)
+    counters[np.arange(n), buckets] = 33 - bits  # position of the first 1 bit, of 32
+    return counters
+
+
+def hll_estimate(counters):
+    """The HyperLogLog estimate of the size of each (row) counter's set."""
+    (n, m) = counters.shape
+    alpha = { 16 : 0.673, 32 : 0.697, 64 : 0.709 }.get(m, 0.7213 / (1 + 1.079 / m))
+    sizes = np.zeros(n)
+    step = max(1, DISTANCE_ROWS_BUDGET // m)
+    for lo in range(0, n, step):
+        c = counters[lo:lo + step]
+        raw = alpha * m * m / np.ldexp(1.0, -c.astype(np.int64)).sum(axis=1)
+        zeros = (c == 0).sum(axis=1)
+        with np.errstate(divide='ignore'):
+            small = m * np.log(m / np.maximum(zeros, 1).astype(np.float64))
+        sizes[lo:lo + step] = np.where((raw <= 2.5 * m) & (zeros > 0), small, raw)
+    return sizes
+
+
+def hyperball(sg, registers=64, seed=0, max_iter=None, hashes=None):
+    """
+    The (approximate) harmonic centrality of each node of a SparseGraph, as
+    nx.harmonic_centrality() has it (the sum of 1 / the number of hops from
+    each other node that can reach it), by HyperBall (Boldi & Vigna): each
+    node's HyperLogLog counter of the nodes within t hops of it is the union
+    of its in-neighbours' counters for t - 1 hops, so each hop is a max over
+    the CSR matrix's edges, and the number of nodes first reached at each
+    distance comes from the growth in the counters' estimates. It takes as
+    many iterations as the longest shortest path, each linear in the number
+    of edges times registers (a power of two; the estimates' relative error
+    is about 1.04 / sqrt(registers)). Returns (scores, info), with the
+    iterations taken and whether the counters stopped changing ('converged')
+    before max_iter (default: no limit). hashes are label_hashes(sg.labels),
+    if already worked out (as for workers, whose graphs have no labels).
+    """
+    n = len(sg)
+    info = { 'iterations' : 0, 'converged' : True, 'registers' : registers }
+    counters = hll_counters(label_hashes(sg.labels) if hashes is None else hashes, registers, seed)
+    scores = np.zeros(n)
+    if n == 0:
+        return (scores, info)
+    at = sg.matrix.T.tocsr()  # each node's row holds its in-neighbours
+    at.sort_indices()
+    (indptr, indices) = (at.indptr, at.indices)
+    degrees = np.diff(indptr)
+
+    # blocks of rows whose in-neighbours' counters fit the budget
+    edge_budget = max(1, DISTANCE_ROWS_BUDGET // registers)
+    bounds = [0]
+    while bounds[-1] < n:
+        lo = bounds[-1]
+        hi = int(np.searchsorted(indptr, indptr[lo] + edge_budget, side='right')) - 1
+        bounds.append(min(n, max(hi, lo + 1)))
+
+    sizes = hll_estimate(counters)
+    t = 0
+    while max_iter is None or t < max_iter:
+        t += 1
+        merged = counters.copy()
+        for (lo, hi) in zip(bounds[:-1], bounds[1:]):
+            rows = lo + np.flatnonzero(degrees[lo:hi])
+            if not len(rows):
+                continue
+            block = counters[indices[indptr[lo]:indptr[hi]]]
+            reached = np.maximum.reduceat(block, indptr[rows] - indptr[lo], axis=0)
+            merged[rows] = np.maximum(merged[rows], reached)
+        changed = np.flatnonzero((merged != counters).any(axis=1))
+        info['iterations'] = t
+        if not len(changed):
+            return (scores, info)
+        new_sizes = sizes.copy()
+        new_sizes[changed] = hll_estimate(merged[changed])
+        scores += np.maximum(new_sizes - sizes, 0) / t
+        (counters, sizes) = (merged, new_sizes)
+    info['converged'] = False
+    return (scores, info)
+
+
+def harmonic_centrality(g, registers=64, seed=0, max_iter=None):
+    """hyperball()'s estimate of nx.harmonic_centrality(g), as (dict of node -> centrality, info)."""
+    sg = SparseGraph.from_networkx(g)
+    (scores, info) = hyperball(sg, registers, seed, max_iter)
+    return (dict(zip(sg.labels, scores.tolist())), info)
+
+
+def degree(sg):
+    """
+    The degree centrality of each node of a SparseGraph, as
+    nx.degree_centrality() has it (in and out degrees together, if directed,
+    with self-loops counted twice, over the n - 1 possible neighbours).
+    """
+    n = len(sg)
+    if n <= 1:
+        return np.ones(n)
+    m = sg.matrix
+    if sg.directed:
+        d = m.getnnz(axis=1) + m.getnnz(axis=0)
+    else:  # each edge is held both ways, but self-loops only once
+        d = m.getnnz(axis=1) + (m.diagonal() != 0)
+    return d * (1.0 / (n - 1))
+
+
+def _degree(sg):
+    return (degree(sg), None)
+
+
+def _betweenness(sg, samples=None, top_x=100, tolerance=0.01, seed=0, jobs=1):
+    if samples:
+        return estimate_betweenness(sg, samples, top_x=top_x, tolerance=tolerance, seed=seed, jobs=jobs)
+    return (betweenness(sg, jobs=jobs), None)
+
+
+def _closeness(sg, largest_only=False, samples=None, seed=0):
+    return (closeness(sg, largest_only=largest_only, samples=samples, seed=seed), None)
+
+
+# c_type : (function of a SparseGraph and keyword arguments, returning its
+# results with info last, and which of those results are c_type's scores)
+SCORERS = {
+    'DEGREE'         : (_degree, 0),
+    'BETWEENNESS'    : (_betweenness, 0),
+    'CLOSENESS'      : (_closeness, 0),
+    'EIGENVECTOR'    : (eigenvector, 0),
+    'PAGERANK'       : (pagerank, 0),
+    'HITS_HUB'       : (hits, 0),
+    'HITS_AUTHORITY' : (hits, 1),
+    'KATZ'           : (katz, 0),
+    'HARMONIC'       : (hyperball, 0)
+}
+COSTLY = [_betweenness, _closeness]  # scorers worth starting first
+
+
+def scorer_args(c_type, c_opts):
+    """
+    The keyword arguments of c_type's SCORERS function, from the comparison
+    scripts' options (by dest) in c_opts.
+    """
+    get = lambda o, default=None: c_opts.get(o) if c_opts.get(o) is not None else default
+    power = lambda tol: { 'tol' : get('power_tolerance', tol), 'max_iter' : get('power_max_iter', 1000) }
+    if c_type == 'BETWEENNESS':
+        return {
+            'samples' : get('betweenness_samples'), 'top_x' : get('top_x', 100),
+            'tolerance' : get('betweenness_tolerance', 0.01), 'seed' : get('seed', 0), 'jobs' : get('betweenness_jobs', 1)
+        }
+    if c_type == 'CLOSENESS':
+        return {
+            'largest_only' : bool(get('largest_component', False)), 'samples' : get('closeness_samples'),
+            'seed' : get('seed', 0)
+        }
+    if c_type == 'PAGERANK':
+        return dict(power(1e-6), damping=get('pagerank_damping', 0.85))
+    if c_type in ['HITS_HUB', 'HITS_AUTHORITY']:
+        return power(1e-8)
+    if c_type == 'KATZ':
+        return dict(power(1e-6), alpha=get('katz_alpha'))
+    if c_type == 'EIGENVECTOR':
+        return power(1e-6)
+    if c_type == 'HARMONIC':
+        return { 'registers' : get('harmonic_registers', 64), 'seed' : get('seed', 0) }
+    return {}
+
+
+def _worker_scores(c_type, directed, args):
+    n = _worker_matrix.shape[0]
+    return SCORERS[c_type][0](SparseGraph(_worker_matrix, range(n), directed), **args)
+
+
+def centralities(sg, requests, jobs=1):
+    """
+    { c_type : (scores, info) } of sg for each c_type in requests, a dict of
+    c_type -> the keyword arguments of its SCORERS function. Centralities
+    from the same call with the same arguments (HITS hubs and authorities)
+    are only computed once. With more than one job, they are all computed
+    at the same time by a pool of jobs worker processes sharing sg's matrix,
+    exact betweenness' sources being split over the workers too.
+    """
+    tasks = {}  # (function, args) -> the c_types it scores
+    for c_type, args in requests.items():
+        tasks.setdefault((SCORERS[c_type][0], tuple(sorted(args.items()))), []).append(c_type)
+    chunked = lambda f, args: f is _betweenness and not args.get('samples') and len(sg) >= 3
+
+    results = {}
+    if jobs <= 1:
+        for (f, args) in tasks:
+            results[(f, args)] = f(sg, **dict(args))
+    else:
+        with SharedCSR(distance_matrix(sg)) as shared, ProcessPoolExecutor(
+            max_workers=jobs, initializer=attach_csr, initargs=(shared.spec(),)
+        ) as pool:
+            futures = {}
+            # the long single tasks first, then betweenness' chunks, then the rest
+            for key in sorted(tasks, key=lambda k: (chunked(k[0], dict(k[1])), k[0] not in COSTLY)):
+                (f, args) = (key[0], dict(key[1]))
+                if chunked(f, args):
+                    chunks = _chunks(np.arange(len(sg)), jobs)
+                    futures[key] = [pool.submit(_worker_dependencies, c, True) for c in chunks]
+                else:
+                    if f is hyperball:  # workers only have node codes
+                        args = dict(args, hashes=label_hashes(sg.labels))
+                    futures[key] = pool.submit(_worker_scores, tasks[key][0], sg.directed, args)
+            for key, future in futures.items():
+                if isinstance(future, list):
+                    sums = sum(chunk.result()[0] for chunk in future)
+                    results[key] = (sums * betweenness_scale(len(sg), sg.directed), None)
+                else:
+                    results[key] = future.result()
+
+    scores = {}
+    for key, c_types in tasks.items():
+        for c_type in c_types:
+            scores[c_type] = (results[key][SCORERS[c_type][1]], results[key][-1])
+    return scores
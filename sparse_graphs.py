@@ -0,0 +1,692 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+from array import array
+
+
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+
+
+#
+# Interaction graphs held as sparse matrices. Edges are collected as integer
+# coded (src, tgt, weight) arrays and aggregated in one go by SciPy's COO to
+# CSR conversion, rather than one has_edge/attribute update at a time, and the
+# result is kept as a CSR adjacency matrix plus a table of node labels. Only
+# convert to networkx when a networkx algorithm (or writer) is actually needed.
+#
+
+
+class SparseGraph:
+    """
+    A weighted graph held as a square CSR adjacency matrix over integer node
+    codes, plus the table of node labels those codes stand for. Undirected
+    graphs hold each edge in both directions. Directed graphs may also carry a
+    tag per edge (e.g. its interaction type), as codes into tag_labels. Any
+    other edge attributes (e.g. read from GraphML) are kept in edge_columns.
+    """
+    def __init__(self, matrix, labels, directed=True, edge_tags=None, tag_labels=None, edge_columns=None):
+        self.matrix = sp.csr_matrix(matrix)
+        if not self.matrix.has_sorted_indices:
+            self.matrix.sort_indices()
+        self.labels = list(labels)
+        self.directed = directed
+        self.edge_tags = edge_tags  # aligned with matrix.data
+        self.tag_labels = tag_labels
+        self.edge_columns = edge_columns or {}  # attr_name : [value per edge, or None], aligned with edge_arrays()
+
+    def __len__(self):
+        return len(self.labels)
+
+    def number_of_edges(self):
+        if self.directed:
+            return self.matrix.nnz
+        return sp.triu(self.matrix).nnz
+
+    def _positions(self):
+        """Positions in matrix.data of the edges (upper triangle only if undirected)."""
+        m = self.matrix
+        srcs = np.repeat(np.arange(m.shape[0]), np.diff(m.indptr))
+        if self.directed:
+            return (srcs, np.arange(m.nnz))
+        positions = np.flatnonzero(srcs <= m.indices)
+        return (srcs[positions], positions)
+
+    def edge_arrays(self):
+        """(srcs, tgts, weights) arrays of node codes and weights, in CSR order."""
+        (srcs, positions) = self._positions()
+        return (srcs, self.matrix.indices[positions], self.matrix.data[positions])
+
+    def edge_positions(self, srcs, tgts):
+        """The index in edge_arrays() of each (src, tgt) pair of node codes, or -1 if there's no such edge."""
+        (srcs, tgts) = (np.asarray(srcs, dtype=np.int64), np.asarray(tgts, dtype=np.int64))
+        if not len(srcs):
+            return np.zeros(0, dtype=np.int64)
+        if not self.directed:
+            (srcs, tgts) = (np.minimum(srcs, tgts), np.maximum(srcs, tgts))
+        (e_srcs, e_tgts, _) = self.edge_arrays()
+        lookup = sp.csr_matrix(
+            (np.arange(1, len(e_srcs) + 1), (e_srcs, e_tgts)), shape=self.matrix.shape
+        )
+        return np.asarray(lookup[srcs, tgts]).ravel() - 1
+
+    def edge_tag_list(self):
+        """Each edge's tag (or None), aligned with edge_arrays()."""
+        if self.edge_tags is None:
+            return [None] * self.number_of_edges()
+        return [self.tag_labels[t] if t >= 0 else None for t in self.edge_tags.tolist()]
+
+    def edges(self):
+        """Yields (src_label, tgt_label, weight) for each edge."""
+        (srcs, tgts, weights) = self.edge_arrays()
+        labels = self.labels
+        for s, t, w in zip(srcs.tolist(), tgts.tolist(), weights.tolist()):
+            yield (labels[s], labels[t], w)
+
+    def to_networkx(self, node_attrs=None, edge_attrs=None, tag_name=None, weight='weight'):
+        """
+        Converts to a networkx DiGraph (or Graph, if undirected), with nodes and
+        edges in code order. node_attrs, if given, is called with each node
+        label to get that node's attributes; edge_attrs are added to every
+        edge, as are their values in edge_columns; tag_name, if given, names
+        the edge attribute for edge tags; and weight (unless None) that for
+        edge weights.
+        """
+        g = nx.DiGraph() if self.directed else nx.Graph()
+        if node_attrs:
+            g.add_nodes_from((l, node_attrs(l)) for l in self.labels)
+        else:
+            g.add_nodes_from(self.labels)
+        labels = self.labels
+        constant = edge_attrs or {}
+        tags = self.edge_tag_list() if tag_name else None
+        columns = list(self.edge_columns.items())
+        for i, (s, t, w) in enumerate(self.edges()):
+            d = dict(constant)
+            for name, values in columns:
+                if values[i] is not None:
+                    d[name] = values[i]
+            if weight is not None:
+                d[weight] = w
+            if tags is not None and tags[i] is not None:
+                d[tag_name] = tags[i]
+            g.add_edge(s, t, **d)
+        return g
+
+    @classmethod
+    def from_networkx(cls, g, weight='weight', tag_name=None, keep_attrs=False):
+        """
+        A SparseGraph of g's weighted edges (missing weights count as 1), with
+        the tag_name attribute of a directed g's edges as their tags, if given,
+        and (if keep_attrs) the rest of their attributes as edge_columns.
+        """
+        labels = list(g.nodes())
+        codes = dict((n, i) for i, n in enumerate(labels))
+        srcs = []
+        tgts = []
+        weights = []
+        tags = []
+        attrs = []
+        for u, v, d in g.edges(data=True):
+            srcs.append(codes[u])
+            tgts.append(codes[v])
+            weights.append(d.get(weight, 1))
+            tags.append(d.get(tag_name) if tag_name else None)
+            if keep_attrs:
+                attrs.append(d)
+        n = len(labels)
+        if any(len(d.keys() - {weight, tag_name}) for d in attrs):
+            sg = cls.from_networkx(g, weight, tag_name)
+            sg.edge_columns = edge_columns(sg, srcs, tgts, attrs, skip=(weight, tag_name))
+            return sg
+        directed = g.is_directed()
+        if not directed:  # hold both directions, but self-loops only once
+            mirrored = [i for i in range(len(srcs)) if srcs[i] != tgts[i]]
+            srcs, tgts = srcs + [tgts[i] for i in mirrored], tgts + [srcs[i] for i in mirrored]
+            weights = weights + [weights[i] for i in mirrored]
+        m = sp.coo_matrix((weights, (srcs, tgts)), shape=(n, n)).tocsr()
+        m.eliminate_zeros()
+        if not directed or not any(t is not None for t in tags):
+            return cls(m, labels, directed=directed)
+
+        # line the tags up with the (src, tgt) ordered, zero-free matrix data
+        tag_labels = sorted(set(t for t in tags if t is not None))
+        tag_codes = dict((t, i) for i, t in enumerate(tag_labels))
+        edge_tags = sp.coo_matrix(
+            ([tag_codes[t] + 1 if t is not None else 0 for t in tags], (srcs, tgts)), shape=(n, n)
+        ).tocsr()
+        edge_tags = np.asarray(edge_tags[m.nonzero()]).ravel() - 1
+        return cls(m, labels, directed=True, edge_tags=edge_tags, tag_labels=tag_labels)
+
+
+def edge_columns(sg, srcs, tgts, attrs, skip=()):
+    """
+    { attr_name : [value per edge of sg, or None] }, in edge_arrays() order,
+    from the attribute dicts attrs of the (src, tgt) node code pairs (the
+    last one given winning, for repeated edges), leaving out those in skip.
+    """
+    positions = sg.edge_positions(srcs, tgts).tolist()
+    n = sg.number_of_edges()
+    columns = {}
+    for p, d in zip(positions, attrs):
+        if p < 0:  # e.g. its weight summed to zero
+            continue
+        for k, v in d.items():
+            if k in skip:
+                continue
+            if k not in columns:
+                columns[k] = [None] * n
+            columns[k][p] = v
+    return columns
+
+
+class SparseGraphBuilder:
+    """
+    Collects weighted (src, tgt) edges as integer codes and aggregates them
+    into a SparseGraph. Repeated edges have their weights summed, and negative
+    weights may be used to take weight away again (edges summing to zero are
+    dropped). Pending edges are aggregated every compact_every additions so
+    memory stays proportional to the number of distinct edges.
+    """
+    def __init__(self, directed=True, weight_type=int, compact_every=1000000):
+        self.directed = directed
+        self.labels = []  # code : label
+        self.codes = {}   # label : code
+        self.tag_labels = []
+        self.tag_codes = {}
+        self.compact_every = compact_every
+        self._typecode = 'q' if weight_type is int else 'd'
+        self._dtype = np.int64 if weight_type is int else np.float64
+        empty = np.zeros(0, dtype=np.int64)
+        self._base = (empty, empty, np.zeros(0, dtype=self._dtype), empty)
+        self._compact_at = compact_every
+        self._reset_pending()
+
+    def _reset_pending(self):
+        self._srcs = array('q')
+        self._tgts = array('q')
+        self._weights = array(self._typecode)
+        self._tags = array('q')
+
+    def code(self, label):
+        """The code for the node label, adding it if it's new."""
+        c = self.codes.get(label)
+        if c is None:
+            c = len(self.labels)
+            self.codes[label] = c
+            self.labels.append(label)
+        return c
+
+    def _tag_code(self, tag):
+        if tag is None:
+            return -1
+        c = self.tag_codes.get(tag)
+        if c is None:
+            c = len(self.tag_labels)
+            self.tag_codes[tag] = c
+            self.tag_labels.append(tag)
+        return c
+
+    def add_edge(self, src, tgt, weight=1, tag=None):
+        """Adds weight to the src to tgt edge, tagging it with tag if it's new."""
+        s = self.code(src)
+        t = self.code(tgt)
+        if not self.directed and t < s:
+            s, t = t, s
+        self._srcs.append(s)
+        self._tgts.append(t)
+        self._weights.append(weight)
+        self._tags.append(self._tag_code(tag))
+        if len(self._srcs) >= self._compact_at:
+            self._compact()
+
+    def add_edges(self, pairs, weight=1, tag=None):
+        for src, tgt in pairs:
+            self.add_edge(src, tgt, weight, tag)
+
+    def _codes_of(self, labels, code):
+        """Codes for an array of labels, giving new ones codes in order of first appearance."""
+        (uniq, firsts, inverse) = np.unique(labels, return_index=True, return_inverse=True)
+        uniq = uniq.tolist()  # plain python labels, even from numpy string arrays
+        codes = np.empty(len(uniq), dtype=np.int64)
+        for i in np.argsort(firsts, kind='stable').tolist():
+            codes[i] = code(uniq[i])
+        return codes[inverse.ravel()]
+
+    def add_edge_arrays(self, srcs, tgts, weights=1, tags=None):
+        """
+        add_edge for whole arrays of src and tgt labels (and weights and tags)
+        at once, coding labels as if the edges had been added one by one.
+        Returns the (src_codes, tgt_codes) arrays. Labels are sorted to code
+        them, which is much quicker as numpy string arrays than object arrays.
+        """
+        (srcs, tgts) = (np.asarray(srcs), np.asarray(tgts))
+        n = len(srcs)
+        both = np.empty(2 * n, dtype=np.result_type(srcs, tgts))
+        both[0::2] = srcs
+        both[1::2] = tgts
+        coded = self._codes_of(both, self.code) if n else np.zeros(0, dtype=np.int64)
+        (s, t) = (coded[0::2], coded[1::2])
+        if not self.directed:
+            (s, t) = (np.minimum(s, t), np.maximum(s, t))
+        tag_codes = np.full(n, -1, dtype=np.int64)
+        if tags is not None and n:
+            tag_codes = self._codes_of(np.asarray(tags), self._tag_code)
+        self._srcs.frombytes(s.astype(np.int64).tobytes())
+        self._tgts.frombytes(t.astype(np.int64).tobytes())
+        self._weights.frombytes(np.broadcast_to(np.asarray(weights, dtype=self._dtype), (n,)).tobytes())
+        self._tags.frombytes(tag_codes.tobytes())
+        if len(self._srcs) >= self._compact_at:
+            self._compact()
+        return (coded[0::2], coded[1::2])
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _compact(self):
+        """Aggregates the pending edges into the base, returning its CSR matrix."""
+        (b_srcs, b_tgts, b_weights, b_tags) = self._base
+        srcs = np.concatenate([b_srcs, np.array(self._srcs, dtype=np.int64)])
+        tgts = np.concatenate([b_tgts, np.array(self._tgts, dtype=np.int64)])
+        weights = np.concatenate([b_weights, np.array(self._weights, dtype=self._dtype)])
+        tags = np.concatenate([b_tags, np.array(self._tags, dtype=np.int64)])
+        self._reset_pending()
+
+        n = len(self.labels)
+        m = sp.coo_matrix((weights, (srcs, tgts)), shape=(n, n)).tocsr()  # sums repeats
+        m.sum_duplicates()
+        if len(tags) and (tags == tags[0]).all():  # e.g. a CSV of one kind of interaction
+            tags = np.full(m.nnz, tags[0], dtype=np.int64)
+        elif len(self.tag_labels):
+            # keep the first tag given to each edge, in CSR (i.e. (src, tgt)) order
+            order = np.lexsort((np.arange(len(srcs)), tgts, srcs))
+            s, t = srcs[order], tgts[order]
+            firsts = np.flatnonzero(np.r_[True, (s[1:] != s[:-1]) | (t[1:] != t[:-1])])
+            tags = tags[order][firsts]
+        else:
+            tags = np.full(m.nnz, -1, dtype=np.int64)
+        keep = m.data != 0
+        tags = tags[keep]
+        m.eliminate_zeros()
+
+        srcs = np.repeat(np.arange(n, dtype=np.int64), np.diff(m.indptr))
+        self._base = (srcs, m.indices.astype(np.int64), m.data, tags)
+        self._compact_at = max(self.compact_every, 2 * m.nnz)
+        return (m, tags)
+
+    def build(self, drop_isolates=False):
+        """
+        The SparseGraph of the edges added so far. Nodes left without edges
+        (after weight has been taken away) are dropped if drop_isolates.
+        """
+        (m, tags) = self._compact()
+        labels = self.labels
+        if drop_isolates:
+            has_edges = (np.diff(m.indptr) > 0) | (np.bincount(m.indices, minlength=m.shape[0]) > 0)
+            if not has_edges.all():
+                keep = np.flatnonzero(has_edges)
+                m = m[keep][:, keep]
+                labels = [labels[i] for i in keep.tolist()]
+        if not self.directed:  # mirror the upper triangle, without doubling self-loops
+            m = (m + m.T - sp.diags(m.diagonal(), 0, shape=m.shape, dtype=m.dtype)).tocsr()
+            m.eliminate_zeros()
+            return SparseGraph(m, labels, directed=False)
+        has_tags = len(self.tag_labels) and (tags >= 0).any()
+        return SparseGraph(
+            m, labels, directed=True,
+            edge_tags=tags if has_tags else None,
+            tag_labels=list(self.tag_labels) if has_tags else None
+        )
+
+
+class CooccurrenceBuilder:
+    """
+    Collects groups of items (e.g. the hashtags of each tweet) as a sparse
+    group x item incidence matrix A, and builds the undirected graph linking
+    items that occur in the same group from A'A, which gives every pair's
+    co-occurrence count at once. An item repeated within a group counts once
+    per occurrence, so a group holding it twice adds a self-loop.
+    """
+    def __init__(self):
+        self.labels = []  # code : item
+        self.codes = {}   # item : code
+        self.groups = 0
+        self.group_codes = {}  # only for groups added by name
+        self._rows = array('q')
+        self._cols = array('q')
+
+    def code(self, item):
+        c = self.codes.get(item)
+        if c is None:
+            c = len(self.labels)
+            self.codes[item] = c
+            self.labels.append(item)
+        return c
+
+    def add_group(self, items):
+        """Records a group holding all the items."""
+        if len(items) < 2:
+            return  # nothing co-occurs
+        for item in items:
+            self._rows.append(self.groups)
+            self._cols.append(self.code(item))
+        self.groups += 1
+
+    def add(self, group, item):
+        """Records one occurrence of the item in the named group."""
+        g = self.group_codes.get(group)
+        if g is None:
+            g = self.groups
+            self.group_codes[group] = g
+            self.groups += 1
+        self._rows.append(g)
+        self._cols.append(self.code(item))
+
+    def build(self, min_weight=1):
+        """
+        The co-occurrence SparseGraph (with float weights). Edges lighter than
+        min_weight are dropped from the sparse product before the graph is
+        made, along with any items left without edges.
+        """
+        n = len(self.labels)
+        rows = np.array(self._rows, dtype=np.int64)
+        cols = np.array(self._cols, dtype=np.int64)
+        a = sp.coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(self.groups, n)).tocsr()
+        c = (a.T.tocsr() * a).tocsr()
+        # A'A counts each item against itself, so keep only the pairs of
+        # distinct occurrences on the diagonal: (count^2 - count) / 2
+        c.setdiag((c.diagonal() - np.asarray(a.sum(axis=0)).ravel()) / 2.0)
+        if min_weight > 1:
+            c.data[c.data < min_weight] = 0
+        c.eliminate_zeros()
+
+        has_edges = np.diff(c.indptr) > 0
+        keep = np.flatnonzero(has_edges)
+        c = c[keep][:, keep]
+        return SparseGraph(c, [self.labels[i] for i in keep.tolist()], directed=False)
+
+
+PROJECTION_WEIGHTINGS = ['COUNT', 'BINARY', 'JACCARD', 'COSINE', 'NEWMAN']
+
+
+class BipartiteBuilder:
+    """
+    Collects weighted (row, col) incidences, e.g. how often each user used
+    each hashtag, as a sparse rows x cols matrix B, and projects B onto either
+    side, linking two cols (or rows) by what they share on the other side:
+
+    - COUNT:   sum of the products of their incidence counts
+    - BINARY:  number of rows (cols) they share
+    - JACCARD: shared / (either's total - shared), over the binary incidences
+    - COSINE:  cosine similarity of their incidence count vectors
+    - NEWMAN:  shared rows (cols), each worth 1 / (its degree - 1)
+
+    The projection is multiplied out a block at a time, and each block is
+    pruned to min_weight and/or each node's top_k neighbours before the next
+    is computed, so the full dense-ish projection is never held in memory.
+    """
+    def __init__(self, compact_every=1000000):
+        self.row_labels = []
+        self.row_codes = {}
+        self.col_labels = []
+        self.col_codes = {}
+        self.compact_every = compact_every
+        self.first_cols = {}  # row code : code of the first col added to it
+        self._base = sp.csr_matrix((0, 0))
+        self._reset_pending()
+
+    def _reset_pending(self):
+        self._rows = array('q')
+        self._cols = array('q')
+        self._weights = array('d')
+
+    def row(self, label):
+        """The code for the row label, adding it if it's new."""
+        c = self.row_codes.get(label)
+        if c is None:
+            c = len(self.row_labels)
+            self.row_codes[label] = c
+            self.row_labels.append(label)
+        return c
+
+    def col(self, label):
+        """The code for the col label, adding it if it's new."""
+        c = self.col_codes.get(label)
+        if c is None:
+            c = len(self.col_labels)
+            self.col_codes[label] = c
+            self.col_labels.append(label)
+        return c
+
+    def add(self, row, col, weight=1):
+        (r, c) = (self.row(row), self.col(col))
+        self.first_cols.setdefault(r, c)
+        self._rows.append(r)
+        self._cols.append(c)
+        self._weights.append(weight)
+        if len(self._rows) >= self.compact_every:
+            self._compact()
+
+    def _compact(self):
+        shape = (len(self.row_labels), len(self.col_labels))
+        pending = sp.coo_matrix((
+            np.array(self._weights, dtype=np.float64),
+            (np.array(self._rows, dtype=np.int64), np.array(self._cols, dtype=np.int64))
+        ), shape=shape).tocsr()
+        self._reset_pending()
+        base = self._base
+        base.resize(shape)
+        self._base = (base + pending).tocsr()
+        return self._base
+
+    def matrix(self):
+        """The rows x cols CSR matrix of summed incidences."""
+        m = self._compact()
+        m.eliminate_zeros()
+        return m
+
+    def star(self, min_weight=None):
+        """
+        The undirected SparseGraph linking each row's first col to each of its
+        other cols (a star per row, rather than project()'s clique), weighted
+        by the number of rows doing so. Edges lighter than min_weight are
+        dropped, and so are cols left without edges.
+        """
+        b = self.matrix().tocoo()
+        n = b.shape[1]
+        firsts = np.full(b.shape[0], -1, dtype=np.int64)
+        firsts[list(self.first_cols.keys())] = list(self.first_cols.values())
+        keep = b.col != firsts[b.row]
+        (r, c) = (firsts[b.row[keep]], b.col[keep].astype(np.int64))
+        m = sp.coo_matrix((np.ones(len(r)), (np.minimum(r, c), np.maximum(r, c))), shape=(n, n)).tocsr()
+        m = (m + m.T).tocsr()
+        if min_weight is not None:
+            m.data[m.data < min_weight] = 0
+            m.eliminate_zeros()
+        keep = np.flatnonzero(np.diff(m.indptr) > 0)
+        return SparseGraph(m[keep][:, keep], [self.col_labels[i] for i in keep.tolist()], directed=False)
+
+    def project(self, side='cols', weighting='BINARY', min_weight=None, top_k=None,
+                block_size=10000, drop_isolates=True):
+        """
+        The undirected SparseGraph of the cols (or rows, if side is 'rows')
+        linked by the chosen weighting of what they share, without self-loops.
+        Edges lighter than min_weight are dropped and, if top_k is given, an
+        edge is only kept if it's among the top_k heaviest of either node.
+        """
+        if weighting not in PROJECTION_WEIGHTINGS:
+            raise ValueError('Unknown projection weighting: %s' % weighting)
+        b = self.matrix()
+        if side == 'rows':
+            b = b.T.tocsr()
+            labels = self.row_labels
+        else:
+            labels = self.col_labels
+        n = b.shape[1]
+
+        x = b
+        if weighting != 'COUNT' and weighting != 'COSINE':
+            x = b.copy()
+            x.data[:] = 1.0
+        left = x
+        if weighting == 'NEWMAN':
+            k = np.asarray(x.sum(axis=1)).ravel()
+            scale = np.zeros(len(k))
+            scale[k > 1] = 1.0 / (k[k > 1] - 1)
+            left = sp.diags(scale, 0, format='csr') * x
+        left_t = left.T.tocsr()  # n x other side
+        if weighting == 'JACCARD':
+            degrees = np.asarray(x.sum(axis=0)).ravel()
+        elif weighting == 'COSINE':
+            norms = np.sqrt(np.asarray(x.multiply(x).sum(axis=0)).ravel())
+
+        srcs = []
+        tgts = []
+        weights = []
+        for start in range(0, n, block_size):
+            block = (left_t[start:start + block_size] * x).tocoo()
+            r = block.row.astype(np.int64) + start
+            c = block.col.astype(np.int64)
+            w = block.data
+            keep = (r != c) & (w != 0)
+            r, c, w = r[keep], c[keep], w[keep]
+            if weighting == 'JACCARD':
+                w = w / (degrees[r] + degrees[c] - w)
+            elif weighting == 'COSINE':
+                w = w / (norms[r] * norms[c])
+            if min_weight is not None:
+                keep = w >= min_weight
+                r, c, w = r[keep], c[keep], w[keep]
+            if top_k is not None and len(w):
+                order = np.lexsort((-w, r))
+                r, c, w = r[order], c[order], w[order]
+                row_starts = np.flatnonzero(np.r_[True, r[1:] != r[:-1]])
+                run_lengths = np.diff(np.r_[row_starts, len(r)])
+                rank = np.arange(len(r)) - np.repeat(row_starts, run_lengths)
+                keep = rank < top_k
+                r, c, w = r[keep], c[keep], w[keep]
+            srcs.append(r)
+            tgts.append(c)
+            weights.append(w)
+
+        empty = np.zeros(0, dtype=np.int64)
+        m = sp.coo_matrix((
+            np.concatenate(weights) if weights else np.zeros(0),
+            (np.concatenate(srcs) if srcs else empty, np.concatenate(tgts) if tgts else empty)
+        ), shape=(n, n)).tocsr()
+        if top_k is not None:
+            m = m.maximum(m.T).tocsr()  # kept if in either end's top k
+
+        if drop_isolates:
+            keep = np.flatnonzero(np.diff(m.indptr) > 0)
+            m = m[keep][:, keep]
+            labels = [labels[i] for i in keep.tolist()]
+        return SparseGraph(m, labels, directed=False)
+
+
+BACKBONE_METHODS = ['DISPARITY', 'NOISE_CORRECTED']
+BACKBONE_THRESHOLDS = {  # the usual significance level / number of standard deviations
+    'DISPARITY'       : 0.05,
+    'NOISE_CORRECTED' : 1.64
+}
+
+
+def disparity_scores(m):
+    """
+    The disparity filter's alpha for each entry of a weighted CSR matrix
+    (aligned with m.data), from its source's side: how unlikely a share
+    w_ij / s_i of i's strength is if i's weight were spread uniformly at
+    random over its k_i edges, i.e. (1 - w_ij / s_i) ** (k_i - 1).
+    Self-loops are left out of strengths and degrees and score 1.
+    """
+    rows = np.repeat(np.arange(m.shape[0]), np.diff(m.indptr))
+    off_diagonal = rows != m.indices
+    w = np.where(off_diagonal, m.data, 0).astype(np.float64)
+    strengths = np.bincount(rows, weights=w, minlength=m.shape[0])
+    degrees = np.bincount(rows, weights=off_diagonal, minlength=m.shape[0])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = np.where(strengths[rows] > 0, w / strengths[rows], 0)
+    alphas = (1.0 - p) ** (degrees[rows] - 1)
+    alphas[~off_diagonal] = 1.0
+    return alphas
+
+
+def noise_corrected_scores(m):
+    """
+    (score, sdev) for each entry of a weighted CSR matrix (aligned with
+    m.data), after Coscia & Neffke's noise-corrected backbone: score is the
+    lift of w_ij over what i's and j's strengths would lead one to expect,
+    rescaled to [-1, 1], and sdev its standard deviation under a binomial
+    null model with a Bayesian prior.
+    """
+    rows = np.repeat(np.arange(m.shape[0]), np.diff(m.indptr))
+    cols = m.indices
+    nij = m.data.astype(np.float64)
+    ni = np.asarray(m.sum(axis=1)).ravel()[rows].astype(np.float64)
+    nj = np.asarray(m.sum(axis=0)).ravel()[cols].astype(np.float64)
+    n = float(nij.sum())
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_prior = (ni * nj) / n / n
+        kappa = n / (ni * nj)
+        score = (kappa * nij - 1) / (kappa * nij + 1)
+        var_prior = (1 / n ** 2) * (ni * nj * (n - ni) * (n - nj)) / (n ** 2 * (n - 1))
+        alpha_prior = ((mean_prior ** 2) / var_prior) * (1 - mean_prior) - mean_prior
+        beta_prior = (mean_prior / var_prior) * (1 - mean_prior ** 2) - (1 - mean_prior)
+        alpha_post = alpha_prior + nij
+        beta_post = n - nij + beta_prior
+        expected_pij = alpha_post / (alpha_post + beta_post)
+        variance_nij = expected_pij * (1 - expected_pij) * n
+        d = (1.0 / (ni * nj)) - (n * ((ni + nj) / ((ni * nj) ** 2)))
+        variance_cij = variance_nij * ((2 * (kappa + nij * d)) / ((kappa * nij + 1) ** 2)) ** 2
+    return (score, np.sqrt(variance_cij))
+
+
+def backbone(sg, method='DISPARITY', threshold=None, drop_isolates=True):
+    """
+    The backbone of a weighted SparseGraph: only the edges that stand out
+    from what its nodes' strengths would lead one to expect. DISPARITY keeps
+    an edge if its disparity filter alpha is below threshold for either of
+    its ends; NOISE_CORRECTED keeps it if its score is more than threshold
+    standard deviations above zero. Self-loops are kept, and nodes left
+    without edges are dropped if drop_isolates.
+    """
+    if method not in BACKBONE_METHODS:
+        raise ValueError('Unknown backbone method: %s' % method)
+    if threshold is None:
+        threshold = BACKBONE_THRESHOLDS[method]
+    m = sg.matrix
+    if (m.data < 0).any():
+        raise ValueError('Backbones need non-negative edge weights')
+
+    rows = np.repeat(np.arange(m.shape[0]), np.diff(m.indptr))
+    if method == 'DISPARITY':
+        out_alphas = disparity_scores(m)
+        # the same edges from their targets' side, lined up with m.data
+        t = m.T.tocsr()
+        in_alphas = disparity_scores(t)
+        lookup = sp.csr_matrix((np.arange(t.nnz) + 1.0, t.indices, t.indptr), shape=t.shape).T.tocsr()
+        lookup.sort_indices()
+        in_alphas = in_alphas[lookup.data.astype(np.int64) - 1]
+        keep = (out_alphas < threshold) | (in_alphas < threshold)
+    else:
+        (score, sdev) = noise_corrected_scores(m)
+        keep = score - threshold * sdev > 0
+    keep |= rows == m.indices
+
+    kept = sp.csr_matrix((np.where(keep, m.data, 0), m.indices.copy(), m.indptr.copy()), shape=m.shape)  # not sg's own
+    if not sg.directed:  # either direction's verdict holds for both
+        kept = kept.maximum(kept.T).tocsr()
+    kept.eliminate_zeros()
+    edge_tags = None
+    if sg.edge_tags is not None:
+        edge_tags = sg.edge_tags[keep]
+    labels = sg.labels
+    if drop_isolates:
+        has_edges = (np.diff(kept.indptr) > 0) | (np.bincount(kept.indices, minlength=kept.shape[0]) > 0)
+        if not has_edges.all():
+            nodes = np.flatnonzero(has_edges)
+            kept = kept[nodes][:, nodes]
+            labels = [labels[i] for i in nodes.tolist()]
+    return SparseGraph(kept, labels, directed=sg.directed, edge_tags=edge_tags, tag_labels=sg.tag_labels)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+from array import array
+
+
+import numpy as np
+import scipy.sparse as sp
+
+
+from interaction_graphs import GRAPH_TYPES, interaction_type, interactions_from, parse_ts, timestamp_2_epoch_seconds
+from sparse_graphs import SparseGraph
+
+
+#
+# Every interaction in a corpus of tweets as rows of (ts, src, tgt, g_type,
+# kind) columns sorted by time, so the graph of any type over any [start, end)
+# range can be had with a binary search for the range and a group-by of its
+# rows, without going back to the tweets. Stores are saved as .npz files.
+#
+
+
+class TemporalEdgeStore:
+    """
+    The interactions of each of g_types in a corpus, as time-sorted columns:
+    ts (epoch seconds), src and tgt (codes into labels), g_type (codes into
+    g_types) and kind (the interaction each row was, as codes into kinds, which
+    only differs from g_type for RTQT). tweet_ts holds the sorted timestamps
+    of every tweet, including those without any interactions.
+    """
+    def __init__(self, ts, srcs, tgts, g_type_codes, kind_codes, labels, g_types, kinds, tweet_ts):
+        self.ts = ts
+        self.srcs = srcs
+        self.tgts = tgts
+        self.g_type_codes = g_type_codes
+        self.kind_codes = kind_codes
+        self.labels = labels
+        self.g_types = g_types
+        self.kinds = kinds
+        self.tweet_ts = tweet_ts
+
+    def __len__(self):
+        return len(self.ts)
+
+    @classmethod
+    def from_tweets(cls, tweets, g_types=GRAPH_TYPES):
+        """A store of the g_types interactions in an iterable of tweets, which needn't be in time order."""
+        g_types = list(g_types)
+        kinds = []
+        kind_codes = {}
+        labels = []
+        codes = {}
+        def code(label, labels=labels, codes=codes):
+            c = codes.get(label)
+            if c is None:
+                c = codes[label] = len(labels)
+                labels.append(label)
+            return c
+
+        ts_col, srcs, tgts, g_col, k_col = array('q'), array('q'), array('q'), array('b'), array('b')
+        tweet_ts = array('q')
+        for t in tweets:
+            ts = timestamp_2_epoch_seconds(parse_ts(t['created_at']))
+            tweet_ts.append(ts)
+            for g, g_type in enumerate(g_types):
+                kind = interaction_type(t, g_type)
+                if kind not in kind_codes:
+                    kind_codes[kind] = len(kinds)
+                    kinds.append(kind)
+                for src, tgt in interactions_from(t, g_type):
+                    ts_col.append(ts)
+                    srcs.append(code(src))
+                    tgts.append(code(tgt))
+                    g_col.append(g)
+                    k_col.append(kind_codes[kind])
+
+        ts_col = np.frombuffer(ts_col, dtype=np.int64)
+        order = np.argsort(ts_col, kind='stable')  # keeps corpus order within a second
+        return cls(
+            ts_col[order],
+            np.frombuffer(srcs, dtype=np.int64)[order],
+            np.frombuffer(tgts, dtype=np.int64)[order],
+            np.frombuffer(g_col, dtype=np.int8)[order],
+            np.frombuffer(k_col, dtype=np.int8)[order],
+            labels, g_types, kinds,
+            np.sort(np.frombuffer(tweet_ts, dtype=np.int64), kind='stable')
+        )
+
+    def save(self, path):
+        np.savez(
+            path, ts=self.ts, srcs=self.srcs, tgts=self.tgts, g_type_codes=self.g_type_codes,
+            kind_codes=self.kind_codes, tweet_ts=self.tweet_ts,
+            labels=np.array([str(l) for l in self.labels]),
+            g_types=np.array(self.g_types), kinds=np.array(self.kinds)
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            return cls(
+                f['ts'], f['srcs'], f['tgts'], f['g_type_codes'], f['kind_codes'],
+                f['labels'].tolist(), f['g_types'].tolist(), f['kinds'].tolist(), f['tweet_ts']
+            )
+
+    def time_span(self):
+        """(first, last) tweet timestamps, or (None, None) if there are no tweets."""
+        if not len(self.tweet_ts):
+            return (None, None)
+        return (int(self.tweet_ts[0]), int(self.tweet_ts[-1]))
+
+    def range(self, start=None, end=None):
+        """(lo, hi) bounds of the rows with start <= ts < end (either may be None for no limit)."""
+        lo = 0 if start is None else int(np.searchsorted(self.ts, start, side='left'))
+        hi = len(self.ts) if end is None else int(np.searchsorted(self.ts, end, side='left'))
+        return (lo, max(lo, hi))
+
+    def _rows(self, g_type, start=None, end=None):
+        if g_type not in self.g_types:
+            raise ValueError('No %s interactions in this store (it has: %s)' % (g_type, ','.join(self.g_types)))
+        (lo, hi) = self.range(start, end)
+        keep = self.g_type_codes[lo:hi] == self.g_types.index(g_type)
+        return (self.srcs[lo:hi][keep], self.tgts[lo:hi][keep], self.kind_codes[lo:hi][keep])
+
+    def graph(self, g_type, start=None, end=None):
+        """
+        The SparseGraph of g_type interactions with start <= ts < end, weighted
+        by how many there were and tagged with the kind each edge first was.
+        """
+        (srcs, tgts, kind_codes) = self._rows(g_type, start, end)
+        (nodes, inverse) = np.unique(np.r_[srcs, tgts], return_inverse=True)
+        inverse = inverse.ravel()
+        (s, t) = (inverse[:len(srcs)], inverse[len(srcs):])
+        n = len(nodes)
+        m = sp.coo_matrix((np.ones(len(s), dtype=np.int64), (s, t)), shape=(n, n)).tocsr()
+        m.sum_duplicates()
+
+        # the first (i.e. earliest) kind of each edge, in CSR order
+        order = np.lexsort((np.arange(len(s)), t, s))
+        (s, t) = (s[order], t[order])
+        firsts = np.flatnonzero(np.r_[True, (s[1:] != s[:-1]) | (t[1:] != t[:-1])]) if len(s) else order
+        edge_tags = kind_codes[order][firsts].astype(np.int64)
+        return SparseGraph(
+            m, [self.labels[c] for c in nodes.tolist()], directed=True,
+            edge_tags=edge_tags, tag_labels=list(self.kinds)
+        )
+
+    def events(self, g_types):
+        """
+        Yields (ts, { g_type : [(src, tgt), ...] }) for each second in which a
+        tweet was posted, in time order, as the longitudinal comparisons
+        expect of a corpus (only tweets in the same second are merged).
+        """
+        g_codes = dict((g_type, self.g_types.index(g_type)) for g_type in g_types if g_type in self.g_types)
+        missing = [g_type for g_type in g_types if g_type not in g_codes]
+        if missing:
+            raise ValueError('No %s interactions in this store' % ','.join(missing))
+        labels = self.labels
+        ts_list = self.ts.tolist()
+        srcs, tgts, g_col = self.srcs.tolist(), self.tgts.tolist(), self.g_type_codes.tolist()
+        by_code = dict((c, g_type) for g_type, c in g_codes.items())
+        row = 0
+        for ts in np.unique(self.tweet_ts).tolist():
+            interactions = dict((g_type, []) for g_type in g_types)
+            while row < len(ts_list) and ts_list[row] <= ts:
+                g_type = by_code.get(g_col[row])
+                if g_type is not None:
+                    interactions[g_type].append((labels[srcs[row]], labels[tgts[row]]))
+                row += 1
+            yield (ts, interactions)
@@ -0,0 +1,62 @@
+import json
+import os
+import random
+import sys
+import time
+
+import pytest
+
+
+# the scripts and modules under test sit at the top of the repository
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+
+def write_tweets(path, n, seed, users=60, start=1577836800, span_secs=86400):
+    """Writes n random retweets, quotes, replies and mentions among users to path, one tweet per line."""
+    rnd = random.Random(seed)
+    ids = [str(i) for i in range(users)]
+    user = lambda u: {'id_str': u, 'screen_name': 'u' + u}
+    no_entities = lambda: {'hashtags': [], 'user_mentions': [], 'urls': []}
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(n):
+            u = rnd.choice(ids)
+            t = {
+                'id_str': str(10 ** 6 + i),
+                'created_at': time.strftime('%a %b %d %H:%M:%S +0000 %Y', time.gmtime(start + rnd.randrange(span_secs))),
+                'user': user(u), 'text': 'x', 'in_reply_to_status_id_str': None, 'in_reply_to_user_id_str': None,
+                'entities': no_entities()
+            }
+            t['entities']['hashtags'] = [{'text': h} for h in rnd.sample(['a', 'b', 'c', 'd', 'e', 'f'], rnd.randint(0, 3))]
+            r = rnd.random()
+            o = rnd.choice(ids)
+            if r < 0.4:
+                t['retweeted_status'] = {'id_str': str(rnd.randint(1, 500)), 'user': user(o), 'entities': no_entities()}
+                t['entities']['user_mentions'] = [user(o)]
+            elif r < 0.55:
+                t['quoted_status'] = {'id_str': str(rnd.randint(1, 500)), 'user': user(o), 'entities': no_entities()}
+            elif r < 0.75:
+                t['in_reply_to_status_id_str'] = '5'
+                t['in_reply_to_user_id_str'] = o
+                t['entities']['user_mentions'] = [user(o)]
+            else:
+                t['entities']['user_mentions'] = [user(m) for m in rnd.sample(ids, rnd.randint(1, 3))]
+            f.write(json.dumps(t) + '\n')
+    return path
+
+
+@pytest.fixture(scope='session')
+def tweet_files(tmp_path_factory):
+    """Two corpora of random tweets over the same day."""
+    d = tmp_path_factory.mktemp('tweets')
+    return (write_tweets(str(d / 'a.json'), 1200, 1), write_tweets(str(d / 'b.json'), 1000, 2))
+
+
+@pytest.fixture(autouse=True)
+def no_caches(monkeypatch):
+    """Keeps the tests (and the scripts they run) out of the centrality and parsed graph caches."""
+    import centrality_cache
+    import graph_io
+    for (module, var) in [(centrality_cache, 'CENTRALITY_CACHE_DIR'), (graph_io, 'GRAPH_CACHE_DIR')]:
+        monkeypatch.setenv(var, '')
+        monkeypatch.setattr(module, 'CACHE_DIR', '')
@@ -0,0 +1,61 @@
+import networkx as nx
+import os
+
+import centrality_cache
+
+from centrality_cache import cache_path, cached_centralities, centrality_params, graph_hash
+from sparse_graphs import SparseGraph
+
+
+def weighted_graph(edges, directed=True):
+    g = nx.DiGraph() if directed else nx.Graph()
+    g.add_weighted_edges_from(edges)
+    return g
+
+
+EDGES = [('a', 'b', 1), ('b', 'c', 2), ('c', 'a', 1), ('c', 'd', 3)]
+
+
+def test_graph_hash_ignores_order():
+    g = weighted_graph(EDGES)
+    assert graph_hash(weighted_graph(reversed(EDGES))) == graph_hash(g)
+    assert graph_hash(SparseGraph.from_networkx(g)) == graph_hash(g)
+
+
+def test_graph_hash_depends_on_weights_direction_and_nodes():
+    h = graph_hash(weighted_graph(EDGES))
+    assert graph_hash(weighted_graph(EDGES[:-1] + [('c', 'd', 4)])) != h
+    assert graph_hash(weighted_graph(EDGES, directed=False)) != h
+    g = weighted_graph(EDGES)
+    g.add_node('e')
+    assert graph_hash(g) != h
+
+
+def test_sampling_options_only_count_when_sampling():
+    opts = { 'betweenness_samples' : None, 'betweenness_tolerance' : 0.01, 'seed' : 0, 'top_x' : 20 }
+    assert centrality_params('BETWEENNESS', opts) == { 'betweenness_samples' : None }
+    g = weighted_graph(EDGES)
+    assert cache_path(g, 'BETWEENNESS', opts) == cache_path(g, 'BETWEENNESS', dict(opts, seed=1, top_x=50))
+    sampled = dict(opts, betweenness_samples=100)
+    assert cache_path(g, 'BETWEENNESS', sampled) != cache_path(g, 'BETWEENNESS', dict(sampled, seed=1))
+    assert cache_path(g, 'DEGREE', opts) == cache_path(g, 'DEGREE', sampled)
+
+
+def test_centralities_are_computed_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(centrality_cache, 'CACHE_DIR', str(tmp_path))
+    calls = []
+    compute = lambda: calls.append(1) or nx.degree_centrality(g)
+    g = weighted_graph(EDGES)
+    first = cached_centralities(g, 'DEGREE', {}, compute)
+    assert cached_centralities(weighted_graph(reversed(EDGES)), 'DEGREE', {}, compute) == first
+    assert len(calls) == 1 and len(os.listdir(str(tmp_path))) == 1
+    assert cached_centralities(g, 'DEGREE', {}, compute, cache=False) == first
+    assert len(calls) == 2
+
+
+def test_no_cache_dir_turns_caching_off():
+    calls = []
+    g = weighted_graph(EDGES)
+    for i in range(2):
+        cached_centralities(g, 'DEGREE', {}, lambda: calls.append(1) or nx.degree_centrality(g))
+    assert len(calls) == 2
@@ -0,0 +1,111 @@
+import networkx as nx
+import os
+import pytest
+
+import graph_io
+
+from graph_io import PARSER_VERSION, attrs_from, file_hash, graph_format, read_graph, read_networkx, write_graph
+from sparse_graphs import SparseGraphBuilder
+
+
+def example_graph(directed=True):
+    """A small graph with node attributes, edge tags and another edge attribute (on some edges)."""
+    b = SparseGraphBuilder(directed=directed)
+    for (i, (s, t, tag)) in enumerate([
+            ('a', 'b', 'RETWEET'), ('b', 'c', 'REPLY'), ('a', 'b', 'REPLY'), ('c', 'a', 'MENTION'),
+            ('d', 'd', 'QUOTE'), ('e & f', 'a', 'RETWEET'), ('c', 'b', None)]):
+        b.add_edge(s, t, i + 1, tag=tag)
+    sg = b.build()
+    sg.edge_columns = {'kind' : ['k%d' % i if i % 2 else None for i in range(sg.number_of_edges())]}
+    node_attrs = lambda l: dict([('screen_name', 'user %s' % l)] + ([('followers', len(l))] if l != 'c' else []))
+    return (sg, node_attrs)
+
+
+def assert_same_networkx(g1, g2):
+    assert g1.is_directed() == g2.is_directed()
+    assert list(g1.nodes(data=True)) == list(g2.nodes(data=True))
+    key = (lambda s, t: (s, t)) if g1.is_directed() else (lambda s, t: frozenset((s, t)))
+    assert dict((key(s, t), d) for (s, t, d) in g1.edges(data=True)) == \
+        dict((key(s, t), d) for (s, t, d) in g2.edges(data=True))
+
+
+def test_graph_format():
+    assert [graph_format(p) for p in ['g.graphml', 'g.NPZ', 'g.parquet']] == ['GRAPHML', 'NPZ', 'PARQUET']
+    with pytest.raises(ValueError):
+        graph_format('g.gexf')
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_graphml_reads_as_networkx_does(tmp_path, directed):
+    (sg, node_attrs) = example_graph(directed)
+    path = str(tmp_path / 'g.graphml')
+    write_graph(sg, path, node_attrs, tag_name='e_type' if directed else None)
+    expected = sg.to_networkx(node_attrs=node_attrs, tag_name='e_type')
+    assert_same_networkx(nx.read_graphml(path), expected)
+    (back, columns, tag_name, weight) = read_graph(path, cache=False)
+    assert (tag_name, weight) == (('e_type' if directed else None), 'weight')
+    assert_same_networkx(back.to_networkx(node_attrs=attrs_from(back, columns), tag_name=tag_name), expected)
+
+
+@pytest.mark.parametrize('ext', ['npz', 'parquet'])
+@pytest.mark.parametrize('directed', [True, False])
+def test_round_trip(tmp_path, directed, ext):
+    if ext == 'parquet':
+        pytest.importorskip('pyarrow')
+    (sg, node_attrs) = example_graph(directed)
+    path = str(tmp_path / ('g.' + ext))
+    tag_name = 'e_type' if directed else None
+    write_graph(sg, path, node_attrs, tag_name=tag_name)
+    (back, columns, back_tag_name, weight) = read_graph(path)
+    assert (back_tag_name, weight) == (tag_name, 'weight')
+    assert back.labels == sg.labels and back.directed == sg.directed
+    assert (back.matrix != sg.matrix).nnz == 0
+    assert back.edge_columns == sg.edge_columns
+    if directed:
+        assert back.edge_tag_list() == sg.edge_tag_list()
+    assert_same_networkx(
+        back.to_networkx(node_attrs=attrs_from(back, columns), tag_name=tag_name),
+        sg.to_networkx(node_attrs=node_attrs, tag_name=tag_name)
+    )
+
+
+def test_networkx_graphml_with_parallel_edges_and_defaults(tmp_path):
+    g = nx.MultiDiGraph()
+    g.add_node('a', colour='red')
+    g.add_edge('a', 'b', weight=2, e_type='RETWEET', kind='x')
+    g.add_edge('a', 'b', weight=3, e_type='REPLY', kind='y')
+    g.add_edge('b', 'c', weight=1, e_type='REPLY')
+    path = str(tmp_path / 'multi.graphml')
+    nx.write_graphml(g, path)
+    back = read_networkx(path, cache=False)
+    assert list(back.nodes(data=True)) == [('a', {'colour' : 'red'}), ('b', {}), ('c', {})]
+    # parallel edges are summed, keeping the first tag and the last of the other attributes
+    assert back['a']['b'] == {'weight' : 5, 'e_type' : 'RETWEET', 'kind' : 'y'}
+    assert back['b']['c'] == {'weight' : 1, 'e_type' : 'REPLY'}
+
+
+def test_graphml_without_weights(tmp_path):
+    g = nx.Graph([('a', 'b'), ('b', 'c')])
+    path = str(tmp_path / 'unweighted.graphml')
+    nx.write_graphml(g, path)
+    (sg, columns, tag_name, weight) = read_graph(path, cache=False)
+    assert (tag_name, weight) == (None, None)
+    assert sorted(sg.edges()) == [('a', 'b', 1), ('b', 'c', 1)]
+    assert_same_networkx(read_networkx(path, cache=False), g)
+
+
+def test_parsed_graphml_is_cached(tmp_path, monkeypatch):
+    (sg, node_attrs) = example_graph()
+    path = str(tmp_path / 'g.graphml')
+    write_graph(sg, path, node_attrs, tag_name='e_type')
+    cache_dir = tmp_path / 'cache'
+    monkeypatch.setattr(graph_io, 'CACHE_DIR', str(cache_dir))
+    parsed = read_networkx(path)
+    assert os.listdir(str(cache_dir)) == ['%s-v%d.npz' % (file_hash(path), PARSER_VERSION)]
+
+    def parse(*args, **kwargs):
+        raise AssertionError('parsed again')
+    monkeypatch.setattr(graph_io, 'read_graphml', parse)
+    assert_same_networkx(read_networkx(path), parsed)
+    with pytest.raises(AssertionError):
+        read_networkx(path, cache=False)
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from centrality_functions import CENTRALITY_FUNCTIONS
+from conftest import ROOT
+
+
+SCRIPT = os.path.join(ROOT, 'compare_centralities_longitudinally_from_tweets.py')
+
+
+def run(tweet_files, *args):
+    (f1, f2) = tweet_files
+    return subprocess.run(
+        [sys.executable, SCRIPT, '-f1', f1, '-f2', f2, '-t', 'MENTION', '-w', '240', '--max-lag', '2000'] + list(args),
+        check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=ROOT
+    ).stdout
+
+
+@pytest.mark.parametrize('c_type', sorted(CENTRALITY_FUNCTIONS))
+def test_jobs_give_the_same_csv(tweet_files, c_type):
+    serial = run(tweet_files, '-c', c_type, '--step', '120', '-j', '1')
+    assert serial.count(b'\n') > 10
+    assert run(tweet_files, '-c', c_type, '--step', '120', '-j', '3') == serial
+
+
+def test_sampled_cumulative_jobs_give_the_same_csv(tweet_files):
+    args = ['-c', 'BETWEENNESS', '--cumulative', '--betweenness-samples', '10', '--betweenness-tolerance', '0']
+    assert run(tweet_files, *(args + ['-j', '3'])) == run(tweet_files, *(args + ['-j', '1']))
+
+
+def test_batch_jobs_give_the_same_csvs(tweet_files, tmp_path):
+    batch = ','.join('MENTION:%s%s' % (c, cum) for c in sorted(CENTRALITY_FUNCTIONS) for cum in ['', ':cum'])
+    (serial, pooled) = (tmp_path / 'j1', tmp_path / 'j3')
+    for (d, jobs) in [(serial, '1'), (pooled, '3')]:
+        d.mkdir()
+        run(tweet_files, '-b', batch, '-o', str(d), '-j', jobs)
+    names = sorted(os.listdir(str(serial)))
+    assert len(names) == 2 * len(CENTRALITY_FUNCTIONS)
+    assert names == sorted(os.listdir(str(pooled)))
+    for name in names:
+        assert (pooled / name).read_bytes() == (serial / name).read_bytes(), name
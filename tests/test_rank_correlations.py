@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+import scipy.stats as stats
+
+from rank_correlations import kendall_tau_b, rbo, rbos, segment_ranks, similarities, spearman, weighted_tau
+from rank_tables import RankTable
+
+
+def reference_rbo(top1, top2, p):
+    """Extrapolated RBO (Webber et al., eq. 32) straight from its definition."""
+    k = min(len(top1), len(top2))
+    overlap = lambda d: len(set(top1[:d]) & set(top2[:d]))
+    return overlap(k) / k * p ** k + (1 - p) / p * sum(overlap(d) / d * p ** d for d in range(1, k + 1))
+
+
+def score_pairs(seed, count=20):
+    rnd = np.random.default_rng(seed)
+    pairs = []
+    for i in range(count):
+        n = int(rnd.integers(0, 30))
+        x = rnd.integers(0, 8, n).astype(float) if i % 3 == 0 else rnd.random(n)  # some with ties
+        pairs.append((x, x + rnd.normal(0, 0.5, n)))
+    return pairs
+
+
+def test_segment_ranks_match_scipy():
+    rnd = np.random.default_rng(0)
+    values = rnd.integers(0, 5, 200).astype(float)
+    segments = np.sort(rnd.integers(0, 7, 200))
+    ranks = segment_ranks(values, segments)
+    for s in np.unique(segments):
+        assert np.allclose(ranks[segments == s], stats.rankdata(-values[segments == s]))
+
+
+def test_spearman_matches_scipy():
+    pairs = score_pairs(1)
+    (rhos, ps) = spearman([x for (x, y) in pairs], [y for (x, y) in pairs])
+    for ((x, y), rho, p) in zip(pairs, rhos, ps):
+        if len(x) < 3:
+            assert np.isnan(rho)
+            continue
+        expected = stats.spearmanr(x, y)
+        assert rho == pytest.approx(expected[0], abs=1e-12)
+        assert p == pytest.approx(expected[1], rel=1e-9, abs=1e-15)
+
+
+def test_taus_match_scipy():
+    for (x, y) in score_pairs(2):
+        if len(x) < 2:
+            assert np.isnan(kendall_tau_b(x, y)[0]) and np.isnan(weighted_tau(x, y))
+            continue
+        assert kendall_tau_b(x, y) == pytest.approx(tuple(stats.kendalltau(x, y)), abs=1e-12)
+        assert weighted_tau(x, y) == pytest.approx(stats.weightedtau(x, y)[0], abs=1e-12)
+
+
+def test_rbo_matches_its_definition():
+    rnd = np.random.default_rng(3)
+    tops1 = [rnd.permutation(50)[:rnd.integers(1, 30)] for i in range(50)]
+    tops2 = [rnd.permutation(50)[:rnd.integers(1, 30)] for i in range(50)]
+    batched = rbos(tops1, tops2, 0.9)
+    for (t1, t2, r) in zip(tops1, tops2, batched):
+        expected = reference_rbo(list(t1), list(t2), 0.9)
+        assert r == pytest.approx(expected, abs=1e-12)
+        assert rbo(t1, t2, 0.9) == pytest.approx(expected, abs=1e-12)
+    assert rbo(list(range(10)), list(range(10))) == pytest.approx(1.0)
+    assert rbo([1, 2, 3], [4, 5, 6]) == 0.0
+    assert np.isnan(rbos([[], [1]], [[1], [1]])[0])
+
+
+def test_similarities_of_a_table_with_itself():
+    t = RankTable.from_dict(dict(('n%d' % i, float(i % 7) + i / 100.0) for i in range(40)))
+    sims = similarities([(t, t), (t, t)], 10)
+    assert sims['labels1'] == sims['labels2'] and len(sims['labels1'][0]) == 10
+    for s in ['tau', 'rho', 'wtau', 'rbo']:
+        assert sims[s] == pytest.approx([1.0, 1.0])
@@ -0,0 +1,146 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from sparse_centralities import (
+    SCORERS, betweenness, betweenness_centrality, centralities, closeness, closeness_centrality, degree,
+    eigenvector_centrality, estimate_betweenness, harmonic_centrality, hits_centralities, katz_centrality,
+    pagerank_centrality, scorer_args
+)
+from sparse_graphs import SparseGraph
+
+
+TOLERANCE = 1e-11
+
+
+def random_graph(directed, seed, n=40, p=0.12):
+    """A random graph with integer weights (so there are ties between paths), another component and an isolate."""
+    rnd = np.random.default_rng(seed)
+    g = nx.gnp_random_graph(n, p, seed=seed, directed=directed)
+    g.add_edges_from([(n, n + 1), (n + 1, n + 2), (n + 2, n)])
+    g.add_node(n + 3)
+    for (u, v) in g.edges():
+        g[u][v]['weight'] = int(rnd.integers(1, 4))
+    return nx.relabel_nodes(g, dict((u, 'n%d' % u) for u in g))
+
+
+GRAPHS = dict(('%s-%d' % ('directed' if d else 'undirected', s), random_graph(d, s)) for d in [True, False] for s in [1, 2])
+
+
+def assert_matches(got, expected, tolerance=TOLERANCE):
+    assert set(got) == set(expected)
+    for node in expected:
+        assert got[node] == pytest.approx(expected[node], abs=tolerance), node
+
+
+@pytest.fixture(params=sorted(GRAPHS))
+def g(request):
+    return GRAPHS[request.param]
+
+
+def test_betweenness(g):
+    (cs, info) = betweenness_centrality(g)
+    assert info is None
+    assert_matches(cs, nx.betweenness_centrality(g, weight='weight'))
+
+
+def test_betweenness_estimated_from_every_source_is_exact(g):
+    sg = SparseGraph.from_networkx(g)
+    (scores, info) = estimate_betweenness(sg, samples=len(sg), patience=len(sg), batch_size=8)
+    assert info['exact'] and info['samples'] == len(sg)
+    assert scores == pytest.approx(betweenness(sg), abs=TOLERANCE)
+
+
+def test_betweenness_estimate_is_reproducible(g):
+    sg = SparseGraph.from_networkx(g)
+    (scores, info) = estimate_betweenness(sg, samples=16, top_x=5, patience=16, batch_size=8, seed=3)
+    assert info['samples'] == 16 and not info['exact'] and info['error'] > 0
+    assert np.array_equal(scores, estimate_betweenness(sg, samples=16, top_x=5, patience=16, batch_size=8, seed=3)[0])
+
+
+def test_betweenness_over_jobs(g):
+    sg = SparseGraph.from_networkx(g)
+    assert betweenness(sg, jobs=2) == pytest.approx(betweenness(sg), abs=TOLERANCE)
+    estimated = lambda jobs: estimate_betweenness(sg, samples=20, top_x=5, patience=20, batch_size=8, jobs=jobs)
+    assert estimated(2)[0] == pytest.approx(estimated(1)[0], abs=TOLERANCE)
+
+
+def test_closeness(g):
+    assert_matches(closeness_centrality(g), nx.closeness_centrality(g, distance='weight'))
+
+
+def test_closeness_of_the_largest_component(g):
+    nodes = max(nx.weakly_connected_components(g) if g.is_directed() else nx.connected_components(g), key=len)
+    expected = nx.closeness_centrality(g.subgraph(nodes), distance='weight')
+    assert_matches(closeness_centrality(g, largest_only=True), expected)
+
+
+def test_closeness_estimate_is_reproducible(g):
+    sg = SparseGraph.from_networkx(g)
+    assert np.array_equal(closeness(sg, samples=len(sg)), closeness(sg))
+    estimate = closeness(sg, samples=len(sg) // 2, seed=1)
+    assert np.isfinite(estimate).all() and (estimate >= 0).all()
+    assert np.array_equal(estimate, closeness(sg, samples=len(sg) // 2, seed=1))
+
+
+def test_eigenvector(g):
+    (cs, info) = eigenvector_centrality(g, tol=1e-13, max_iter=10000)
+    assert info['converged']
+    assert_matches(cs, nx.eigenvector_centrality(g, tol=1e-13, max_iter=10000, weight='weight'))
+
+
+def test_pagerank(g):
+    (cs, info) = pagerank_centrality(g, 0.85, tol=1e-14, max_iter=10000)
+    assert info['converged']
+    assert_matches(cs, nx.pagerank(g, 0.85, tol=1e-14, max_iter=10000, weight='weight'))
+
+
+def test_hits(g):
+    (hubs, authorities, info) = hits_centralities(g, tol=1e-14, max_iter=10000)
+    assert info['converged']
+    (expected_hubs, expected_authorities) = nx.hits(g, tol=1e-14, max_iter=10000)
+    assert_matches(hubs, expected_hubs)
+    assert_matches(authorities, expected_authorities)
+
+
+def test_katz(g):
+    alpha = 0.9 / max(abs(np.linalg.eigvals(nx.to_numpy_array(g, weight='weight'))))
+    (cs, info) = katz_centrality(g, alpha, tol=1e-14, max_iter=10000)
+    assert info['converged']
+    assert_matches(cs, nx.katz_centrality(g, alpha, tol=1e-14, max_iter=10000, weight='weight'))
+
+
+def test_katz_default_alpha_converges(g):
+    (cs, info) = katz_centrality(g)
+    assert info['converged'] and 0 < info['alpha']
+    assert_matches(cs, nx.katz_centrality(g, info['alpha'], weight='weight'), 1e-4)
+
+
+def test_degree(g):
+    sg = SparseGraph.from_networkx(g)
+    assert_matches(dict(zip(sg.labels, degree(sg))), nx.degree_centrality(g))
+
+
+def test_centralities_over_jobs(g):
+    sg = SparseGraph.from_networkx(g)
+    requests = dict((c, scorer_args(c, {})) for c in SCORERS)
+    serial = centralities(sg, requests)
+    pooled = centralities(sg, requests, jobs=2)
+    for c in SCORERS:
+        assert pooled[c][0] == pytest.approx(serial[c][0], abs=TOLERANCE), c
+
+
+def test_harmonic_estimate(g):
+    (cs, info) = harmonic_centrality(g, registers=1024)
+    assert info['converged']
+    expected = nx.harmonic_centrality(g)
+    assert set(cs) == set(expected)
+    errors = [abs(cs[node] - expected[node]) / max(expected[node], 1.0) for node in expected]
+    assert np.mean(errors) < 3 * 1.04 / np.sqrt(1024)
+
+
+def test_harmonic_estimate_does_not_depend_on_node_order(g):
+    shuffled = g.__class__()
+    shuffled.add_nodes_from(sorted(g.nodes(), reverse=True))
+    shuffled.add_edges_from(reversed(list(g.edges(data=True))))
+    assert harmonic_centrality(shuffled, seed=5)[0] == harmonic_centrality(g, seed=5)[0]
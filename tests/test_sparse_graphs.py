@@ -0,0 +1,240 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from sparse_graphs import BipartiteBuilder, CooccurrenceBuilder, SparseGraph, SparseGraphBuilder, backbone
+
+
+def random_groups(seed, n=200, items=25):
+    rnd = np.random.default_rng(seed)
+    return [['h%d' % i for i in rnd.choice(items, rnd.integers(0, 5), replace=False)] for g in range(n)]
+
+
+def random_edges(seed, n=300, nodes=30):
+    rnd = np.random.default_rng(seed)
+    return [('n%d' % s, 'n%d' % t, int(w)) for (s, t, w) in zip(
+        rnd.integers(0, nodes, n), rnd.integers(0, nodes, n), rnd.integers(1, 4, n)
+    )]
+
+
+def summed(edges, directed):
+    """The networkx graph of edges, with repeated edges' weights summed."""
+    g = nx.DiGraph() if directed else nx.Graph()
+    for (s, t, w) in edges:
+        if g.has_edge(s, t):
+            g[s][t]['weight'] += w
+        else:
+            g.add_node(s)
+            g.add_node(t)
+            g.add_edge(s, t, weight=w)
+    return g
+
+
+def edge_set(g):
+    """Each edge's weight, by its (src, tgt), or its sorted ends if undirected."""
+    key = (lambda s, t: (s, t)) if g.is_directed() else (lambda s, t: tuple(sorted((s, t))))
+    return dict((key(s, t), d['weight']) for (s, t, d) in g.edges(data=True))
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_builder_sums_repeated_edges(directed):
+    edges = random_edges(1)
+    b = SparseGraphBuilder(directed=directed, compact_every=37)  # compacting many times along the way
+    for (s, t, w) in edges:
+        b.add_edge(s, t, w)
+    sg = b.build()
+    expected = summed(edges, directed)
+    assert sg.labels == list(expected.nodes())
+    assert edge_set(sg.to_networkx()) == edge_set(expected)
+    assert sg.number_of_edges() == expected.number_of_edges()
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_edge_arrays_are_coded_as_edges_one_by_one(directed):
+    edges = random_edges(2)
+    (one_by_one, at_once) = (SparseGraphBuilder(directed=directed), SparseGraphBuilder(directed=directed))
+    for (s, t, w) in edges:
+        one_by_one.add_edge(s, t, w, tag='RETWEET' if w == 1 else 'REPLY')
+    at_once.add_edge_arrays(
+        [s for (s, t, w) in edges], [t for (s, t, w) in edges], [w for (s, t, w) in edges],
+        ['RETWEET' if w == 1 else 'REPLY' for (s, t, w) in edges]
+    )
+    (g1, g2) = (one_by_one.build(), at_once.build())
+    assert g1.labels == g2.labels
+    assert (g1.matrix != g2.matrix).nnz == 0
+    assert g1.edge_tag_list() == g2.edge_tag_list()
+
+
+def test_taking_weight_away_drops_edges_and_isolates():
+    b = SparseGraphBuilder()
+    b.add_edges([('a', 'b'), ('b', 'c'), ('c', 'd')])
+    b.add_edge('c', 'd', -1)
+    assert sorted(b.build().edges()) == [('a', 'b', 1), ('b', 'c', 1)]
+    assert b.build(drop_isolates=True).labels == ['a', 'b', 'c']
+
+
+def test_edges_keep_their_first_tag():
+    b = SparseGraphBuilder()
+    b.add_edge('a', 'b', tag='REPLY')
+    b.add_edge('b', 'c', tag='RETWEET')
+    b.add_edge('a', 'b', tag='RETWEET')
+    g = b.build().to_networkx(tag_name='e_type')
+    assert (g['a']['b']['e_type'], g['a']['b']['weight']) == ('REPLY', 2)
+    assert g['b']['c']['e_type'] == 'RETWEET'
+
+
+def test_undirected_self_loops_are_held_once():
+    b = SparseGraphBuilder(directed=False)
+    b.add_edges([('a', 'a'), ('a', 'b'), ('b', 'a')])
+    sg = b.build()
+    assert sorted(sg.edges()) == [('a', 'a', 1), ('a', 'b', 2)]
+    assert sg.number_of_edges() == 2
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_networkx_round_trip(directed):
+    g = summed(random_edges(3), directed)
+    for (i, (s, t, d)) in enumerate(g.edges(data=True)):
+        if i % 3:
+            d['kind'] = 'k%d' % (i % 5)
+    sg = SparseGraph.from_networkx(g, keep_attrs=True)
+    back = sg.to_networkx()
+    assert list(back.nodes()) == list(g.nodes())
+    key = (lambda s, t: (s, t)) if directed else (lambda s, t: tuple(sorted((s, t))))
+    assert dict((key(s, t), d) for (s, t, d) in back.edges(data=True)) == \
+        dict((key(s, t), d) for (s, t, d) in g.edges(data=True))
+
+
+def test_cooccurrence_counts_every_pair():
+    groups = random_groups(4)
+    b = CooccurrenceBuilder()
+    for items in groups:
+        b.add_group(items)
+    expected = {}
+    for items in groups:
+        for i in range(len(items)):
+            for j in range(i + 1, len(items)):
+                pair = tuple(sorted((items[i], items[j])))
+                expected[pair] = expected.get(pair, 0) + 1
+    assert edge_set(b.build().to_networkx()) == expected
+    assert edge_set(b.build(min_weight=3).to_networkx()) == dict((k, w) for (k, w) in expected.items() if w >= 3)
+
+
+def test_star_links_each_rows_first_col_to_its_others():
+    groups = random_groups(5)
+    b = BipartiteBuilder()
+    expected = {}
+    for (row, items) in enumerate(groups):
+        for item in items:
+            b.add(row, item)
+        for item in items[1:]:
+            pair = tuple(sorted((items[0], item)))
+            expected[pair] = expected.get(pair, 0) + 1
+    assert edge_set(b.star().to_networkx()) == expected
+    assert edge_set(b.star(min_weight=2).to_networkx()) == dict((k, w) for (k, w) in expected.items() if w >= 2)
+
+
+def incidences(seed, rows=40, cols=15):
+    rnd = np.random.default_rng(seed)
+    b = rnd.integers(0, 4, (rows, cols)) * (rnd.random((rows, cols)) < 0.3)
+    builder = BipartiteBuilder(compact_every=50)
+    for (r, c) in zip(*np.nonzero(b)):
+        for i in range(b[r, c]):
+            builder.add('r%d' % r, 'c%d' % c)
+    return (builder, b.astype(float))
+
+
+def dense_projection(b, weighting):
+    """The projection of the dense incidence matrix b onto its cols, self-loops and all."""
+    x = (b > 0).astype(float)
+    if weighting == 'COUNT':
+        return b.T.dot(b)
+    if weighting == 'BINARY':
+        return x.T.dot(x)
+    if weighting == 'JACCARD':
+        shared = x.T.dot(x)
+        degrees = x.sum(axis=0)
+        return shared / (degrees[:, None] + degrees[None, :] - shared)
+    if weighting == 'COSINE':
+        norms = np.sqrt((b * b).sum(axis=0))
+        return b.T.dot(b) / np.outer(norms, norms)
+    k = x.sum(axis=1)
+    return (x * np.where(k > 1, 1.0 / np.maximum(k - 1, 1), 0.0)[:, None]).T.dot(x)  # NEWMAN
+
+
+def projected(sg, size=15):
+    """A dense matrix of a projection's weights, by the numbers in its node labels."""
+    m = np.zeros((size, size))
+    for (s, t, w) in sg.edges():
+        (i, j) = (int(s[1:]), int(t[1:]))
+        m[i, j] = m[j, i] = w
+    return m
+
+
+@pytest.mark.parametrize('weighting', ['COUNT', 'BINARY', 'JACCARD', 'COSINE', 'NEWMAN'])
+def test_projection_weightings(weighting):
+    (builder, b) = incidences(6)
+    expected = np.nan_to_num(dense_projection(b, weighting))
+    np.fill_diagonal(expected, 0)
+    assert np.allclose(projected(builder.project(weighting=weighting, block_size=4)), expected, atol=1e-12)
+    kept = np.where(expected >= 0.3, expected, 0)
+    assert np.allclose(projected(builder.project(weighting=weighting, min_weight=0.3, block_size=4)), kept, atol=1e-12)
+
+
+def test_projection_onto_rows():
+    (builder, b) = incidences(7)
+    expected = b.dot(b.T)
+    np.fill_diagonal(expected, 0)
+    assert np.allclose(projected(builder.project(side='rows', weighting='COUNT', block_size=4), 40), expected)
+
+
+def test_projection_keeps_each_nodes_top_k():
+    (builder, b) = incidences(8)
+    expected = dense_projection(b, 'COSINE')
+    np.fill_diagonal(expected, 0)
+    expected = np.nan_to_num(expected)
+    top = np.zeros_like(expected, dtype=bool)
+    for i in range(len(expected)):
+        heaviest = [j for j in np.argsort(-expected[i])[:3] if expected[i, j] > 0]
+        top[i, heaviest] = True
+    kept = np.where(top | top.T, expected, 0)
+    assert np.allclose(projected(builder.project(weighting='COSINE', top_k=3, block_size=4)), kept, atol=1e-12)
+
+
+def disparity_backbone(g, threshold):
+    """The edges of g the disparity filter keeps, from either end, straight from its definition."""
+    alpha = lambda u, v: (1 - g[u][v]['weight'] / float(strength(u))) ** (len(neighbours(u)) - 1)
+    neighbours = lambda u: [v for v in (g.successors(u) if g.is_directed() else g.neighbors(u)) if v != u]
+    strength = lambda u: sum(g[u][v]['weight'] for v in neighbours(u))
+    in_alpha = lambda u, v: (1 - g[u][v]['weight'] / float(in_strength(v))) ** (len(in_neighbours(v)) - 1)
+    in_neighbours = lambda v: [u for u in (g.predecessors(v) if g.is_directed() else g.neighbors(v)) if u != v]
+    in_strength = lambda v: sum(g[u][v]['weight'] for u in in_neighbours(v))
+    return set((u, v) for (u, v) in g.edges() if u == v or alpha(u, v) < threshold or in_alpha(u, v) < threshold or (
+        not g.is_directed() and alpha(v, u) < threshold
+    ))
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_disparity_backbone(directed):
+    g = summed(random_edges(9, n=400, nodes=25), directed)
+    sg = SparseGraph.from_networkx(g)
+    before = sg.matrix.copy()
+    for threshold in [0.05, 0.3]:
+        kept = backbone(sg, 'DISPARITY', threshold, drop_isolates=False).to_networkx()
+        expected = disparity_backbone(g, threshold)
+        if not directed:
+            (kept, expected) = (edge_set(kept).keys(), set(tuple(sorted(e)) for e in expected))
+        else:
+            kept = set(kept.edges())
+        assert set(kept) == expected
+    assert sg.matrix.nnz == before.nnz and (sg.matrix != before).nnz == 0  # sg itself is left alone
+
+
+def test_noise_corrected_backbone_thresholds():
+    g = summed(random_edges(10), True)
+    sg = SparseGraph.from_networkx(g)
+    assert backbone(sg, 'NOISE_CORRECTED', -1e9).number_of_edges() == sg.number_of_edges()
+    loops = [(s, t) for (s, t) in g.edges() if s == t]
+    assert sorted((s, t) for (s, t, w) in backbone(sg, 'NOISE_CORRECTED', 1e9).edges()) == sorted(loops)
+    kept = backbone(sg, 'NOISE_CORRECTED')
+    assert 0 < kept.number_of_edges() < sg.number_of_edges()
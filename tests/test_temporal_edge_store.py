@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from conftest import write_tweets
+from interaction_graphs import interactions_from, parse_ts, timestamp_2_epoch_seconds
+from temporal_edge_store import TemporalEdgeStore
+
+
+@pytest.fixture(scope='module')
+def tweets(tmp_path_factory):
+    path = write_tweets(str(tmp_path_factory.mktemp('store') / 'tweets.json'), 500, 3)
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(l) for l in f]
+
+
+def epoch(t):
+    return timestamp_2_epoch_seconds(parse_ts(t['created_at']))
+
+
+def window_edges(tweets, g_type, start, end):
+    """Each edge's count among the g_type interactions of the tweets with start <= ts < end."""
+    edges = {}
+    for t in tweets:
+        if start <= epoch(t) < end:
+            for e in interactions_from(t, g_type):
+                edges[e] = edges.get(e, 0) + 1
+    return edges
+
+
+@pytest.mark.parametrize('g_type', ['RETWEET', 'REPLY', 'QUOTE', 'MENTION', 'RTQT'])
+def test_window_graphs_match_the_tweets(tweets, g_type):
+    store = TemporalEdgeStore.from_tweets(tweets)
+    (first, last) = store.time_span()
+    assert (first, last) == (min(map(epoch, tweets)), max(map(epoch, tweets)))
+    for (start, end) in [(first, last + 1), (first + 3600, first + 3 * 3600), (last + 1, last + 2)]:
+        sg = store.graph(g_type, start, end)
+        assert dict(((s, t), w) for (s, t, w) in sg.edges()) == window_edges(tweets, g_type, start, end)
+
+
+def test_rtqt_edges_are_tagged_with_their_first_kind(tweets):
+    sg = TemporalEdgeStore.from_tweets(sorted(tweets, key=epoch)).graph('RTQT')
+    firsts = {}
+    for t in sorted(tweets, key=epoch):
+        for e in interactions_from(t, 'RETWEET'):
+            firsts.setdefault(e, 'RETWEET')
+        for e in interactions_from(t, 'QUOTE'):
+            firsts.setdefault(e, 'QUOTE')
+    (srcs, tgts, _) = sg.edge_arrays()
+    tags = dict(((sg.labels[s], sg.labels[t]), tag) for (s, t, tag) in zip(srcs, tgts, sg.edge_tag_list()))
+    assert tags == firsts
+
+
+def test_saved_stores_load_the_same(tweets, tmp_path):
+    store = TemporalEdgeStore.from_tweets(tweets, ['MENTION', 'REPLY'])
+    path = str(tmp_path / 'store.npz')
+    store.save(path)
+    loaded = TemporalEdgeStore.load(path)
+    assert (loaded.labels, loaded.g_types, loaded.kinds) == (store.labels, store.g_types, store.kinds)
+    assert list(loaded.events(['MENTION'])) == list(store.events(['MENTION']))
+    with pytest.raises(ValueError):
+        loaded.graph('RETWEET')
+
+
+def test_events_merge_each_seconds_tweets(tweets):
+    events = list(TemporalEdgeStore.from_tweets(tweets).events(['REPLY', 'MENTION']))
+    assert [ts for (ts, _) in events] == sorted(set(map(epoch, tweets)))
+    for g_type in ['REPLY', 'MENTION']:
+        seen = {}
+        for (ts, interactions) in events:
+            for e in interactions[g_type]:
+                seen[e] = seen.get(e, 0) + 1
+        assert seen == window_edges(tweets, g_type, 0, 2 ** 40)